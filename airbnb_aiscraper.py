@@ -4,20 +4,128 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from bs4 import BeautifulSoup
 import openai
-import html2text
-import tiktoken
 import time
 import os
 import pandas as pd
 import json
+import logging
+import re
+import queue
+import collections
+import random
+import asyncio
+import socket
+import threading
+import atexit
+from contextlib import ExitStack, contextmanager
+import base64
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import functools
+import multiprocessing
+from urllib.parse import urlparse, urlencode, parse_qsl
 # from dotenv import load_dotenv, find_dotenv
 from selenium.webdriver.chrome.service import Service
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from llm_cache import LLMCache
+from page_store import PageStore
+from results_journal import ResultsJournal
+from embedded_data import has_listing_data, parse_query_fields
+from http_fetcher import HttpFetcher
+from text_processing import get_text_context, select_relevant_chunks
+from listing_cleaning import clean_content, clean_listing, clean_listing_in_process, html_to_text, parse_html
+from tracing import tracer
+from fingerprint_store import FingerprintStore, count_changed_sections, fingerprint, section_fingerprints
+from results_store import ResultsWriter, load_results
 # from webdriver_manager.chrome import ChromeDriverManager
 
-openai.api_key = st.secrets["OPENAI_API_KEY"]
+
+def get_openai_api_key():
+    """Read the OpenAI key from Streamlit secrets, falling back to the environment."""
+    try:
+        return st.secrets["OPENAI_API_KEY"]
+    except Exception:
+        return os.environ.get("OPENAI_API_KEY")
+
+
+openai.api_key = get_openai_api_key()
+
+# Scraper messages go through logging; the Streamlit UI shows them on the page
+logger = logging.getLogger('airbnb_scraper')
+
+
+class LogTail:
+    """The last ``lines`` log messages of a run, redrawn in place in one placeholder.
+
+    Redraws are throttled to one per ``min_interval`` seconds; ``flush()``
+    draws the final state.
+    """
+
+    def __init__(self, placeholder, lines=30, min_interval=0.5):
+        self.placeholder = placeholder
+        self.lines = collections.deque(maxlen=lines)
+        self.min_interval = min_interval
+        self.counts = collections.Counter()
+        self._drawn_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, levelname, message):
+        with self._lock:
+            self.lines.append(f"{levelname:<7} {message}")
+            self.counts[levelname] += 1
+            if time.monotonic() - self._drawn_at >= self.min_interval:
+                self._draw()
+
+    def flush(self):
+        with self._lock:
+            self._draw()
+
+    def _draw(self):
+        self._drawn_at = time.monotonic()
+        self.placeholder.code('\n'.join(self.lines) or "No messages yet.", language='text')
+
+
+class StreamlitLogHandler(logging.Handler):
+    """Show scraper log records on the Streamlit page of the logging thread, in its LogTail while a run has one."""
+
+    def emit(self, record):
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return
+        message = self.format(record)
+        tail = st.session_state.get('log_tail')
+        if tail is not None:
+            tail.add(record.levelname, message)
+        elif getattr(record, 'code', False):
+            st.code(message, language='text')
+        elif record.levelno >= logging.ERROR:
+            st.error(message)
+        elif record.levelno >= logging.WARNING:
+            st.warning(message)
+        else:
+            st.write(message)
+
+
+@st.cache_resource(show_spinner=False)
+def install_streamlit_logging():
+    """Forward scraper log messages to the page (once per process)."""
+    handler = StreamlitLogHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+def attach_script_run_ctx(thread, ctx):
+    """Let ``thread`` report to the Streamlit page of ``ctx``; a no-op outside ``streamlit run``.
+
+    ``ctx`` comes from ``get_script_run_ctx(suppress_warning=True)``, which
+    is None in the batch CLI, queue workers and benchmarks.
+    """
+    if ctx is not None:
+        add_script_run_ctx(thread, ctx)
+    return thread
 
 # Configure Chrome options
 chrome_options = Options()
@@ -32,24 +140,92 @@ chrome_options.add_argument("--disable-dev-shm-usage")
 # import streamlit as st
 # import os
 
-def get_driver():
-    """Create and return a configured WebDriver instance."""
-    try:
-        # First check installed versions
-        import subprocess
-        import re
-        
+def find_free_port():
+    """Ask the OS for an unused local TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@st.cache_resource(show_spinner=False)
+def get_browser_versions():
+    """Return the installed Chromium and ChromeDriver versions (checked once per process)."""
+    import subprocess
+
+    versions = {}
+    for name in ('chromium', 'chromedriver'):
         try:
-            # Get Chromium version
-            chrome_version_output = subprocess.check_output(['chromium', '--version']).decode()
-            st.write(f"Installed Chromium: {chrome_version_output.strip()}")
-            
-            # Get ChromeDriver version
-            chromedriver_version_output = subprocess.check_output(['chromedriver', '--version']).decode()
-            st.write(f"Installed ChromeDriver: {chromedriver_version_output.strip()}")
-            
+            versions[name] = subprocess.check_output([name, '--version']).decode().strip()
         except Exception as e:
-            st.warning(f"Version check failed: {str(e)}")
+            versions[name] = f"Version check failed: {str(e)}"
+    return versions
+
+
+RESOURCE_TYPE_PATTERNS = {
+    'image': ['*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*'],
+    'font': ['*.woff*', '*.woff2*', '*.ttf*', '*.otf*', '*.eot*'],
+    'media': ['*.mp4*', '*.webm*', '*.mp3*', '*.m3u8*', '*.ogg*', '*.mov*'],
+    'stylesheet': ['*.css*'],
+}
+TRACKER_DOMAINS = [
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googleadservices.com',
+    'facebook.net', 'connect.facebook.net', 'bat.bing.com', 'hotjar.com', 'sentry.io',
+    'branch.io', 'app.link', 'criteo.com', 'tiqcdn.com', 'pinimg.com',
+]
+
+
+class ResourcePolicy:
+    """Which resource types and domains the headless browser may load, blocked per tab through DevTools."""
+
+    def __init__(self, blocked_types=('image', 'font', 'media'), block_trackers=True,
+                 deny_domains=(), allow_domains=()):
+        self.blocked_types = tuple(blocked_types)
+        self.block_trackers = block_trackers
+        self.deny_domains = tuple(deny_domains)
+        self.allow_domains = tuple(allow_domains)
+
+    def blocked_url_patterns(self):
+        patterns = [pattern for kind in self.blocked_types for pattern in RESOURCE_TYPE_PATTERNS.get(kind, [])]
+        domains = (TRACKER_DOMAINS if self.block_trackers else []) + list(self.deny_domains)
+        for domain in domains:
+            if not any(domain == allowed or domain.endswith('.' + allowed) for allowed in self.allow_domains):
+                patterns.append(f"*://*{domain}/*")
+        return patterns
+
+    def chrome_prefs(self):
+        if 'image' in self.blocked_types:
+            return {'profile.managed_default_content_settings.images': 2}
+        return {}
+
+    def apply(self, driver):
+        """Install the URL block list on the driver's current tab."""
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_url_patterns()})
+
+
+def apply_resource_policy(driver):
+    """Apply the driver's ResourcePolicy (if any) to its current tab."""
+    policy = getattr(driver, 'resource_policy', None)
+    if policy is not None:
+        policy.apply(driver)
+
+
+def get_driver(debugging_port=None, verbose=True, resource_policy=None, performance_logging=False):
+    """Create and return a configured WebDriver instance.
+
+    Each browser gets its own remote debugging port so several can run
+    side by side; a free one is picked when ``debugging_port`` is None.
+    ``resource_policy`` limits what pages may load; ``performance_logging``
+    records DevTools network events for measure_page_transfer().
+    """
+    if debugging_port is None:
+        debugging_port = find_free_port()
+    log_path = f'/tmp/chromedriver-{debugging_port}.log'
+    try:
+        if verbose:
+            versions = get_browser_versions()
+            logger.info(f"Installed Chromium: {versions['chromium']}")
+            logger.info(f"Installed ChromeDriver: {versions['chromedriver']}")
         
         # Initialize Chrome options
         chrome_options = Options()
@@ -67,45 +243,260 @@ def get_driver():
         chrome_options.add_argument("--disable-extensions")
         chrome_options.add_argument("--disable-web-security")
         chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--remote-debugging-port=9222")  # Enable debugging
+        chrome_options.add_argument(f"--remote-debugging-port={debugging_port}")  # Enable debugging
         
         # Generic user agent
         chrome_options.add_argument("--user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/stable Safari/537.36")
 
+        if resource_policy is not None:
+            chrome_options.add_experimental_option('prefs', resource_policy.chrome_prefs())
+        if performance_logging:
+            chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
         # Initialize service with logging
         service = Service(
             executable_path='/usr/bin/chromedriver',
-            log_path='/tmp/chromedriver.log',
+            log_path=log_path,
             service_args=['--verbose']
         )
 
-        st.write("Attempting to initialize ChromeDriver...")
+        if verbose:
+            logger.info("Attempting to initialize ChromeDriver...")
         
         # Try to create driver
         driver = webdriver.Chrome(service=service, options=chrome_options)
+        driver.resource_policy = resource_policy
+        apply_resource_policy(driver)
         
         # Verify browser capabilities
-        st.write("Driver capabilities:")
-        st.write(f"Browser version: {driver.capabilities.get('browserVersion', 'unknown')}")
-        st.write(f"ChromeDriver version: {driver.capabilities.get('chrome', {}).get('chromedriverVersion', 'unknown')}")
+        if verbose:
+            logger.info("Driver capabilities:")
+            logger.info(f"Browser version: {driver.capabilities.get('browserVersion', 'unknown')}")
+            logger.info(f"ChromeDriver version: {driver.capabilities.get('chrome', {}).get('chromedriverVersion', 'unknown')}")
         
         return driver
         
     except Exception as e:
-        st.error(f"Failed to initialize ChromeDriver: {str(e)}")
+        logger.error(f"Failed to initialize ChromeDriver: {str(e)}")
         
         # Try to read ChromeDriver log
         try:
-            with open('/tmp/chromedriver.log', 'r') as f:
-                st.code(f.read(), language='text')
+            with open(log_path, 'r') as f:
+                logger.error(f.read(), extra={'code': True})
         except:
-            st.warning("Could not read ChromeDriver log")
+            logger.warning("Could not read ChromeDriver log")
             
         import traceback
-        st.code(traceback.format_exc())
+        logger.error(traceback.format_exc(), extra={'code': True})
         raise
 
 
+def measure_page_transfer(driver, url):
+    """Load ``url`` and report bytes transferred, request counts and load time.
+
+    ``driver`` must have been created with ``performance_logging=True``.
+    """
+    driver.get_log('performance')  # Drop events from earlier pages
+    start = time.monotonic()
+    driver.get(url)
+    wait_for_page_ready(driver, timeout=30, label='policy measurement')
+    elapsed = time.monotonic() - start
+    transferred = requests = blocked = 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message['method'] == 'Network.loadingFinished':
+            transferred += message['params'].get('encodedDataLength', 0)
+            requests += 1
+        elif message['method'] == 'Network.loadingFailed' and message['params'].get('blockedReason'):
+            blocked += 1
+    return {
+        'kilobytes': round(transferred / 1024, 1),
+        'requests': requests,
+        'blocked_requests': blocked,
+        'load_seconds': round(elapsed, 2),
+    }
+
+
+def compare_resource_policy(url, policy):
+    """Measure one page with and without ``policy`` on fresh browsers."""
+    rows = []
+    for mode, active_policy in (('policy off', None), ('policy on', policy)):
+        driver = get_driver(verbose=False, resource_policy=active_policy, performance_logging=True)
+        try:
+            rows.append(dict(measure_page_transfer(driver, url), mode=mode))
+        finally:
+            driver.quit()
+    return pd.DataFrame(rows).set_index('mode')
+
+
+class _PooledDriver:
+    """A warm browser owned by a DriverPool."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class DriverPool:
+    """Process-wide pool of warm WebDriver instances handed out as leases.
+
+    Browsers are health-checked when leased, reset (extra tabs closed,
+    cookies cleared) when returned, and recycled after
+    ``max_pages_per_driver`` leases to bound their memory use.
+    """
+
+    def __init__(self, size=2, max_pages_per_driver=25, resource_policy=None):
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self.resource_policy = resource_policy
+        self._idle = queue.LifoQueue()  # Reuse the most recently used (warmest) browser first
+        self._lock = threading.Lock()
+        self._live = 0
+        self.stats = {'created': 0, 'recycled': 0, 'unhealthy': 0, 'leases': 0}
+
+    def configure(self, size=None, max_pages_per_driver=None, resource_policy=None):
+        """Adjust the pool limits; surplus browsers are retired as they come back.
+
+        A new ``resource_policy`` retires the idle browsers so fresh ones
+        start with its content settings.
+        """
+        with self._lock:
+            if size is not None:
+                self.size = max(1, int(size))
+            if max_pages_per_driver is not None:
+                self.max_pages_per_driver = max(1, int(max_pages_per_driver))
+            policy_changed = (resource_policy is not None
+                              and vars(resource_policy) != vars(self.resource_policy or ResourcePolicy()))
+            if resource_policy is not None:
+                self.resource_policy = resource_policy
+        if policy_changed:
+            self.close()
+
+    @contextmanager
+    def lease(self, timeout=300):
+        """Borrow a healthy browser for one page; it is reset and returned afterwards.
+
+        A lease that loads several pages sets ``driver.pages_loaded`` so they
+        all count towards recycling.
+        """
+        entry = self._acquire(timeout)
+        entry.driver.pages_loaded = 1
+        try:
+            yield entry.driver
+        finally:
+            entry.pages += max(1, entry.driver.pages_loaded)
+            self._release(entry)
+
+    def close(self):
+        """Quit every idle browser."""
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._retire(entry)
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                entry = None
+                with self._lock:
+                    can_create = self._live < self.size
+                    if can_create:
+                        self._live += 1
+                if can_create:
+                    try:
+                        with tracer.span('driver startup'):
+                            entry = _PooledDriver(get_driver(verbose=False, resource_policy=self.resource_policy))
+                    except Exception:
+                        with self._lock:
+                            self._live -= 1
+                        raise
+                    self.stats['created'] += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutException("Timed out waiting for a browser from the pool")
+                    try:
+                        entry = self._idle.get(timeout=remaining)
+                    except queue.Empty:
+                        continue
+            if self._is_healthy(entry.driver):
+                self.stats['leases'] += 1
+                return entry
+            self.stats['unhealthy'] += 1
+            self._retire(entry)
+
+    def _release(self, entry):
+        with self._lock:
+            oversized = self._live > self.size
+        if oversized or entry.pages >= self.max_pages_per_driver:
+            self.stats['recycled'] += 1
+            self._retire(entry)
+            return
+        try:
+            self._reset(entry.driver)
+        except Exception:
+            self._retire(entry)
+            return
+        self._idle.put(entry)
+
+    def _retire(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._live -= 1
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(driver):
+        """Close extra tabs, clear cookies and park the browser on a blank page."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        driver.get('about:blank')
+
+
+@st.cache_resource(show_spinner=False)
+def get_page_store():
+    """Return the process-wide PageStore of fetched search and listing pages."""
+    return PageStore()
+
+
+@st.cache_resource(show_spinner=False)
+def get_fingerprint_store():
+    """Return the process-wide FingerprintStore of extracted listings."""
+    return FingerprintStore()
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_fetcher():
+    """Return the process-wide pooled HttpFetcher."""
+    return HttpFetcher()
+
+
+@st.cache_resource(show_spinner=False)
+def get_driver_pool():
+    """Return the process-wide DriverPool, kept warm across Streamlit reruns."""
+    pool = DriverPool()
+    atexit.register(pool.close)
+    return pool
+
+
 
 def check_system_setup():
     """Verify system setup and dependencies."""
@@ -145,6 +536,125 @@ def check_system_setup():
 
 
 
+# Selectors that signal a page has rendered the parts we scrape (search pages: search_ready_selectors())
+LISTING_READY_SELECTORS = ['h1']
+
+# Installs a MutationObserver and fetch/XHR hooks on first call and reports load, DOM and network state
+PAGE_STATE_SCRIPT = """
+if (!window.__scraperState) {
+    const state = window.__scraperState = {lastMutation: performance.now(), lastRequestEnd: 0, pending: 0};
+    // The default 250 entry buffer fills up on listing pages and later responses go unrecorded
+    performance.setResourceTimingBufferSize(10000);
+    new MutationObserver(() => { state.lastMutation = performance.now(); })
+        .observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    // Count fetch/XHR requests still in flight, which resource timing only lists once they end
+    const finished = () => { state.pending -= 1; state.lastRequestEnd = performance.now(); };
+    const fetch = window.fetch;
+    window.fetch = function () {
+        state.pending += 1;
+        try {
+            return fetch.apply(this, arguments).finally(finished);
+        } catch (error) {
+            finished();
+            throw error;
+        }
+    };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.pending += 1;
+        this.addEventListener('loadend', finished, {once: true});
+        try {
+            return send.apply(this, arguments);
+        } catch (error) {
+            this.removeEventListener('loadend', finished);
+            finished();
+            throw error;
+        }
+    };
+}
+const resources = performance.getEntriesByType('resource');
+let lastResponseEnd = window.__scraperState.lastRequestEnd;
+for (const entry of resources) {
+    lastResponseEnd = Math.max(lastResponseEnd, entry.responseEnd || entry.startTime);
+}
+return {
+    readyState: document.readyState,
+    now: performance.now(),
+    lastMutation: window.__scraperState.lastMutation,
+    lastResponseEnd: lastResponseEnd,
+    pending: window.__scraperState.pending,
+    missing: arguments[0].filter(selector => !document.querySelector(selector)),
+};
+"""
+
+
+class ReadinessLog:
+    """Thread-safe record of how long each page readiness wait took."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.entries = []
+
+    def record(self, label, report):
+        with self._lock:
+            self.entries.append(dict(report, label=label))
+
+    def clear(self):
+        with self._lock:
+            self.entries = []
+
+    def summary(self):
+        """Return wait statistics per label as a DataFrame."""
+        with self._lock:
+            df = pd.DataFrame(self.entries)
+        if df.empty:
+            return df
+        return df.groupby('label').agg(
+            waits=('waited', 'size'),
+            mean_seconds=('waited', 'mean'),
+            max_seconds=('waited', 'max'),
+            timeouts=('timed_out', 'sum'),
+        ).round(2)
+
+
+readiness_log = ReadinessLog()
+
+
+def wait_for_page_ready(driver, selectors=(), timeout=15, quiet_period=0.75, label='page', poll_interval=0.1):
+    """Wait until the page is ready instead of sleeping for a fixed time.
+
+    The page counts as ready once the document has loaded, no fetch/XHR
+    request is pending, no DOM mutation and no network response has
+    happened for ``quiet_period`` seconds and every CSS selector in
+    ``selectors`` matches. Gives up after ``timeout``
+    seconds. Returns a report with the time actually waited.
+    """
+    start = time.monotonic()
+    quiet_ms = quiet_period * 1000
+    state = None
+    ready = False
+    while True:
+        try:
+            state = driver.execute_script(PAGE_STATE_SCRIPT, list(selectors))
+        except WebDriverException:
+            state = None  # Page is mid-navigation; poll again
+        if state:
+            loaded = state['readyState'] == 'complete'
+            dom_quiet = state['now'] - state['lastMutation'] >= quiet_ms
+            network_idle = state['now'] - state['lastResponseEnd'] >= quiet_ms and not state['pending']
+            ready = loaded and dom_quiet and network_idle and not state['missing']
+        if ready or time.monotonic() - start >= timeout:
+            break
+        time.sleep(poll_interval)
+    report = {
+        'waited': round(time.monotonic() - start, 2),
+        'timed_out': not ready,
+        'missing': state['missing'] if state else list(selectors),
+    }
+    readiness_log.record(label, report)
+    return report
+
+
 def get_html_content(driver, max_retries=3):
     """Fetch HTML content from the current page with retries."""
     for attempt in range(max_retries):
@@ -152,160 +662,1518 @@ def get_html_content(driver, max_retries=3):
             WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.TAG_NAME, 'body')))
             
             # Scroll gradually to trigger lazy-loading
-            total_height = driver.execute_script("return document.body.scrollHeight")
-            for i in range(3):
-                driver.execute_script(f"window.scrollTo(0, {total_height * (i+1) / 3});")
-                time.sleep(2)
+            with tracer.span('scroll'):
+                total_height = driver.execute_script("return document.body.scrollHeight")
+                for i in range(3):
+                    driver.execute_script(f"window.scrollTo(0, {total_height * (i+1) / 3});")
+                    wait_for_page_ready(driver, timeout=5, label='listing scroll')
             
             return driver.page_source
         except TimeoutException:
             if attempt == max_retries - 1:
-                st.error(f"Timeout while loading the page after {max_retries} attempts")
+                logger.error(f"Timeout while loading the page after {max_retries} attempts")
                 return None
             time.sleep(5)  # Wait before retrying
     return None
 
-def parse_html(html_content):
-    """Parse and clean HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    for element in soup(['script', 'style', 'footer']):
-        element.decompose()
-    return str(soup)
-
-def clean_content(parsed_html):
-    """Convert HTML to clean text."""
-    h = html2text.HTML2Text()
-    h.ignore_links = h.ignore_images = True
-    h.body_width = 0
-    return h.handle(parsed_html)
-
-def split_text(text, max_tokens=2000):
-    """Split text into chunks."""
-    encoding = tiktoken.get_encoding("cl100k_base")## encoding to represents the token model can understand and process
-    tokens = encoding.encode(text)
-    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
-
-def extract_content_with_openai(cleaned_content, user_query):
-    """Extract relevant information using OpenAI API."""
-    try:
-        response = openai.chat.completions.create(
-            model='gpt-3.5-turbo',
-            messages=[
-                {"role": "system", "content": "You are a precise data extractor for Airbnb listings. Focus only on the current listing and extract exactly what is asked. Format the output clearly with labels."},
-                {"role": "user", "content": f"From this single Airbnb listing, extract only: {user_query}\n\nListing Content:\n{cleaned_content}"}
-            ],
-            max_tokens=500,
-            temperature=0.3,  # Lower temperature for more consistent output
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        st.error(f"OpenAI API error: {e}")
-        return f"Error in content extraction: {str(e)}"
 
+EXTRACTION_MODEL = 'gpt-3.5-turbo'
+LISTING_TOKEN_BUDGET = 3000  # Most listing tokens sent to the model per listing
+CHUNK_MAX_TOKENS = 2000
+EXTRACTION_MAX_TOKENS = 500
+EXTRACTION_SYSTEM_PROMPT = "You are a precise data extractor for Airbnb listings. Focus only on the current listing and extract exactly what is asked. Format the output clearly with labels."
+
+
+def build_extraction_messages(cleaned_content, user_query):
+    """Build the chat messages for extracting ``user_query`` from one listing."""
+    return [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": f"From this single Airbnb listing, extract only: {user_query}\n\nListing Content:\n{cleaned_content}"}
+    ]
+
+
+BATCH_EXTRACTION_MODEL = 'gpt-4o-mini'  # Supports strict JSON schema output
+BATCH_LISTING_MAX_TOKENS = 1500  # Larger listings use the per-listing chunked path
+BATCH_EXTRACTION_SYSTEM_PROMPT = "You are a precise data extractor for Airbnb listings. You receive several listings, each introduced by a line 'LISTING <url>'. Return one record per listing with its URL copied exactly. Use only that listing's own text and null for anything it does not state."
+
+
+def build_extraction_schema(user_query):
+    """Derive a strict JSON schema with one nullable string per phrase in ``user_query``.
+
+    Returns ``(schema, phrases)`` where ``phrases`` maps each schema property
+    name back to the query phrase it stands for.
+    """
+    phrases = {}
+    for phrase in parse_query_fields(user_query) or [user_query]:
+        name = re.sub(r'\W+', '_', phrase.lower()).strip('_') or 'extracted_info'
+        if name != 'url':
+            phrases.setdefault(name, phrase)
+    record = {
+        "type": "object",
+        "properties": dict({"url": {"type": "string"}},
+                           **{name: {"type": ["string", "null"]} for name in phrases}),
+        "required": ["url"] + list(phrases),
+        "additionalProperties": False,
+    }
+    schema = {
+        "type": "object",
+        "properties": {"listings": {"type": "array", "items": record}},
+        "required": ["listings"],
+        "additionalProperties": False,
+    }
+    return schema, phrases
+
+
+def build_batch_extraction_messages(listings, user_query):
+    """Build the chat messages for extracting ``user_query`` from several ``(url, text)`` listings."""
+    body = "\n\n".join(f"LISTING {url}\n{text}" for url, text in listings)
+    return [
+        {"role": "system", "content": BATCH_EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": f"From each Airbnb listing below, extract only: {user_query}\n\n{body}"}
+    ]
+
+
+class AsyncTokenBucket:
+    """Token bucket for asyncio code, refilled continuously at ``per_minute``."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount=1):
+        """Wait until ``amount`` tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class AsyncExtractor:
+    """Run cached, deduplicated and rate-limited OpenAI extraction calls concurrently on a background event loop."""
+
+    def __init__(self, max_in_flight=8, requests_per_minute=500, tokens_per_minute=60000,
+                 max_retries=5, base_delay=1.0, max_delay=60.0, cache=None):
+        self.cache = cache
+        self.bypass_cache = False
+        self._run_results = {}
+        self._open_batches = {}
+        self.batch_token_budget = 6000
+        self.batch_max_listings = 8
+        self.batch_linger = 2.0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.configure(max_in_flight, requests_per_minute, tokens_per_minute)
+        self._client = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def configure(self, max_in_flight=None, requests_per_minute=None, tokens_per_minute=None,
+                  bypass_cache=None):
+        """Replace the concurrency and rate limits; calls already waiting keep the old ones."""
+        if bypass_cache is not None:
+            self.bypass_cache = bypass_cache
+        if max_in_flight is not None:
+            self._semaphore = asyncio.Semaphore(max(1, int(max_in_flight)))
+        if requests_per_minute is not None:
+            self._requests = AsyncTokenBucket(requests_per_minute)
+        if tokens_per_minute is not None:
+            self._tokens = AsyncTokenBucket(tokens_per_minute)
+
+    def new_run(self):
+        """Forget the chunks deduplicated during the previous run."""
+        self._loop.call_soon_threadsafe(self._run_results.clear)
+        if self.cache is not None:
+            self.cache.reset_stats()
+
+    def extract(self, chunks, user_query):
+        """Submit chunks for extraction; returns a future of the results in chunk order."""
+        coro = tracer.bind(tracer.current_listing(), self._extract_all(chunks, user_query))
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _extract_all(self, chunks, user_query):
+        return await asyncio.gather(*(self._extract_cached(chunk, user_query) for chunk in chunks))
+
+    async def _extract_cached(self, chunk, user_query):
+        key = LLMCache.make_key(EXTRACTION_MODEL, EXTRACTION_SYSTEM_PROMPT, user_query, chunk)
+        task = self._run_results.get(key)
+        if task is not None:
+            if self.cache is not None:
+                self.cache.stats['deduped'] += 1
+            tracer.incr('llm_deduped')
+            return await asyncio.shield(task)
+        # Registered before the cache lookup, so duplicates arriving during it wait for this one
+        task = asyncio.ensure_future(self._lookup_or_extract(key, chunk, user_query))
+        self._run_results[key] = task
+        result = await task
+        if result.startswith("Error in content extraction"):
+            self._run_results.pop(key, None)  # Let a later duplicate try again
+        return result
+
+    async def _lookup_or_extract(self, key, chunk, user_query):
+        # SQLite calls run on worker threads, off the event loop
+        if self.cache is not None and not self.bypass_cache:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                tracer.incr('llm_cache_hits')
+                return cached
+        tracer.incr('llm_cache_misses')
+        result = await self._extract_one(chunk, user_query)
+        if self.cache is not None and not result.startswith("Error in content extraction"):
+            await asyncio.to_thread(self.cache.put, key, result)
+        return result
+
+    @staticmethod
+    def _is_retryable(error):
+        if isinstance(error, (openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            retry_after = response.headers.get('retry-after')
+        try:
+            return min(self.max_delay, max(0.0, float(retry_after)))
+        except (TypeError, ValueError):
+            return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _get_client(self):
+        """Create the shared client on first use; retries are handled by _complete()."""
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(api_key=openai.api_key, max_retries=0)
+        return self._client
+
+    async def _complete(self, messages, max_tokens=EXTRACTION_MAX_TOKENS, **options):
+        """Send one chat completion under the rate limits, retrying transient errors.
+
+        Returns the message content; raises the last error once retries run out.
+        """
+        client = self._get_client()
+        prompt_tokens = sum(get_text_context().count_tokens(m["content"]) for m in messages)
+        options.setdefault('model', EXTRACTION_MODEL)
+        for attempt in range(self.max_retries + 1):
+            await self._requests.acquire()
+            await self._tokens.acquire(prompt_tokens + max_tokens)
+            try:
+                async with self._semaphore:
+                    with tracer.span('openai'):
+                        response = await client.chat.completions.create(
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=0.3,
+                            **options,
+                        )
+                if response.usage is not None:
+                    tracer.record_usage(options['model'], response.usage.prompt_tokens,
+                                        response.usage.completion_tokens)
+                return response.choices[0].message.content
+            except Exception as e:
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    tracer.incr('openai_errors')
+                    raise
+                tracer.incr('openai_retries')
+                await asyncio.sleep(self._backoff(attempt, e))
+
+    async def _extract_one(self, chunk, user_query):
+        try:
+            return await self._complete(build_extraction_messages(chunk, user_query))
+        except Exception as e:
+            return f"Error in content extraction: {str(e)}"
+
+    def extract_batched(self, url, text, user_query, flush=False):
+        """Queue one small listing for a batched structured extraction; returns a Future of its answers by phrase."""
+        coro = tracer.bind(tracer.current_listing(), self._extract_batched(url, text, user_query, flush))
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def flush_batches(self):
+        """Send every open batch now instead of waiting out ``batch_linger``."""
+        asyncio.run_coroutine_threadsafe(self._flush_open_batches(), self._loop)
+
+    async def _flush_open_batches(self):
+        # A coroutine rather than a callback, so it runs after extract_batched() calls made before it
+        for user_query, batch in list(self._open_batches.items()):
+            self._flush_batch(user_query, batch)
+
+    async def _extract_batched(self, url, text, user_query, flush=False):
+        key = LLMCache.make_key(BATCH_EXTRACTION_MODEL, BATCH_EXTRACTION_SYSTEM_PROMPT, user_query, text)
+        if self.cache is not None and not self.bypass_cache:
+            # A read-only lookup, kept on the loop so the listing joins its batch before later flushes
+            cached = self.cache.get(key)
+            if cached is not None:
+                tracer.incr('llm_cache_hits')
+                if flush and user_query in self._open_batches:
+                    self._flush_batch(user_query, self._open_batches[user_query])
+                return json.loads(cached)
+        tracer.incr('llm_cache_misses')
+
+        tokens = get_text_context().count_tokens(text)
+        batch = self._open_batches.get(user_query)
+        if batch is not None and batch['tokens'] + tokens > self.batch_token_budget:
+            self._flush_batch(user_query, batch)
+            batch = None
+        if batch is None:
+            batch = {'items': [], 'tokens': 0}
+            batch['timer'] = self._loop.call_later(self.batch_linger, self._flush_batch, user_query, batch)
+            self._open_batches[user_query] = batch
+        future = self._loop.create_future()
+        batch['items'].append((url, text, future))
+        batch['tokens'] += tokens
+        if flush or len(batch['items']) >= self.batch_max_listings:
+            self._flush_batch(user_query, batch)
+
+        result = await future
+        if self.cache is not None and isinstance(result, dict):
+            await asyncio.to_thread(self.cache.put, key, json.dumps(result, ensure_ascii=False))
+        return result
 
+    def _flush_batch(self, user_query, batch):
+        if self._open_batches.get(user_query) is batch:
+            del self._open_batches[user_query]
+        batch['timer'].cancel()
+        if batch['items'] and not batch.get('sent'):
+            batch['sent'] = True
+            asyncio.ensure_future(self._run_batch(batch['items'], user_query))
 
-def get_listing_links(driver):
-    """Get links to individual listings and their prices from the search results page."""
+    async def _run_batch(self, items, user_query):
+        tracer.incr('llm_batches')
+        schema, phrases = build_extraction_schema(user_query)
+        messages = build_batch_extraction_messages([(url, text) for url, text, _ in items], user_query)
+        records = {}
+        try:
+            with tracer.listing(None):  # The request is shared by every listing in the batch
+                content = await self._complete(
+                    messages,
+                    max_tokens=min(4096, 100 + 60 * len(phrases) * len(items)),
+                    model=BATCH_EXTRACTION_MODEL,
+                    response_format={"type": "json_schema", "json_schema": {
+                        "name": "listing_extraction", "strict": True, "schema": schema,
+                    }},
+                )
+            for record in json.loads(content)['listings']:
+                records[record.get('url')] = {phrase: record.get(name) for name, phrase in phrases.items()}
+        except Exception:
+            pass  # Every listing falls back to its own request below
+        missing = [(text, future) for url, text, future in items if url not in records]
+        fallbacks = await asyncio.gather(*(self._extract_one(text, user_query) for text, _ in missing))
+        results = dict(zip((future for _, future in missing), fallbacks))
+        for url, text, future in items:
+            if not future.done():
+                future.set_result(results[future] if future in results else records[url])
+
+
+@st.cache_resource(show_spinner=False)
+def get_async_extractor():
+    """Return the process-wide AsyncExtractor and its event loop thread."""
+    return AsyncExtractor(cache=LLMCache())
+
+
+
+# How to find a search result card and read its fields. For each key the
+# selectors are tried in order and the first non-empty match wins;
+# "selector@attr" reads an attribute instead of the element's text.
+CARD_SELECTORS = {
+    'card': ['div[itemprop="itemListElement"]', 'div[data-testid="card-container"]'],
+    'url': ['meta[itemprop="url"]@content', 'a[href*="/rooms/"]@href'],
+    'price': ['span._11jcbg2', 'div[data-testid="price-availability-row"] span[aria-hidden="true"]',
+              'div[data-testid="price-availability-row"]'],
+    'title': ['meta[itemprop="name"]@content', 'div[data-testid="listing-card-title"]'],
+}
+
+# Reads the cards not returned by earlier calls on this page as compact records
+CARD_COLLECTOR_SCRIPT = """
+const selectors = arguments[0];
+if (!window.__scraperCards) { window.__scraperCards = new Set(); }
+const seen = window.__scraperCards;
+const pick = (root, specs) => {
+    for (const spec of specs) {
+        const at = spec.lastIndexOf('@');
+        const element = root.querySelector(at > 0 ? spec.slice(0, at) : spec);
+        const value = element && (at > 0 ? element.getAttribute(spec.slice(at + 1)) : element.textContent);
+        if (value && value.trim()) { return value.replace(/\\s+/g, ' ').trim(); }
+    }
+    return null;
+};
+const cards = [];
+for (const cardSelector of selectors.card) {
+    const elements = document.querySelectorAll(cardSelector);
+    if (!elements.length) { continue; }
+    for (const element of elements) {
+        const url = pick(element, selectors.url);
+        if (!url || seen.has(url.split('?')[0])) { continue; }
+        seen.add(url.split('?')[0]);
+        cards.push({url: url.split('?')[0], price: pick(element, selectors.price), title: pick(element, selectors.title)});
+    }
+    break;
+}
+return cards;
+"""
+
+
+def card_record(url, price, title=None):
+    """Return the listing record for one search result card and log it."""
+    price = price or "No price available"
+    logger.info(f"Found listing: {url} with price: {price}")
+    return {'url': url, 'price': price, 'title': title}
+
+
+def search_ready_selectors(selectors=None):
+    """Readiness selectors for a search page: a match for any of the card selectors is enough."""
+    return [', '.join((selectors or CARD_SELECTORS)['card'])]  # A CSS selector list matches any of its parts
+
+
+def get_listing_links(driver, selectors=None, on_cards=None, max_scrolls=30):
+    """Get links to individual listings and their prices from the search results page.
+
+    Cards are read inside the page after every scroll step, so only compact
+    records cross the WebDriver connection; scrolling stops as soon as a
+    step turns up no new cards. ``on_cards`` receives each step's new cards.
+    """
+    selectors = selectors or CARD_SELECTORS
+    listings_info = []
     try:
-        wait = WebDriverWait(driver, 30)
-        time.sleep(5)  # Wait for initial load
-        
-        # Scroll to load all content
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        while True:
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
+        wait_for_page_ready(driver, search_ready_selectors(selectors), timeout=30, label='search page')
+        for step in range(max_scrolls):
+            with tracer.span('collect cards'):
+                cards = [card_record(card['url'], card['price'], card['title'])
+                         for card in driver.execute_script(CARD_COLLECTOR_SCRIPT, selectors)]
+            if step and not cards:
                 break
-            last_height = new_height
-        
-        # Parse listings and prices
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        unique_links = set()
-        listings_info = []
-
-        listing_elements = soup.find_all('div', {'itemprop': 'itemListElement'})
-
-        for element in listing_elements:
-            url_meta = element.find('meta', {'itemprop': 'url'})
-            price_span = element.find('span', class_="_11jcbg2")
-            if url_meta and url_meta.get('content') and price_span:
-                url = url_meta['content'].split('?')[0]  # Clean the URL
-                price = price_span.text.strip() if price_span else "No price available"
-                listings_info.append({'url': url, 'price': price})
-                unique_links.add(url)
-                st.write(f"Found listing: {url} with price: {price}")
-        
-        st.write(f"Total unique listings found: {len(listings_info)}")
-        return listings_info
+            listings_info.extend(cards)
+            if cards and on_cards is not None:
+                on_cards(cards)
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            wait_for_page_ready(driver, timeout=5, label='search scroll')
         
     except TimeoutException:
-        st.error("Timeout while loading listing cards.")
-        return []
+        logger.error("Timeout while loading listing cards.")
     except Exception as e:
-        st.error(f"Error in get_listing_links: {e}")
-        return []
-def process_listing(driver, link, user_query):
-    """Process an individual listing and extract relevant information."""
+        logger.error(f"Error in get_listing_links: {e}")
+    logger.info(f"Total unique listings found: {len(listings_info)}")
+    return listings_info
+
+def _select_value(root, specs):
+    """Python twin of the collector script's ``pick()`` for parsed HTML."""
+    for spec in specs:
+        selector, _, attr = spec.rpartition('@') if '@' in spec else (spec, '', '')
+        element = root.select_one(selector)
+        value = element and (element.get(attr) if attr else element.get_text())
+        if value and value.strip():
+            return ' '.join(value.split())
+    return None
+
+
+def parse_listing_cards(html_content, selectors=None):
+    """Read listing URLs and prices from search results page HTML."""
+    selectors = selectors or CARD_SELECTORS
+    soup = BeautifulSoup(html_content, 'html.parser')
+    unique_links = set()
+    listings_info = []
+
+    for card_selector in selectors['card']:
+        listing_elements = soup.select(card_selector)
+        if listing_elements:
+            break
+
+    for element in listing_elements:
+        url = _select_value(element, selectors['url'])
+        if url and url.split('?')[0] not in unique_links:
+            url = url.split('?')[0]  # Clean the URL
+            listings_info.append(card_record(url, _select_value(element, selectors['price']),
+                                             _select_value(element, selectors['title'])))
+            unique_links.add(url)
+    
+    logger.info(f"Total unique listings found: {len(listings_info)}")
+    return listings_info
+
+
+def search_cards_key(page_url):
+    """PageStore key under which a search page's cards are kept as JSON."""
+    return f"{page_url}#cards"
+
+AIRBNB_BASE_URL = "https://www.airbnb.com"
+
+
+def normalize_listing_url(link):
+    """Return an absolute https URL for a listing link."""
+    if link.startswith('http'):
+        return link
+    if link.startswith('//'):
+        return f"https:{link}"
+    if link.startswith('/'):
+        return f"{AIRBNB_BASE_URL}{link}"  # Site-relative path
+    return f"https://{link}"
+
+
+def canonical_listing_url(link):
+    """Return the absolute listing URL without query string, used as a cache key."""
+    return normalize_listing_url(link).split('?')[0]
+
+
+class HostRateLimiter:
+    """Thread-safe limiter that spaces out requests to the same host."""
+
+    def __init__(self, min_interval=3.0):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Block until a request to the host of ``url`` is allowed."""
+        host = urlparse(normalize_listing_url(url)).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ListingWorkerPool:
+    """Process listings concurrently on browsers leased from a DriverPool; results() keeps submission order."""
+
+    def __init__(self, user_query, driver_pool, workers=2, rate_limiter=None, extractor=None,
+                 page_store=None, max_age=None, offline=False, http_fetcher=None, batched=False,
+                 fingerprints=None, lookahead=0, tab_timeout=30):
+        self.user_query = user_query
+        self.driver_pool = driver_pool
+        self.extractor = extractor
+        self.page_store = page_store
+        self.http_fetcher = http_fetcher
+        self.max_age = max_age
+        self.offline = offline
+        self.batched = batched
+        self.fingerprints = fingerprints
+        self.lookahead = 0 if offline else max(0, int(lookahead))
+        self.tab_timeout = tab_timeout
+        self.workers = max(1, int(workers))
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._submitted = 0
+        self._closed = False
+        self._undecided = 0  # Listings being worked on that may still join a batch
+
+    def start(self):
+        """Launch the worker threads."""
+        if self.batched:
+            self.extractor = self.extractor or get_async_extractor()
+        ctx = get_script_run_ctx(suppress_warning=True)
+        target = self._run_lookahead_worker if self.lookahead else self._run_worker
+        for worker_id in range(self.workers):
+            thread = threading.Thread(target=target, daemon=True)
+            attach_script_run_ctx(thread, ctx)  # Let workers report to the Streamlit page
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    @property
+    def submitted(self):
+        return self._submitted
+
+    def submit(self, listing, result=None):
+        """Queue a listing dict (with 'url' and 'price') for processing.
+
+        A listing whose ``result`` is already known (e.g. resumed from a
+        journal) skips the workers but keeps its place in the result order.
+        """
+        with self._lock:
+            idx = self._submitted
+            self._submitted += 1
+        if result is not None:
+            self._results.put((idx, listing, result))
+        else:
+            self._tasks.put((idx, listing))
+        return idx
+
+    def close(self):
+        """Signal that no more listings will be submitted."""
+        with self._lock:
+            self._closed = True
+        for _ in self._threads:
+            self._tasks.put(None)
+        self._results.put(None)  # Wake results() in case nothing is outstanding
+
+    def results(self):
+        """Yield finished listings in submission order as they complete."""
+        pending = {}
+        next_idx = 0
+        while True:
+            while next_idx in pending:
+                yield pending.pop(next_idx)
+                next_idx += 1
+            with self._lock:
+                if self._closed and next_idx >= self._submitted:
+                    return
+            item = self._results.get()
+            if item is not None:
+                pending[item[0]] = item
+
+    def _listing_started(self):
+        with self._lock:
+            self._undecided += 1
+
+    def _listing_decided(self, joins_batch=False):
+        """A listing can no longer join a batch; returns True when no other listing still can.
+
+        When the last such listing goes another way, open batches are sent
+        instead of waiting out the extractor's ``batch_linger``.
+        """
+        with self._lock:
+            self._undecided -= 1
+            idle = self._undecided == 0
+        if idle and not joins_batch and self.batched:
+            self.extractor.flush_batches()
+        return idle
+
+    @contextmanager
+    def _batch_candidate(self):
+        """Count a listing as a possible batch member until its plan is known; yields ``batch_decided``."""
+        decided = []
+        self._listing_started()
+
+        def batch_decided(joins):
+            decided.append(joins)
+            return self._listing_decided(joins)
+
+        try:
+            yield batch_decided
+        finally:
+            if not decided:
+                self._listing_decided()
+
+    def _run_worker(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            idx, listing = task
+            try:
+                with tracer.listing(canonical_listing_url(listing['url'])), tracer.span('listing'), \
+                        self._batch_candidate() as batch_decided:
+                    html_content = get_listing_html(listing['url'], self.driver_pool, self.rate_limiter,
+                                                    self.page_store, self.max_age, self.offline,
+                                                    self.http_fetcher, browser=self.driver_pool is not None)
+                    if html_content:
+                        result = extract_listing(html_content, self.user_query, self.extractor,
+                                                 link=listing['url'], batched=self.batched,
+                                                 fingerprints=self.fingerprints, batch_decided=batch_decided)
+                    else:
+                        result = f"Error: Unable to load content for {normalize_listing_url(listing['url'])}"
+            except Exception as e:
+                logger.error(f"Error processing listing: {str(e)}")
+                result = f"Error processing listing: {str(e)}"
+            self._results.put((idx, listing, result))
+
+    def _run_lookahead_worker(self):
+        ctx = get_script_run_ctx(suppress_warning=True)
+        # Extracts the current listing while this thread loads the next ones
+        extraction = ThreadPoolExecutor(max_workers=1,
+                                        initializer=lambda: attach_script_run_ctx(threading.current_thread(), ctx))
+        extracting = None
+        stopping = False
+        try:
+            while not stopping:
+                try:
+                    task = self._tasks.get_nowait()
+                except queue.Empty:
+                    if extracting is not None:
+                        self._results.put(extracting.result())  # Nothing queued to overlap it with
+                        extracting = None
+                    task = self._tasks.get()
+                if task is None:
+                    break
+                # A batch is the current listing's tab plus up to ``lookahead`` upcoming ones. The
+                # browser goes back to the pool after each batch, so the search crawler and other
+                # workers get a turn instead of waiting for the queue to run dry
+                prefetcher = TabPrefetcher(self.driver_pool, self.lookahead + 1, self.tab_timeout)
+                upcoming = collections.deque([self._prefetch(task, prefetcher)])
+                try:
+                    while (not stopping and len(upcoming) <= self.lookahead
+                           and len(upcoming) < self.driver_pool.max_pages_per_driver):
+                        try:
+                            task = self._tasks.get_nowait()
+                        except queue.Empty:
+                            break
+                        if task is None:
+                            stopping = True
+                        else:
+                            upcoming.append(self._prefetch(task, prefetcher))
+                    while upcoming:
+                        idx, listing, html_content, started = upcoming.popleft()
+                        html_content = self._take(listing, html_content, prefetcher)
+                        if extracting is not None:
+                            self._results.put(extracting.result())
+                        extracting = extraction.submit(self._extract, idx, listing, html_content, started)
+                finally:
+                    prefetcher.close()
+        finally:
+            if extracting is not None:
+                self._results.put(extracting.result())
+            extraction.shutdown()
+
+    def _prefetch(self, task, prefetcher):
+        """Read a listing from a cheap tier, or start loading it in a background tab."""
+        idx, listing = task
+        started = time.monotonic()
+        html_content = None
+        try:
+            with tracer.listing(canonical_listing_url(listing['url'])):
+                html_content = get_listing_html(listing['url'], self.driver_pool, self.rate_limiter,
+                                                self.page_store, self.max_age, http_fetcher=self.http_fetcher,
+                                                browser=False)
+                if html_content is None:
+                    if self.http_fetcher is None:  # Otherwise the HTTP tier already waited its turn
+                        self.rate_limiter.wait(listing['url'])
+                    prefetcher.open(listing['url'])
+        except Exception as e:
+            logger.error(f"Error prefetching listing: {str(e)}")
+        return idx, listing, html_content, started
+
+    def _take(self, listing, html_content, prefetcher):
+        """Return the listing's HTML, from its tab or by loading it now if no tab was opened."""
+        if html_content is not None:
+            return html_content
+        link = listing['url']
+        try:
+            with tracer.listing(canonical_listing_url(link)), tracer.span('browser fetch'):
+                if link in prefetcher:
+                    html_content = prefetcher.take(link)
+                else:
+                    self.rate_limiter.wait(link)
+                    html_content = prefetcher.fetch(link)
+        except Exception as e:
+            logger.error(f"Error loading listing: {str(e)}")
+            return None
+        if html_content:
+            fetch_tier_stats.record('browser')
+            if self.page_store is not None:
+                self.page_store.put(canonical_listing_url(link), html_content)
+        return html_content
+
+    def _extract(self, idx, listing, html_content, started):
+        with tracer.listing(canonical_listing_url(listing['url'])), self._batch_candidate() as batch_decided:
+            try:
+                if html_content:
+                    result = extract_listing(html_content, self.user_query, self.extractor,
+                                             link=listing['url'], batched=self.batched,
+                                             fingerprints=self.fingerprints, batch_decided=batch_decided)
+                else:
+                    result = f"Error: Unable to load content for {normalize_listing_url(listing['url'])}"
+            except Exception as e:
+                logger.error(f"Error processing listing: {str(e)}")
+                result = f"Error processing listing: {str(e)}"
+            tracer.record_span('listing', time.monotonic() - started, ok=not is_error_result(result))
+        return idx, listing, result
+
+
+@st.cache_resource(show_spinner=False)
+def get_clean_pool(processes):
+    """Return the process-wide worker processes for the pipeline's clean stage, kept across runs."""
+    # Forked workers would copy the event loop and browser lease threads mid-flight
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+
+_Finished = collections.namedtuple('_Finished', 'result')  # A listing that skips the remaining stages
+
+
+class ListingPipeline(ListingWorkerPool):
+    """Process listings as fetch, clean (worker processes), chunk, LLM and sink stages joined by bounded queues."""
+
+    def __init__(self, user_query, driver_pool, workers=2, rate_limiter=None, extractor=None,
+                 page_store=None, max_age=None, offline=False, http_fetcher=None, batched=False,
+                 fingerprints=None, clean_processes=2, chunk_workers=1, llm_in_flight=16, queue_size=4,
+                 sample_interval=0.5):
+        super().__init__(user_query, driver_pool, workers=workers, rate_limiter=rate_limiter, extractor=extractor,
+                         page_store=page_store, max_age=max_age, offline=offline, http_fetcher=http_fetcher,
+                         batched=batched, fingerprints=fingerprints)
+        self.clean_processes = max(1, int(clean_processes))
+        self.chunk_workers = max(1, int(chunk_workers))
+        self.llm_in_flight = max(1, int(llm_in_flight))
+        self.sample_interval = sample_interval
+        self._clean_queue = queue.Queue(maxsize=queue_size)
+        self._chunk_queue = queue.Queue(maxsize=queue_size)
+        self._llm_queue = queue.Queue(maxsize=queue_size)
+        self._sink_queue = queue.Queue()  # Filled from the event loop thread, which must never block
+        self._llm_slots = threading.Semaphore(self.llm_in_flight)
+        self._in_flight = 0
+        self._done = threading.Event()
+        self._clean_pool = None
+
+    def start(self):
+        """Start the worker processes and every stage's threads."""
+        self.extractor = self.extractor or get_async_extractor()
+        self._clean_pool = get_clean_pool(self.clean_processes)
+        ctx = get_script_run_ctx(suppress_warning=True)
+        self._threads = self._start_stage(self._fetch, self.workers, self._tasks, self._clean_queue,
+                                          self.clean_processes, ctx)
+        self._start_stage(self._clean, self.clean_processes, self._clean_queue, self._chunk_queue,
+                          self.chunk_workers, ctx)
+        self._start_stage(self._chunk, self.chunk_workers, self._chunk_queue, self._llm_queue, 1, ctx)
+        for target in (self._run_llm_stage, self._run_sink, self._sample_queues):
+            self._start_thread(target, ctx)
+        return self
+
+    def submit(self, listing, result=None):
+        if result is None:
+            self._listing_started()  # Counted until the chunk stage knows whether it joins a batch
+        return super().submit(listing, result)
+
+    @staticmethod
+    def _start_thread(target, ctx):
+        thread = threading.Thread(target=target, daemon=True)
+        attach_script_run_ctx(thread, ctx)  # Let stages report to the Streamlit page
+        thread.start()
+        return thread
+
+    def _start_stage(self, handle, count, inbox, outbox, downstream, ctx):
+        """Run ``handle(listing, value)`` on ``count`` threads from ``inbox`` to ``outbox``, then stop the next stage."""
+        running = [count]
+        lock = threading.Lock()
+
+        def run():
+            while True:
+                item = inbox.get()
+                if item is None:
+                    break
+                idx, listing, value, started = item if len(item) == 4 else (*item, None, time.monotonic())
+                try:
+                    with tracer.listing(canonical_listing_url(listing['url'])):
+                        value = handle(listing, value)
+                except Exception as e:
+                    logger.error(f"Error processing listing: {str(e)}")
+                    value = _Finished(f"Error processing listing: {str(e)}")
+                if isinstance(value, _Finished):
+                    self._listing_decided()
+                (self._sink_queue if isinstance(value, _Finished) else outbox).put((idx, listing, value, started))
+            with lock:
+                running[0] -= 1
+                last = running[0] == 0
+            if last:
+                for _ in range(downstream):
+                    outbox.put(None)
+
+        return [self._start_thread(run, ctx) for _ in range(count)]
+
+    def _fetch(self, listing, _):
+        html_content = get_listing_html(listing['url'], self.driver_pool, self.rate_limiter, self.page_store,
+                                        self.max_age, self.offline, self.http_fetcher,
+                                        browser=self.driver_pool is not None)
+        if not html_content:
+            return _Finished(f"Error: Unable to load content for {normalize_listing_url(listing['url'])}")
+        return html_content
+
+    def _clean(self, listing, html_content):
+        with tracer.span('clean (process)'):
+            try:
+                cleaned, spans = self._clean_pool.submit(clean_listing_in_process, html_content,
+                                                         self.user_query).result()
+                tracer.record_spans(spans)  # The worker's own tracer is not this one
+            except BrokenProcessPool:
+                get_clean_pool.clear()  # The next run starts new worker processes
+                cleaned = clean_listing(html_content, self.user_query)  # Worker processes could not start
+            except Exception as e:
+                logger.error(f"Error cleaning listing: {str(e)}")
+                return _Finished(f"Error processing listing: {str(e)}")
+        return _Finished(cleaned[0]) if cleaned[1] is None else cleaned
+
+    def _chunk(self, listing, cleaned):
+        plan = plan_extraction(cleaned, self.extractor, listing['url'], self.batched, self.fingerprints)
+        return _Finished(plan['result']) if 'result' in plan else plan
+
+    def _run_llm_stage(self):
+        while True:
+            item = self._llm_queue.get()
+            if item is None:
+                break
+            idx, listing, plan, started = item
+            flush = self._listing_decided('batch_text' in plan)
+            self._llm_slots.acquire()  # At most llm_in_flight requests outstanding
+            try:
+                with tracer.listing(canonical_listing_url(listing['url'])):
+                    future = submit_extraction(plan, self.extractor, flush)
+            except Exception as e:
+                self._llm_slots.release()
+                logger.error(f"Error processing listing: {str(e)}")
+                self._sink_queue.put((idx, listing, _Finished(f"Error processing listing: {str(e)}"), started))
+                continue
+            with self._lock:
+                self._in_flight += 1
+            future.add_done_callback(functools.partial(self._llm_done, idx, listing, plan, started, time.monotonic()))
+        for _ in range(self.llm_in_flight):
+            self._llm_slots.acquire()  # Wait for the requests still in flight
+        self._sink_queue.put(None)
+
+    def _llm_done(self, idx, listing, plan, started, submitted, future):
+        # Runs on the extractor's event loop thread, so only hand the answer on
+        tracer.record_span('llm wait', time.monotonic() - submitted, listing=canonical_listing_url(listing['url']))
+        with self._lock:
+            self._in_flight -= 1
+        self._llm_slots.release()
+        self._sink_queue.put((idx, listing, (plan, future), started))
+
+    def _run_sink(self):
+        while True:
+            item = self._sink_queue.get()
+            if item is None:
+                break
+            idx, listing, value, started = item
+            with tracer.listing(canonical_listing_url(listing['url'])):
+                if isinstance(value, _Finished):
+                    result = value.result
+                else:
+                    plan, future = value
+                    try:
+                        result = finish_extraction(plan, future.result(), self.fingerprints)
+                    except Exception as e:
+                        logger.error(f"Error processing listing: {str(e)}")
+                        result = f"Error processing listing: {str(e)}"
+                tracer.record_span('listing', time.monotonic() - started, ok=not is_error_result(result))
+            self._results.put((idx, listing, result))
+        self._done.set()
+
+    def _sample_queues(self):
+        queues = {'fetch': self._tasks, 'clean': self._clean_queue, 'chunk': self._chunk_queue,
+                  'llm': self._llm_queue, 'sink': self._sink_queue}
+        while not self._done.wait(self.sample_interval):
+            for name, stage_queue in queues.items():
+                tracer.record_queue_depth(name, stage_queue.qsize())
+            tracer.record_queue_depth('llm in flight', self._in_flight)
+
+
+SEARCH_PAGE_SIZE = 18  # Listings per Airbnb search results page
+LISTING_ID_PATTERN = re.compile(r'/rooms/(?:plus/)?(\d+)')
+
+
+def search_page_urls(search_url, max_pages, page_size=SEARCH_PAGE_SIZE):
+    """Return the URLs of the first ``max_pages`` results pages of a search.
+
+    Airbnb paginates with an ``items_offset`` parameter plus a base64 JSON
+    ``cursor``; both are set so either style of pagination is honoured.
+    """
+    parsed = urlparse(search_url)
+    params = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+              if key not in ('items_offset', 'cursor', 'section_offset')]
+    urls = [search_url]
+    for page in range(1, max_pages):
+        offset = page * page_size
+        cursor = json.dumps({"section_offset": 0, "items_offset": offset, "version": 1}, separators=(',', ':'))
+        page_params = params + [
+            ('items_offset', str(offset)),
+            ('cursor', base64.b64encode(cursor.encode('utf-8')).decode('ascii')),
+        ]
+        urls.append(parsed._replace(query=urlencode(page_params)).geturl())
+    return urls
+
+
+def listing_key(link):
+    """Return a stable identity for a listing: its room ID, else its canonical URL."""
+    match = LISTING_ID_PATTERN.search(link)
+    return f"room:{match.group(1)}" if match else canonical_listing_url(link)
+
+
+class ListingIndex:
+    """Thread-safe set of listings already seen, for deduplicating across pages."""
+
+    def __init__(self):
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def add(self, listing):
+        """Record the listing; returns False if it was seen before."""
+        key = listing_key(listing['url'])
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            return True
+
+    def __len__(self):
+        return len(self._seen)
+
+
+class SearchCrawler:
+    """Fetch several search results pages concurrently and stream out their listings.
+
+    Each results page is loaded on its own pooled browser; new listings
+    are passed to ``on_listing`` as soon as their page is parsed, so
+    processing starts before the whole search has been crawled.
+    """
+
+    def __init__(self, search_url, driver_pool, max_pages=1, workers=2, rate_limiter=None,
+                 page_store=None, offline=False, card_selectors=None):
+        self.search_url = search_url
+        self.driver_pool = driver_pool
+        self.max_pages = max(1, int(max_pages))
+        self.workers = max(1, int(workers))
+        self.rate_limiter = rate_limiter
+        self.page_store = page_store
+        self.offline = offline
+        self.card_selectors = card_selectors
+        self.index = ListingIndex()
+        self.pages_done = 0
+        self._lock = threading.Lock()
+
+    def start(self, on_listing, on_done=None):
+        """Crawl in a background thread; ``on_done`` runs once every page is handled."""
+        thread = threading.Thread(target=self.crawl, args=(on_listing, on_done), daemon=True)
+        attach_script_run_ctx(thread, get_script_run_ctx(suppress_warning=True))
+        thread.start()
+        return thread
+
+    def crawl(self, on_listing, on_done=None):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for page_url in search_page_urls(self.search_url, self.max_pages):
+                    executor.submit(self._crawl_page, page_url, on_listing)
+        finally:
+            if on_done is not None:
+                on_done()
+
+    def _crawl_page(self, page_url, on_listing):
+        def add_cards(cards):
+            for listing in cards:
+                if self.index.add(listing):
+                    on_listing(listing)
+
+        try:
+            self._fetch_cards(page_url, add_cards)
+        except Exception as e:
+            logger.error(f"Error crawling search page {page_url}: {str(e)}")
+        finally:
+            with self._lock:
+                self.pages_done += 1
+
+    def _fetch_cards(self, page_url, on_cards):
+        if self.offline:
+            if self.page_store is None:
+                return
+            cards = self.page_store.get(search_cards_key(page_url))
+            if cards is not None:
+                on_cards(json.loads(cards))
+                return
+            search_html = self.page_store.get(page_url)  # Stored before cards were kept as JSON
+            if search_html:
+                on_cards(parse_listing_cards(search_html, self.card_selectors))
+            return
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(page_url)
+        with self.driver_pool.lease() as driver:
+            driver.get(page_url)
+            # Listings go to the workers after each scroll step, while the page is still being read
+            listings_info = get_listing_links(driver, self.card_selectors, on_cards=on_cards)
+        if listings_info and self.page_store is not None:
+            self.page_store.put(search_cards_key(page_url), json.dumps(listings_info, ensure_ascii=False))
+
+
+def fetch_listing_html(driver, link):
+    """Render a listing in a new tab and return its HTML, or None if it never loaded."""
     original_window = driver.current_window_handle  # Store the original window handle
-    if not link.startswith('http'):
-        link = f"https://{link if link.startswith('/') else '/' + link}"
+    link = normalize_listing_url(link)
     
     try:
         # Create new window with proper JavaScript execution
+        handles_before = set(driver.window_handles)
         driver.execute_script("window.open('about:blank', '_blank');")
         
-        # Wait for the new window and switch to it
-        WebDriverWait(driver, 10).until(EC.number_of_windows_to_be(2))
+        # Wait for the new window (other tabs may be open, e.g. prefetching) and switch to it
+        WebDriverWait(driver, 10).until(lambda d: set(d.window_handles) - handles_before)
         
         # Switch to the new window
-        new_window = [window for window in driver.window_handles if window != original_window][0]
+        new_window = (set(driver.window_handles) - handles_before).pop()
         driver.switch_to.window(new_window)
+        apply_resource_policy(driver)  # URL blocking is per tab
         
         # Load the listing page with wait
-        driver.get(link)
-        time.sleep(3)  # Wait for initial load
+        with tracer.span('driver.get'):
+            driver.get(link)
+        with tracer.span('page ready'):
+            wait_for_page_ready(driver, LISTING_READY_SELECTORS, timeout=15, label='listing page')
         
         # Get HTML content
-        html_content = get_html_content(driver)
-        if not html_content:
-            return f"Error: Unable to load content for {link}"
-        
-        # Process the content
-        parsed_html = parse_html(html_content)
-        clean_content_data = clean_content(parsed_html)
-        
-        # Only split if content is too long
-        if len(clean_content_data) > 4000:  # Approximate token limit
-            text_chunks = split_text(clean_content_data)
-            extracted_info = []
-            for chunk in text_chunks:
-                info = extract_content_with_openai(chunk, user_query)
-                extracted_info.append(info)
-            result = " ".join(extracted_info)
-        else:
-            # Single extraction for shorter content
-            result = extract_content_with_openai(clean_content_data, user_query)
-            
-    except Exception as e:
-        st.error(f"Error processing listing: {str(e)}")
-        return f"Error processing listing: {str(e)}"
+        return get_html_content(driver)
         
     finally:
         try:
             # Properly close the new window and switch back
-            if len(driver.window_handles) > 1:
+            if driver.current_window_handle != original_window:
                 driver.close()  # Close current window
                 driver.switch_to.window(original_window)  # Switch back to original
-            elif driver.current_window_handle != original_window:
-                driver.switch_to.window(original_window)
         except Exception as e:
-            st.error(f"Error handling browser tabs: {str(e)}")
+            logger.error(f"Error handling browser tabs: {str(e)}")
+
+
+class TabPrefetcher:
+    """Load upcoming listings in at most ``max_tabs`` background tabs of one pooled browser, leased on first use."""
+
+    def __init__(self, driver_pool, max_tabs=2, timeout=30):
+        self.driver_pool = driver_pool
+        self.max_tabs = max(1, int(max_tabs))
+        self.timeout = timeout
+        self.driver = None
+        self.pages = 0
+        self._lease = ExitStack()
+        self._tabs = {}
+
+    def __contains__(self, link):
+        return normalize_listing_url(link) in self._tabs
+
+    def _browser(self):
+        if self.driver is None:
+            self.driver = self._lease.enter_context(self.driver_pool.lease())
+            self.home = self.driver.current_window_handle
+        self.pages += 1
+        return self.driver
+
+    def open(self, link):
+        """Start loading ``link`` in a new tab; returns False if ``max_tabs`` are already open."""
+        link = normalize_listing_url(link)
+        if len(self._tabs) >= self.max_tabs:
+            return False
+        driver = self._browser()
+        driver.switch_to.new_window('tab')
+        try:
+            self._tabs[link] = (driver.current_window_handle, time.monotonic())
+            apply_resource_policy(driver)  # URL blocking is per tab
+            # Unlike driver.get(), assigning the location does not wait for the page to load
+            driver.execute_script("window.location.href = arguments[0];", link)
+        finally:
+            driver.switch_to.window(self.home)
+        return True
+
+    def take(self, link):
+        """Return the HTML of a prefetched listing, or None if it was not opened."""
+        link = normalize_listing_url(link)
+        if link not in self._tabs:
+            return None
+        handle, opened_at = self._tabs.pop(link)
+        driver = self.driver
+        try:
+            driver.switch_to.window(handle)
+            remaining = self.timeout - (time.monotonic() - opened_at)
+            with tracer.span('page ready'):
+                report = wait_for_page_ready(driver, LISTING_READY_SELECTORS, timeout=max(1.0, remaining),
+                                             label='prefetched listing')
+            if report['missing']:  # Like fetch_listing_html(), the page is used as far as it rendered
+                logger.warning(f"Prefetched tab for {link} did not render within {self.timeout}s")
+            return get_html_content(driver)
+        finally:
+            self._close_tab(handle)
+
+    def fetch(self, link):
+        """Load ``link`` right away in a tab of this browser."""
+        return fetch_listing_html(self._browser(), link)
+
+    def close(self):
+        """Close the tabs that were not taken and return the browser to the pool.
+
+        The browser is returned even if it crashed; the pool's health check
+        retires it.
+        """
+        if self.driver is None:
+            return
+        try:
+            self.driver.pages_loaded = self.pages
+            for handle, _ in self._tabs.values():
+                self._close_tab(handle)
+        finally:
+            self._tabs = {}
+            self.driver = None
+            self._lease.close()
+
+    def _close_tab(self, handle):
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+            self.driver.switch_to.window(self.home)
+        except WebDriverException as e:
+            logger.error(f"Error handling browser tabs: {str(e)}")
+
+
+class FetchTierStats:
+    """Thread-safe count of which tier served each listing page."""
+
+    TIERS = ('page_store', 'http', 'browser')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.counts = {tier: 0 for tier in self.TIERS}
+            self.counts['http_escalated'] = 0
+
+    def record(self, tier):
+        with self._lock:
+            self.counts[tier] += 1
+
+
+fetch_tier_stats = FetchTierStats()
+
+
+def get_listing_html(link, driver_pool, rate_limiter=None, page_store=None, max_age=None, offline=False,
+                     http_fetcher=None, browser=True):
+    """Return listing HTML from the cheapest tier with usable content: page store, HTTP, then the browser."""
+    key = canonical_listing_url(link)
+    if page_store is not None and (offline or max_age):
+        with tracer.span('page store'):
+            html_content = page_store.get(key, None if offline else max_age)
+        if html_content is not None:
+            fetch_tier_stats.record('page_store')
+        if html_content is not None or offline:
+            return html_content
+    if http_fetcher is None and not browser:
+        return None
+    if rate_limiter is not None:
+        rate_limiter.wait(link)
+    html_content = None
+    if http_fetcher is not None:
+        with tracer.span('http fetch'):
+            html_content = http_fetcher.fetch(normalize_listing_url(link))
+        if html_content and has_listing_data(html_content):
+            fetch_tier_stats.record('http')
+        else:
+            html_content = None
+            fetch_tier_stats.record('http_escalated')
+    if html_content is None and browser:
+        with tracer.span('browser fetch'), driver_pool.lease() as driver:
+            html_content = fetch_listing_html(driver, link)
+        if html_content:
+            fetch_tier_stats.record('browser')
+    if html_content and page_store is not None:
+        page_store.put(key, html_content)
+    return html_content
+
+
+def extract_listing(html_content, user_query, extractor=None, link=None, batched=False, fingerprints=None,
+                    batch_decided=None):
+    """Extract the requested information from listing HTML, sending only what embedded JSON and fingerprints lack."""
+    cleaned = clean_listing(html_content, user_query)
+    if cleaned[1] is None:
+        return cleaned[0]  # Everything answered without the LLM
+    extractor = extractor or get_async_extractor()
+    plan = plan_extraction(cleaned, extractor, link, batched, fingerprints)
+    flush = batch_decided('batch_text' in plan) if batch_decided is not None else False
+    if 'result' in plan:
+        return plan['result']
+    with tracer.span('llm wait'):
+        answer = submit_extraction(plan, extractor, flush).result()
+    return finish_extraction(plan, answer, fingerprints)
+
+
+def plan_extraction(cleaned, extractor, link=None, batched=False, fingerprints=None):
+    """Work out what of a cleaned listing still has to go to the model; a ``'result'`` plan needs no LLM call."""
+    structured, remaining_query, text = cleaned
+    if remaining_query is None:
+        return {'result': structured}
+    plan = {'structured': structured, 'query': remaining_query, 'link': link, 'key': None, 'previous': None}
+    if fingerprints is not None and link:
+        key = canonical_listing_url(link)
+        plan.update(key=key, text_hash=fingerprint(text), sections=section_fingerprints(text))
+        if not extractor.bypass_cache:
+            plan['previous'] = fingerprints.get(key, remaining_query)
+        previous = plan['previous']
+        if previous is not None and previous['text_hash'] == plan['text_hash']:
+            fingerprints.record('unchanged', llm_calls_avoided=previous['llm_calls'])
+            return {'result': combine_extraction(structured, previous['result'])}
     
+    # Keep only the sections relevant to the query, packed into as few chunks as possible
+    with tracer.span('select chunks'):
+        text_chunks = select_relevant_chunks(
+            text, remaining_query,
+            token_budget=LISTING_TOKEN_BUDGET, max_chunk_tokens=CHUNK_MAX_TOKENS,
+        ) or [text]
+    # A chunk whose text is unchanged keeps its previous answer; a batched answer (a dict
+    # from another model and prompt) is stored under its own key so the two never mix
+    batch = batched and link and len(text_chunks) == 1 \
+        and get_text_context().count_tokens(text_chunks[0]) <= BATCH_LISTING_MAX_TOKENS
+    prefix = 'batch ' if batch else ''
+    plan['known'] = plan['previous']['chunk_results'] if plan['previous'] else {}
+    plan['hashes'] = [prefix + fingerprint(chunk) if plan['key'] else None for chunk in text_chunks]
+    plan['missing'] = [chunk for chunk, chunk_hash in zip(text_chunks, plan['hashes'])
+                       if chunk_hash not in plan['known']]
+    if batch and plan['missing']:
+        plan['batch_text'] = plan['missing'][0]
+    return plan
+
+
+def submit_extraction(plan, extractor, flush=False):
+    """Send a plan's text to the model (``flush`` sends its batch now); returns a Future of the answer(s)."""
+    # All chunks go out concurrently and share the extractor's rate limits
+    if 'batch_text' in plan:
+        return extractor.extract_batched(plan['link'], plan['batch_text'], plan['query'], flush)
+    if plan['missing']:
+        return extractor.extract(plan['missing'], plan['query'])
+    future = Future()
+    future.set_result([])
+    return future
+
+
+def finish_extraction(plan, answer, fingerprints=None):
+    """Combine the model's ``answer`` with a plan and record the listing's new fingerprint."""
+    known = plan['known']
+    answers = iter([answer] if 'batch_text' in plan else answer)
+    results = [known[chunk_hash] if chunk_hash in known else next(answers) for chunk_hash in plan['hashes']]
+    result = results[0] if len(results) == 1 else " ".join(results)  # A batched answer is one dict
+    chunk_results = dict(zip(plan['hashes'], results))
+    llm_calls, avoided = len(plan['hashes']), len(plan['hashes']) - len(plan['missing'])
+    failed = any(is_error_result(answer) for answer in results)
+
+    key, previous = plan['key'], plan['previous']
+    if key:
+        if previous is None:
+            fingerprints.record('new', llm_calls=llm_calls - avoided)
+        else:
+            fingerprints.record('changed', llm_calls=llm_calls - avoided, llm_calls_avoided=avoided,
+                                changed_sections=count_changed_sections(previous['sections'], plan['sections']))
+        if not failed:
+            fingerprints.put(key, plan['query'], plan['text_hash'], plan['sections'], chunk_results, result,
+                             llm_calls)
+    return combine_extraction(plan['structured'], result)
+
+
+def combine_extraction(structured, result):
+    """Merge embedded-JSON fields with the model's answer (a dict of fields or text)."""
+    if isinstance(result, dict):
+        return dict(structured, **result)
+    if structured:
+        return dict(structured, extracted_info=result)
     return result
+
+
+def is_error_result(result):
+    """True for the error strings returned in place of extracted data."""
+    return isinstance(result, str) and result.startswith("Error")
+
+
+def process_listing(driver, link, user_query, extractor=None):
+    """Process an individual listing and extract relevant information."""
+    link = normalize_listing_url(link)
+    try:
+        html_content = fetch_listing_html(driver, link)
+        if not html_content:
+            return f"Error: Unable to load content for {link}"
+        return extract_listing(html_content, user_query, extractor)
+    except Exception as e:
+        logger.error(f"Error processing listing: {str(e)}")
+        return f"Error processing listing: {str(e)}"
+
+
+def run_search(search_url, user_query, driver_pool, extractor, max_pages=1, workers=2, min_interval=3.0,
+               page_store=None, max_age=None, offline=False, http_fetcher=None, batched=False,
+               fingerprints=None, resume=False, on_progress=None, card_selectors=None, lookahead=0,
+               pipeline=None):
+    """Crawl a search and extract ``user_query`` from every listing, without any UI; returns the records."""
+    journal = ResultsJournal(search_url, user_query)
+    if resume:
+        completed = journal.load()
+    else:
+        journal.reset()
+        completed = {}
+    results = []
+    resumed = 0
+
+    rate_limiter = HostRateLimiter(min_interval)
+    extractor.new_run()
+    if pipeline is not None:
+        pool = ListingPipeline(user_query, driver_pool, workers=workers, rate_limiter=rate_limiter,
+                               extractor=extractor, page_store=page_store, max_age=max_age,
+                               offline=offline, http_fetcher=http_fetcher, batched=batched,
+                               fingerprints=fingerprints, **pipeline)
+    else:
+        pool = ListingWorkerPool(user_query, driver_pool, workers=workers, rate_limiter=rate_limiter,
+                                 extractor=extractor, page_store=page_store, max_age=max_age,
+                                 offline=offline, http_fetcher=http_fetcher, batched=batched,
+                                 fingerprints=fingerprints, lookahead=lookahead)
+    pool.start()
+
+    def on_listing(listing):
+        record = completed.get(canonical_listing_url(listing['url']))
+        pool.submit(listing, result=record['data'] if record else None)
+
+    # Results pages are crawled concurrently and feed the workers as they arrive
+    crawler = SearchCrawler(search_url, driver_pool, max_pages=max_pages, workers=workers,
+                            rate_limiter=rate_limiter, page_store=page_store, offline=offline,
+                            card_selectors=card_selectors)
+    crawler.start(on_listing, on_done=pool.close)
+
+    for idx, listing, result in pool.results():
+        record = {'link': listing['url'], 'price': listing['price'], 'data': result}
+        results.append(record)
+        key = canonical_listing_url(listing['url'])
+        if key in completed:
+            resumed += 1
+        elif not is_error_result(result):
+            journal.append(key, record)
+        if on_progress is not None:
+            on_progress(record, {
+                'done': len(results), 'submitted': pool.submitted,
+                'pages_done': crawler.pages_done, 'max_pages': crawler.max_pages, 'resumed': resumed,
+            })
+    journal.complete()
+    return results
+
+
+def records_to_dataframe(results):
+    """Flatten ``run_search()`` records into one row per listing."""
+    processed_data =[]
+    for items in results:
+        link = items.get('link')
+        price= items.get('price')
+        data = items.get("data")
+
+        if isinstance(data,str):
+            try:
+                data = json.loads(data)
+            except json.JSONDecodeError:
+                logger.debug(f"Data for {link} is plain text, not JSON")
+                data={"extracted_info":data}
+        elif isinstance(data,list):
+            merged_data={}
+            for entry in data:
+                if isinstance(entry,dict):
+                    merged_data.update(entry)
+                else:
+                    merged_data['additional_info']=entry
+            data = merged_data
+        elif not isinstance(data,dict):
+            data={'extracted_info':str(data)}
+        combined_data = {"link":link,'price':price}
+        combined_data.update(data)
+        processed_data.append(combined_data)
+    return pd.DataFrame(processed_data)
+
+
+TRACE_EXPORT_PATH = 'scraper_trace.jsonl'
+METRICS_EXPORT_PATH = 'scraper_metrics.prom'  # For a node_exporter textfile collector
+RESULTS_DIR = 'results'  # Parquet dataset partitioned by run_date and market
+RESULT_SUMMARY_COLUMNS = ['link', 'title', 'price', 'currency', 'rating', 'review_count', 'error']
+
+
+class LiveResultsTable:
+    """Table of a run's newest ``rows`` results, replaced in place as listings finish.
+
+    Only the newest rows are kept, so the page costs the same for 10 or 1000
+    listings; the whole run is browsed from the results store afterwards.
+    """
+
+    def __init__(self, placeholder, rows=15, min_interval=0.5):
+        self.placeholder = placeholder
+        self.rows = collections.deque(maxlen=rows)
+        self.min_interval = min_interval
+        self._drawn_at = 0.0
+
+    def add(self, number, row):
+        self.rows.appendleft(dict({'#': number}, **{column: row[column] for column in RESULT_SUMMARY_COLUMNS}))
+        if time.monotonic() - self._drawn_at >= self.min_interval:
+            self.flush()
+
+    def flush(self):
+        self._drawn_at = time.monotonic()
+        self.placeholder.dataframe(pd.DataFrame(list(self.rows)), hide_index=True)
+
+
+def show_results_browser(run, page_size=25):
+    """Page through a stored run's results and load one listing's full extraction on demand."""
+    st.subheader("Aggregated Data")
+    summary = load_results(RESULTS_DIR, columns=RESULT_SUMMARY_COLUMNS, filters=run['filters'])
+    if summary.empty:
+        st.write("No data was collected")
+        return
+    pages = (len(summary) - 1) // page_size + 1
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key='results_page')
+    page_rows = summary.iloc[(page - 1) * page_size:page * page_size]
+    st.dataframe(page_rows, hide_index=True)
+    st.caption(f"{len(summary)} listings saved to {run['path']}")
+
+    link = st.selectbox("Listing details", page_rows['link'], index=None, placeholder="Choose a listing")
+    if link:
+        detail = load_results(RESULTS_DIR, columns=['price_text', 'fields', 'extracted_info', 'error'],
+                              filters=run['filters'] + [('link', '=', link)])
+        for row in detail.to_dict(orient='records'):
+            st.write(f"Price: {row['price_text']}")
+            if row['fields']:
+                st.json(json.loads(row['fields']))
+            if row['extracted_info']:
+                st.write(row['extracted_info'])
+            if row['error']:
+                st.error(row['error'])
+
+    if st.checkbox("Prepare a CSV download of this run"):
+        df = load_results(RESULTS_DIR, filters=run['filters'])
+        st.download_button("Download CSV", df.to_csv(index=False), file_name='airbnb_listings.csv', mime='text/csv')
+
+
+def show_performance(histogram_stages=6, bins=10):
+    """Show the run's stage timings and OpenAI usage and export them to disk."""
+    st.subheader("Performance")
+    stages_tab, listings_tab, usage_tab, queues_tab, export_tab = st.tabs(
+        ["Stages", "Slowest listings", "OpenAI usage", "Pipeline queues", "Export"])
+    summary = tracer.stage_summary()
+    spans = tracer.spans_frame()
+
+    with stages_tab:
+        if summary.empty:
+            st.write("No spans were recorded.")
+        else:
+            st.dataframe(summary)
+            for stage in summary.index[:histogram_stages]:
+                seconds = spans.loc[spans['stage'] == stage, 'seconds']
+                counts = pd.cut(seconds, bins=min(bins, max(1, seconds.nunique()))).value_counts(sort=False)
+                counts.index = [f"{interval.right:.2f}s" for interval in counts.index]
+                st.caption(f"{stage}: seconds per span")
+                st.bar_chart(counts)
+
+    with listings_tab:
+        st.dataframe(tracer.slowest_listings())
+
+    with usage_tab:
+        totals = tracer.usage_totals()
+        calls_col, prompt_col, completion_col, cost_col = st.columns(4)
+        calls_col.metric("OpenAI calls", totals['calls'])
+        prompt_col.metric("Prompt tokens", totals['prompt_tokens'])
+        completion_col.metric("Completion tokens", totals['completion_tokens'])
+        cost_col.metric("Estimated cost", f"${totals['cost_usd']:.4f}")
+        st.dataframe(pd.DataFrame([tracer.counters]))
+
+    with queues_tab:
+        depths = tracer.queue_depths_frame()
+        if depths.empty:
+            st.write("No queue depths were sampled (the staged pipeline was not used).")
+        else:
+            st.dataframe(tracer.queue_summary())
+            depths['time'] = pd.to_datetime(depths['time'], unit='s')
+            st.line_chart(depths.pivot_table(index='time', columns='queue', values='depth'))
+
+    with export_tab:
+        trace = tracer.to_jsonl()
+        metrics = tracer.prometheus_text()
+        with open(TRACE_EXPORT_PATH, 'w', encoding='utf-8') as f:
+            f.write(trace)
+        with open(METRICS_EXPORT_PATH, 'w', encoding='utf-8') as f:
+            f.write(metrics)
+        st.write(f"Written to {TRACE_EXPORT_PATH} and {METRICS_EXPORT_PATH}.")
+        st.download_button("Download trace (JSONL)", trace, file_name=TRACE_EXPORT_PATH)
+        st.download_button("Download metrics (Prometheus)", metrics, file_name=METRICS_EXPORT_PATH)
+
+
 def main():
     st.title("Sequential Tab-based Airbnb Scraper")
+    install_streamlit_logging()
     # Add session state
 
     with st.expander("System Information", expanded=True):
@@ -316,87 +2184,162 @@ def main():
     
     url = st.text_input("Enter the Airbnb search URL:")
     user_query = st.text_input("What information do you want to extract? (e.g., 'property name, price, rating, amenities, and reviews')")
+    search_pages = st.number_input("Search results pages to crawl", min_value=1, max_value=15, value=1)
+    workers = st.number_input("Concurrent browsers", min_value=1, max_value=8, value=2)
+    min_interval = st.number_input("Minimum seconds between requests to the same host", min_value=0.0, value=3.0, step=0.5)
+    pages_per_browser = st.number_input("Recycle each browser after this many pages", min_value=1, value=25)
+    lookahead = st.number_input("Listings each browser preloads in background tabs during extraction (0 = off)",
+                                min_value=0, max_value=6, value=2)
+    with st.expander("Staged pipeline"):
+        use_pipeline = st.checkbox("Run fetching, cleaning, chunking and extraction as separate stages",
+                                   help="HTML cleaning moves to worker processes; background tab preloading is not used.")
+        clean_processes = st.number_input("Cleaning processes", min_value=1, max_value=os.cpu_count() or 1,
+                                          value=min(2, os.cpu_count() or 1))
+        chunk_workers = st.number_input("Chunking threads", min_value=1, value=1)
+        llm_in_flight = st.number_input("Listings waiting on OpenAI at once", min_value=1, value=16)
+        queue_size = st.number_input("Listings each queue between stages holds", min_value=1, value=4)
+        pipeline = {'clean_processes': clean_processes, 'chunk_workers': chunk_workers,
+                    'llm_in_flight': llm_in_flight, 'queue_size': queue_size} if use_pipeline else None
+    with st.expander("OpenAI rate limits"):
+        max_in_flight = st.number_input("Maximum concurrent OpenAI requests", min_value=1, value=8)
+        requests_per_minute = st.number_input("Requests per minute", min_value=1, value=500)
+        tokens_per_minute = st.number_input("Tokens per minute", min_value=1000, value=60000, step=1000)
+    with st.expander("Page cache"):
+        page_max_age = st.number_input("Reuse cached listing pages younger than (minutes, 0 = always re-fetch)",
+                                       min_value=0, value=60)
+        offline = st.checkbox("Offline replay from cached pages only (no browser)")
+    with st.expander("Resource blocking"):
+        blocked_types = st.multiselect("Block resource types", list(RESOURCE_TYPE_PATTERNS),
+                                       default=['image', 'font', 'media'])
+        block_trackers = st.checkbox("Block known analytics and ad trackers", value=True)
+        deny_domains = st.text_input("Also block these domains (comma separated)")
+        allow_domains = st.text_input("Never block these domains (comma separated)")
+        resource_policy = ResourcePolicy(
+            blocked_types, block_trackers,
+            deny_domains=[d.strip() for d in deny_domains.split(',') if d.strip()],
+            allow_domains=[d.strip() for d in allow_domains.split(',') if d.strip()],
+        )
+        if st.button("Measure policy impact on the search URL", disabled=not url):
+            with st.spinner("Loading the page with and without the policy..."):
+                st.dataframe(compare_resource_policy(url, resource_policy))
+    with st.expander("Search card selectors"):
+        card_selectors_json = st.text_area(
+            "CSS selectors tried in order for each card field ('selector@attribute' reads an attribute)",
+            json.dumps(CARD_SELECTORS, indent=2), height=260)
+        try:
+            card_selectors = dict(CARD_SELECTORS, **json.loads(card_selectors_json))
+        except (ValueError, TypeError) as e:
+            st.error(f"Invalid selector JSON, using the defaults: {e}")
+            card_selectors = CARD_SELECTORS
+    try_http = st.checkbox("Try a plain HTTP request before rendering listings in the browser", value=True)
+    batched = st.checkbox("Batch small listings into one structured JSON request", value=False,
+                          help=f"Listings under {BATCH_LISTING_MAX_TOKENS} tokens are extracted together with {BATCH_EXTRACTION_MODEL}.")
+    skip_unchanged = st.checkbox("Reuse extractions of listings that have not changed", value=True,
+                                 help="Of a listing that changed, only the chunks whose text changed are sent to OpenAI again.")
+    bypass_cache = st.checkbox("Bypass LLM cache", help="Always call OpenAI; fresh results still update the cache.")
+    resume = st.checkbox("Resume an interrupted run for this URL and query",
+                         help="Listings already saved in the unfinished run's journal are not processed again.")
     
     if st.button("Start Scraping", disabled=st.session_state.scraping_in_progress):
         if url and user_query:
             st.session_state.scraping_in_progress = True
             
             with st.spinner("Initializing scraper..."):
-                driver = get_driver()
+                driver_pool = get_driver_pool()
+                driver_pool.configure(size=workers, max_pages_per_driver=pages_per_browser,
+                                      resource_policy=resource_policy)
                 try:
-                    # Load the base URL and get listings with prices
-                    driver.get(url)
+                    readiness_log.clear()
+                    tracer.clear()
+                    fetch_tier_stats.clear()
                     status_container = st.empty()
                     status_container.info("Loading search page...")
                     
-                    listings_info = get_listing_links(driver)
-                    if not listings_info:
+                    progress_bar = st.progress(0)
+                    live_results = LiveResultsTable(st.empty())
+                    with st.expander("Log"):
+                        st.session_state.log_tail = LogTail(st.empty())
+                    st.session_state.last_run = None
+
+                    extractor = get_async_extractor()
+                    extractor.configure(max_in_flight, requests_per_minute, tokens_per_minute, bypass_cache)
+                    fingerprints = get_fingerprint_store() if skip_unchanged else None
+                    if fingerprints is not None:
+                        fingerprints.reset_stats()
+                    results_writer = ResultsWriter(url, user_query, root=RESULTS_DIR)
+
+                    def show_listing(record, progress):
+                        row = results_writer.append(record)
+                        progress_bar.progress(progress['done'] / progress['submitted'])
+                        status_container.write(
+                            f"Processed {progress['done']}/{progress['submitted']} listings found so far "
+                            f"({progress['pages_done']}/{progress['max_pages']} search pages crawled, "
+                            f"{progress['resumed']} resumed)"
+                        )
+                        live_results.add(progress['done'], row)
+
+                    try:
+                        results = run_search(url, user_query, driver_pool, extractor, max_pages=search_pages,
+                                             workers=workers, min_interval=min_interval,
+                                             page_store=get_page_store(), max_age=page_max_age * 60,
+                                             offline=offline, http_fetcher=get_http_fetcher() if try_http else None,
+                                             batched=batched, fingerprints=fingerprints, resume=resume,
+                                             on_progress=show_listing, card_selectors=card_selectors,
+                                             lookahead=lookahead, pipeline=pipeline)
+                    finally:
+                        # Publish whatever was extracted, even if the run stopped early
+                        results_path = results_writer.close()
+                        live_results.flush()
+                    if results_path:
+                        st.session_state.last_run = {'filters': results_writer.filters(), 'path': results_path}
+
+                    if not results:
                         st.error("No listings found. Please check the URL and try again.")
                         return
-                        
-                    status_container.info(f"Found {len(listings_info)} listings with prices.")
-                    
-                    results = []
-                    progress_bar = st.progress(0)
-                    
-                    for idx, listing in enumerate(listings_info):
-                        status_container.write(f"Processing listing {idx + 1}/{len(listings_info)}")
-                        result = process_listing(driver, listing['url'], user_query)
-                        results.append({'link': listing['url'], 'price':listing['price'],'data': result})
-                        progress_bar.progress((idx + 1) / len(listings_info))
-                        
-                        # Display results in real-time
-                        st.subheader(f"Listing {idx + 1}: {listing['url']}")
-                        st.write(f"Price: {listing['price']}")
-                        st.write(result)
-                        st.markdown("---")
-                        
-                        time.sleep(3)  # Rate limiting between listings
                     
                     status_container.success("Scraping completed!")
 
-                    if results:
-                        processed_data =[]
-                        for items in results:
-                            link = items.get('link')
-                            price= items.get('price')
-                            data = items.get("data")
-
-                            if isinstance(data,str):
-                                try:
-                                    data = json.loads(data)
-                                except json.JSONDecodeError:
-                                    print(f"failed to parse data for link:{link}")
-                                    data={"extracted_info":data}
-                            elif isinstance(data,list):
-                                merged_data={}
-                                for entry in data:
-                                    if isinstance(entry,dict):
-                                        merged_data.update(entry)
-                                    else:
-                                        merged_data['additional_info']=entry
-                                data = merged_data
-                            elif not isinstance(data,dict):
-                                data={'extracted_info':str(data)}
-                            combined_data = {"link":link,'price':price}
-                            combined_data.update(data)
-                            processed_data.append(combined_data)
-                        df = pd.DataFrame(processed_data)
-                        st.subheader("Aggregated Data")
-                        st.dataframe(df)
-                        df.to_csv('airbnb_listings.csv', index=False)
+                    cache_stats = extractor.cache.stats
+                    hits_col, misses_col, deduped_col = st.columns(3)
+                    hits_col.metric("LLM cache hits", cache_stats['hits'])
+                    misses_col.metric("LLM cache misses", cache_stats['misses'])
+                    deduped_col.metric("Duplicate chunks skipped", cache_stats['deduped'])
 
-                    else:
-                        st.write("No data was collected")
+                    if fingerprints is not None:
+                        change_stats = fingerprints.stats
+                        unchanged_col, changed_col, sections_col, avoided_col = st.columns(4)
+                        unchanged_col.metric("Unchanged listings reused", change_stats['unchanged'])
+                        changed_col.metric("Changed listings", change_stats['changed'])
+                        sections_col.metric("Changed sections", change_stats['changed_sections'])
+                        avoided_col.metric("LLM calls avoided", change_stats['llm_calls_avoided'],
+                                           help=f"{change_stats['llm_calls']} calls made for new or changed text")
+
+                    tier_counts = fetch_tier_stats.counts
+                    store_col, http_col, browser_col, escalated_col = st.columns(4)
+                    store_col.metric("Pages from cache", tier_counts['page_store'])
+                    http_col.metric("Pages via HTTP", tier_counts['http'])
+                    browser_col.metric("Pages via browser", tier_counts['browser'])
+                    escalated_col.metric("HTTP escalated to browser", tier_counts['http_escalated'])
+
+                    with st.expander("Page readiness waits"):
+                        st.dataframe(readiness_log.summary())
+
+                    show_performance()
                     
                 except Exception as e:
                     st.error(f"An error occurred: {str(e)}")
                 finally:
-                    driver.quit()
                     st.session_state.scraping_in_progress = False
+                    tail = st.session_state.pop('log_tail', None)
+                    if tail is not None:
+                        tail.flush()
 
         
         else:
             st.warning("Please provide both a URL and a query.")
+
+    # Outside the button so paging and detail lookups, which rerun the script, keep the results
+    if st.session_state.get('last_run'):
+        show_results_browser(st.session_state.last_run)
 if __name__ == "__main__":
     main()
\ No newline at end of file
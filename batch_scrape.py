@@ -0,0 +1,169 @@
+"""Run many Airbnb searches without the Streamlit UI, spread over several processes.
+
+Usage:
+    python batch_scrape.py searches.csv --processes 4 --browsers 2 [--output results.csv]
+
+``searches.csv`` has a header row with a ``search_url`` column and optional
+``query`` and ``pages`` columns; rows without a query use ``--query``. Each
+search runs in a worker process with its own browsers, HTTP client and
+extractor and appends its listings to the Parquet results store (see
+results_store.py); ``--output`` also writes this batch's rows as one CSV.
+``--resume`` continues interrupted runs from their journals like the UI does.
+"""
+import argparse
+import csv
+import logging
+import multiprocessing
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+logger = logging.getLogger('airbnb_scraper.batch')
+
+
+def read_searches(path, default_query=None, default_pages=1):
+    """Return ``{'search_url', 'query', 'pages'}`` jobs from a CSV file."""
+    jobs = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            search_url = (row.get('search_url') or '').strip()
+            query = (row.get('query') or '').strip() or default_query
+            if not search_url:
+                continue
+            if not query:
+                raise ValueError(f"No query for {search_url}; add a query column or pass --query")
+            pages = int(row.get('pages') or default_pages)
+            jobs.append({'search_url': search_url, 'query': query, 'pages': pages})
+    return jobs
+
+
+def init_worker(verbose):
+    """Log batch progress, plus every scraper message when ``verbose`` (else warnings and errors)."""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(levelname)s %(message)s')
+    logging.getLogger('airbnb_scraper').setLevel(logging.INFO if verbose else logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+
+def run_job(job, options, run_id):
+    """Run one search in this worker process, store its rows under ``run_id`` and return their count."""
+    import airbnb_aiscraper as scraper
+    from http_fetcher import HttpFetcher
+    from fingerprint_store import FingerprintStore
+    from llm_cache import LLMCache
+    from page_store import PageStore
+    from results_store import ResultsWriter
+
+    driver_pool = scraper.DriverPool(size=options['browsers'], max_pages_per_driver=options['pages_per_browser'],
+                                     resource_policy=scraper.ResourcePolicy())
+    http_fetcher = HttpFetcher() if options['http'] else None
+    extractor = scraper.AsyncExtractor(cache=LLMCache())
+    extractor.configure(options['max_in_flight'], options['requests_per_minute'], options['tokens_per_minute'])
+    fingerprints = FingerprintStore() if options['skip_unchanged'] else None
+    writer = ResultsWriter(job['search_url'], job['query'], root=options['results_dir'], run_id=run_id)
+
+    def on_progress(record, progress):
+        writer.append(record)
+        if not options['progress']:
+            return
+        logger.info(f"[{job['search_url']}] {progress['done']}/{progress['submitted']} listings, "
+                    f"{progress['pages_done']}/{progress['max_pages']} search pages")
+
+    try:
+        results = scraper.run_search(
+            job['search_url'], job['query'], driver_pool, extractor, max_pages=job['pages'],
+            workers=options['browsers'], min_interval=options['min_interval'], page_store=PageStore(),
+            max_age=options['page_max_age'] * 60, http_fetcher=http_fetcher, batched=options['batched'],
+            fingerprints=fingerprints, resume=options['resume'], on_progress=on_progress,
+            lookahead=options['lookahead'],
+            pipeline={'clean_processes': options['clean_processes']} if options['clean_processes'] else None,
+        )
+    finally:
+        writer.close()
+        driver_pool.close()
+        if http_fetcher is not None:
+            http_fetcher.close()
+    if fingerprints is not None:
+        logger.info(f"[{job['search_url']}] {fingerprints.stats['unchanged']} unchanged listings reused, "
+                    f"{fingerprints.stats['llm_calls_avoided']} LLM calls avoided")
+    return len(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('searches', help='CSV file with search_url[,query][,pages] columns')
+    parser.add_argument('--query', help='query for rows without one')
+    parser.add_argument('--pages', type=int, default=1, help='search pages per search for rows without a pages column')
+    parser.add_argument('--results-dir', default='results', help='Parquet results store to append to')
+    parser.add_argument('--output', help="also write this batch's listings to one CSV file")
+    parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--browsers', type=int, default=2, help='browsers (and listing workers) per process')
+    parser.add_argument('--pages-per-browser', type=int, default=25)
+    parser.add_argument('--lookahead', type=int, default=2,
+                        help='listings each browser preloads in background tabs during extraction (0 = off)')
+    parser.add_argument('--clean-processes', type=int, default=0,
+                        help='clean HTML in this many processes per search, as a staged pipeline (0 = off)')
+    parser.add_argument('--min-interval', type=float, default=3.0, help='minimum seconds between requests to a host')
+    parser.add_argument('--page-max-age', type=int, default=60, help='reuse cached listing pages younger than this (minutes)')
+    parser.add_argument('--max-in-flight', type=int, default=8, help='concurrent OpenAI requests per process')
+    parser.add_argument('--requests-per-minute', type=int, default=500, help='OpenAI requests per minute per process')
+    parser.add_argument('--tokens-per-minute', type=int, default=60000, help='OpenAI tokens per minute per process')
+    parser.add_argument('--no-http', dest='http', action='store_false', help='always render listings in the browser')
+    parser.add_argument('--batching', dest='batched', action='store_true',
+                        help='extract small listings together in one structured JSON request')
+    parser.add_argument('--resume', action='store_true', help='continue interrupted runs from their journals')
+    parser.add_argument('--no-change-detection', dest='skip_unchanged', action='store_false',
+                        help='re-extract listings even when their text has not changed')
+    parser.add_argument('--quiet', dest='progress', action='store_false', help='do not log per-listing progress')
+    parser.add_argument('--verbose', action='store_true', help='log every scraper message')
+    args = parser.parse_args(argv)
+
+    init_worker(args.verbose)
+    try:
+        jobs = read_searches(args.searches, args.query, args.pages)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if not jobs:
+        parser.error(f"No searches in {args.searches}")
+
+    options = {key: getattr(args, key) for key in (
+        'browsers', 'pages_per_browser', 'lookahead', 'clean_processes', 'min_interval', 'page_max_age',
+        'max_in_flight', 'requests_per_minute', 'tokens_per_minute', 'http', 'batched', 'skip_unchanged', 'resume',
+        'progress', 'results_dir',
+    )}
+    batch_id = uuid.uuid4().hex[:8]
+    run_ids = []
+    listings = 0
+    failed = 0
+    # Spawned workers start clean instead of inheriting this process's threads and sockets
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(args.processes, len(jobs)), mp_context=context,
+                             initializer=init_worker, initargs=(args.verbose,)) as executor:
+        futures = {}
+        for number, job in enumerate(jobs):
+            run_id = f"batch-{batch_id}-{number:04d}"
+            run_ids.append(run_id)
+            futures[executor.submit(run_job, job, options, run_id)] = job
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                count = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"Search failed: {job['search_url']}: {e}")
+                continue
+            listings += count
+            logger.info(f"Finished {job['search_url']}: {count} listings")
+
+    logger.info(f"Stored {listings} listings from {len(jobs) - failed}/{len(jobs)} searches in {args.results_dir} "
+                f"(run ids batch-{batch_id}-*)")
+    if args.output:
+        from results_store import load_results
+        df = load_results(args.results_dir, filters=[('run_id', 'in', run_ids)])
+        df.to_csv(args.output, index=False)
+        logger.info(f"Wrote {len(df)} listings to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Compare batched and per-listing extraction offline against a stub OpenAI server.
+
+Usage:
+    python benchmarks/bench_batching.py [--listings 20] [--workers 2] [--llm-latency 0.3] [--pipeline]
+
+Listings come from a temporary PageStore filled with the recorded fixtures
+(offline mode: no browser, no HTTP) and are extracted through an
+AsyncExtractor pointed at the stub OpenAI server from bench_pipeline.py,
+once per listing and once batched, each with a cold LLM cache. Reports
+seconds, listings per minute, OpenAI requests and batches per mode, and exits
+non-zero when batching is slower than per-listing extraction.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import FIXTURES_DIR, StubOpenAIServer, load_listing_pages, serve  # noqa: E402
+
+
+def run_mode(scraper, args, batched, tmp):
+    from llm_cache import LLMCache
+    from page_store import PageStore
+
+    store = PageStore(os.path.join(tmp, 'pages.sqlite3'))
+    name = 'batched' if batched else 'per-listing'
+    extractor = scraper.AsyncExtractor(cache=LLMCache(os.path.join(tmp, f'llm-{name}.sqlite3')))
+    extractor.configure(args.max_in_flight, args.requests_per_minute, args.tokens_per_minute)
+    options = dict(workers=args.workers, extractor=extractor, page_store=store, offline=True, batched=batched)
+    if args.pipeline:
+        pool = scraper.ListingPipeline(args.query, None, clean_processes=args.workers, **options)
+    else:
+        pool = scraper.ListingWorkerPool(args.query, None, **options)
+    start = time.perf_counter()
+    pool.start()
+    for room in range(1, args.listings + 1):
+        pool.submit({'url': f"https://www.airbnb.com/rooms/{room}", 'price': None})
+    pool.close()
+    results = [result for _, _, result in pool.results()]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--query', default='amenities and house rules')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='stub OpenAI seconds per request')
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--requests-per-minute', type=int, default=5000)
+    parser.add_argument('--tokens-per-minute', type=int, default=2000000)
+    parser.add_argument('--pipeline', action='store_true', help='run listings through ListingPipeline')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    listing_pages = load_listing_pages(args.fixtures)
+    if not listing_pages:
+        parser.error(f'no .html listing fixtures in {args.fixtures}')
+
+    import airbnb_aiscraper as scraper  # noqa: E402
+    from page_store import PageStore
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).setLevel(logging.ERROR)  # No ScriptRunContext outside `streamlit run`
+
+    stub = serve(StubOpenAIServer(args.llm_latency))
+    os.environ['OPENAI_BASE_URL'] = stub.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub-key')
+    scraper.openai.api_key = scraper.openai.api_key or os.environ['OPENAI_API_KEY']
+    scraper.openai.base_url = stub.base_url
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PageStore(os.path.join(tmp, 'pages.sqlite3'))
+        for room in range(1, args.listings + 1):
+            page = listing_pages[room % len(listing_pages)]
+            store.put(f"https://www.airbnb.com/rooms/{room}", page.replace('<h1>', f'<h1>Room {room}: ', 1))
+        for batched in (False, True):
+            requests = stub.requests
+            batches = scraper.tracer.counters['llm_batches']
+            seconds, results = run_mode(scraper, args, batched, tmp)
+            errors = sum(1 for result in results if scraper.is_error_result(result))
+            report[batched] = seconds
+            print(f"{'batched' if batched else 'per-listing':<12} {len(results)} listings ({errors} errors) "
+                  f"in {seconds:.2f}s, {len(results) / seconds * 60:.0f}/min, "
+                  f"{stub.requests - requests} OpenAI requests "
+                  f"({scraper.tracer.counters['llm_batches'] - batches} batched)")
+    stub.shutdown()
+    print(f"Batching is {report[False] / report[True]:.2f}x the per-listing throughput")
+    return 0 if report[True] <= report[False] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
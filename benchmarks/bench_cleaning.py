@@ -0,0 +1,112 @@
+"""Compare the single-pass lxml cleaner with the BeautifulSoup + html2text path.
+
+Usage:
+    python benchmarks/bench_cleaning.py [FILE_OR_DIR ...] [--page-store page_cache.sqlite3]
+
+Pages come from saved .html fixtures (benchmarks/fixtures and the
+cleaner-only pages in benchmarks/fixtures/cleaning by default) and,
+optionally, from a PageStore database. For each page the script reports the
+best-of-N time of both paths and how similar their word and line sequences
+are, and exits non-zero when any page falls below --min-similarity.
+"""
+import argparse
+import difflib
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import airbnb_aiscraper as scraper  # noqa: E402
+from text_processing import fast_clean_html, lxml_html  # noqa: E402
+from page_store import PageStore  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+CLEANING_FIXTURES_DIR = os.path.join(FIXTURES_DIR, 'cleaning')  # Not listing pages; the other benchmarks skip them
+
+
+def legacy_clean(html_content):
+    return scraper.clean_content(scraper.parse_html(html_content))
+
+
+def best_time(func, html_content, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(html_content)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def similarity(a, b):
+    """Ratio of matching words between two cleaned texts, ignoring markup characters."""
+    strip = str.maketrans('', '', '*_~#|-')
+    words_a = a.translate(strip).split()
+    words_b = b.translate(strip).split()
+    return difflib.SequenceMatcher(None, words_a, words_b, autojunk=False).ratio()
+
+
+def line_similarity(a, b):
+    """Ratio of matching non-blank lines, ignoring spacing; catches words that land on the wrong line."""
+    lines_a = [re.sub(r'\s+', '', line) for line in a.splitlines() if line.strip()]
+    lines_b = [re.sub(r'\s+', '', line) for line in b.splitlines() if line.strip()]
+    return difflib.SequenceMatcher(None, lines_a, lines_b, autojunk=False).ratio()
+
+
+def load_pages(paths, page_store_path):
+    pages = []
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, '*.html'))) if os.path.isdir(path) else [path]
+        for file_path in files:
+            with open(file_path, encoding='utf-8') as f:
+                pages.append((os.path.basename(file_path), f.read()))
+    if page_store_path:
+        store = PageStore(page_store_path)
+        for url in store.urls():
+            pages.append((url, store.get(url)))
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='*', default=[FIXTURES_DIR, CLEANING_FIXTURES_DIR], help="HTML files or directories of them")
+    parser.add_argument('--page-store', help="Also benchmark every page in this PageStore database")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-similarity', type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    if lxml_html is None:
+        print("lxml is not installed; the fast cleaner is unavailable.")
+        return 1
+
+    pages = load_pages(args.paths, args.page_store)
+    if not pages:
+        print("No pages to benchmark.")
+        return 1
+
+    failures = 0
+    total_legacy = total_fast = 0.0
+    print(f"{'page':<50} {'KiB':>8} {'legacy ms':>10} {'fast ms':>9} {'speedup':>8} {'words':>6} {'lines':>6}")
+    for name, html_content in pages:
+        legacy_seconds, legacy_text = best_time(legacy_clean, html_content, args.repeat)
+        fast_seconds, fast_text = best_time(fast_clean_html, html_content, args.repeat)
+        ratio = similarity(legacy_text, fast_text)
+        line_ratio = line_similarity(legacy_text, fast_text)
+        total_legacy += legacy_seconds
+        total_fast += fast_seconds
+        failures += min(ratio, line_ratio) < args.min_similarity
+        print(f"{name[-50:]:<50} {len(html_content) / 1024:>8.1f} {legacy_seconds * 1000:>10.1f} "
+              f"{fast_seconds * 1000:>9.1f} {legacy_seconds / fast_seconds:>7.1f}x {ratio:>6.3f} {line_ratio:>6.3f}")
+
+    print(f"\nTotal: legacy {total_legacy * 1000:.1f} ms, fast {total_fast * 1000:.1f} ms, "
+          f"speedup {total_legacy / total_fast:.1f}x over {len(pages)} pages")
+    if failures:
+        print(f"{failures} page(s) below similarity {args.min_similarity}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""Measure end-to-end scraper throughput offline against local fixture servers.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--listings 36] [--workers 2] [--llm-latency 0.5]
+                                        [--rate-limit-rate 0.1] [--http] [--no-browser]
+
+A local HTTP server plays Airbnb: it generates search results pages whose
+cards point at /rooms/<id>, and serves each room from the recorded listing
+pages in benchmarks/fixtures (cycled, with the room number added to the
+title so every listing is distinct). A second server plays the OpenAI chat
+completions API with a configurable latency and share of 429 responses;
+the scraper reaches it through OPENAI_BASE_URL. Pages are rendered in
+headless Chromium unless --no-browser, which fetches everything over plain
+HTTP (requires --http for listings).
+
+Reports listings per minute, per-stage latency and peak RSS of this
+process and its reaped children, and optionally writes them as JSON.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SEARCH_CARD = """
+<div itemprop="itemListElement" itemscope itemtype="http://schema.org/ListItem">
+  <meta itemprop="url" content="{url}">
+  <div class="card"><span class="_11jcbg2">&#36;{price}&nbsp;night</span></div>
+</div>"""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serve generated search results pages and recorded listing pages."""
+
+    def do_GET(self):
+        server = self.server
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/s/'):
+            offset = int(parse_qs(parsed.query).get('items_offset', ['0'])[0])
+            body = server.search_page(offset)
+        elif parsed.path.startswith('/rooms/'):
+            body = server.listing_page(parsed.path.rsplit('/', 1)[-1])
+        else:
+            body = None
+        if body is None:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, listing_pages, total_listings, page_size):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.listing_pages = listing_pages
+        self.total_listings = total_listings
+        self.page_size = page_size
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}"
+
+    def search_page(self, offset):
+        cards = ''.join(
+            SEARCH_CARD.format(url=f"{self.base_url}/rooms/{room}", price=80 + room % 50)
+            for room in range(offset + 1, min(offset + self.page_size, self.total_listings) + 1)
+        )
+        return f"<html><head><title>Search</title></head><body><main>{cards}</main></body></html>"
+
+    def listing_page(self, room):
+        if not room.isdigit() or not 0 < int(room) <= self.total_listings:
+            return None
+        page = self.listing_pages[int(room) % len(self.listing_pages)]
+        return page.replace('<h1>', f'<h1>Room {room}: ', 1)
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answer chat completions after a delay, rejecting a share of them with 429."""
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            limited = server.random.random() < server.rate_limit_rate
+            server.rate_limited += limited
+        if limited:
+            self._send(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}},
+                       {'Retry-After': str(server.retry_after)})
+            return
+
+        prompt = ''.join(message.get('content', '') for message in request.get('messages', []))
+        schema = (request.get('response_format') or {}).get('json_schema', {}).get('schema')
+        if schema:
+            record = schema['properties']['listings']['items']['properties']
+            urls = [line[len('LISTING '):] for line in prompt.splitlines() if line.startswith('LISTING ')]
+            content = json.dumps({"listings": [
+                {name: (url if name == 'url' else 'stub value') for name in record} for url in urls
+            ]})
+        else:
+            content = "Extracted (stub): property name, price and rating as requested."
+        self._send(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get('model', 'stub'),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        })
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.5, rate_limit_rate=0.0, retry_after=0.2, seed=0):
+        super().__init__(('127.0.0.1', 0), StubOpenAIHandler)
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.base_url = f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_listing_pages(directory):
+    """Read the fixtures that are listing pages, i.e. that embed listing data."""
+    from embedded_data import has_listing_data
+
+    pages = []
+    for file_path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(file_path, encoding='utf-8') as f:
+            html_content = f.read()
+        if has_listing_data(html_content):
+            pages.append(html_content)
+    return pages
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its reaped children, in MB (Linux)."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return round(own, 1), round(children, 1)
+
+
+def run_pipeline(scraper, args, search_url, cache_path):
+    from http_fetcher import HttpFetcher
+    from llm_cache import LLMCache
+
+    http_fetcher = HttpFetcher() if args.http or args.no_browser else None
+    driver_pool = None if args.no_browser else scraper.DriverPool(size=args.workers)
+    extractor = scraper.AsyncExtractor(cache=LLMCache(cache_path))
+    extractor.configure(args.max_in_flight, args.requests_per_minute, args.tokens_per_minute)
+    rate_limiter = scraper.HostRateLimiter(0)
+    pool = scraper.ListingWorkerPool(args.query, driver_pool, workers=args.workers,
+                                     rate_limiter=rate_limiter, extractor=extractor,
+                                     http_fetcher=http_fetcher if args.http else None,
+                                     batched=args.batched).start()
+    try:
+        if args.no_browser:
+            index = scraper.ListingIndex()
+            for page_url in scraper.search_page_urls(search_url, args.pages):
+                with scraper.tracer.span('search page'):
+                    cards = scraper.parse_listing_cards(http_fetcher.fetch(page_url) or '')
+                for listing in cards:
+                    if index.add(listing):
+                        pool.submit(listing)
+            pool.close()
+        else:
+            scraper.SearchCrawler(search_url, driver_pool, max_pages=args.pages, workers=args.workers,
+                                  rate_limiter=rate_limiter).start(pool.submit, on_done=pool.close)
+        results = [result for _, _, result in pool.results()]
+    finally:
+        if driver_pool is not None:
+            driver_pool.close()
+        if http_fetcher is not None:
+            http_fetcher.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=36, help='listings the fixture search returns')
+    parser.add_argument('--pages', type=int, default=None, help='search pages to crawl (default: all)')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--query', default='property name, price, rating, amenities and house rules')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='stub OpenAI seconds per request')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of stub requests answered 429')
+    parser.add_argument('--retry-after', type=float, default=0.2)
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--requests-per-minute', type=int, default=500)
+    parser.add_argument('--tokens-per-minute', type=int, default=200000)
+    parser.add_argument('--http', action='store_true', help='try plain HTTP before the browser for listings')
+    parser.add_argument('--no-browser', action='store_true', help='fetch search pages over HTTP, never start Chromium')
+    parser.add_argument('--batched', action='store_true', help='batch small listings into one LLM request')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the report as JSON to this path')
+    args = parser.parse_args()
+    if args.no_browser and not args.http:
+        parser.error('--no-browser needs --http to fetch listings')
+
+    listing_pages = load_listing_pages(args.fixtures)
+    if not listing_pages:
+        parser.error(f'no .html listing fixtures in {args.fixtures}')
+
+    import airbnb_aiscraper as scraper  # noqa: E402
+    scraper.st.config.set_option('global.showWarningOnDirectExecution', False)
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith('streamlit'):
+            logging.getLogger(name).setLevel(logging.ERROR)  # No ScriptRunContext outside `streamlit run`
+
+    fixtures = serve(FixtureServer(listing_pages, args.listings, scraper.SEARCH_PAGE_SIZE))
+    stub = serve(StubOpenAIServer(args.llm_latency, args.rate_limit_rate, args.retry_after, args.seed))
+    os.environ['OPENAI_BASE_URL'] = stub.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub-key')
+    scraper.openai.api_key = scraper.openai.api_key or os.environ['OPENAI_API_KEY']
+    scraper.openai.base_url = stub.base_url
+    if args.pages is None:
+        args.pages = max(1, -(-args.listings // scraper.SEARCH_PAGE_SIZE))
+
+    scraper.tracer.clear()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        results = run_pipeline(scraper, args, f"{fixtures.base_url}/s/homes", os.path.join(tmp, 'llm.sqlite3'))
+        elapsed = time.perf_counter() - start
+    fixtures.shutdown()
+    stub.shutdown()
+
+    errors = sum(1 for result in results if scraper.is_error_result(result))
+    own_rss, children_rss = peak_rss_mb()
+    summary = scraper.tracer.stage_summary()
+    report = {
+        'listings': len(results),
+        'errors': errors,
+        'seconds': round(elapsed, 2),
+        'listings_per_minute': round(len(results) / elapsed * 60, 1) if elapsed else 0.0,
+        'llm_requests': stub.requests,
+        'llm_rate_limited': stub.rate_limited,
+        'peak_rss_mb': own_rss,
+        'peak_children_rss_mb': children_rss,
+        'usage': scraper.tracer.usage_totals(),
+        'counters': dict(scraper.tracer.counters),
+        'stages': summary.reset_index().to_dict(orient='records'),
+    }
+
+    print(f"{report['listings']} listings ({errors} errors) in {report['seconds']}s: "
+          f"{report['listings_per_minute']} listings/min")
+    print(f"LLM requests: {stub.requests} ({stub.rate_limited} rate limited); "
+          f"peak RSS {own_rss} MB (children {children_rss} MB)")
+    print(summary.to_string() if not summary.empty else 'No spans recorded')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+    return 0 if results and not errors else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
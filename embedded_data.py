@@ -0,0 +1,235 @@
+import json
+import re
+
+# JSON blobs Airbnb embeds in listing pages: schema.org ld+json and hydration state
+EMBEDDED_JSON_PATTERN = re.compile(
+    r'<script\b[^>]*\btype=["\']application/(ld\+)?json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL,
+)
+QUERY_SEPARATOR_PATTERN = re.compile(r',|;|&|\n')
+AND_PATTERN = re.compile(r'\band\b', re.IGNORECASE)
+
+# Query phrases (lower case) that map onto each field we can read deterministically
+FIELD_SYNONYMS = {
+    'title': ('property name', 'listing name', 'name', 'title', 'listing title'),
+    'rating': ('rating', 'ratings', 'overall rating', 'stars', 'star rating', 'score'),
+    'review_count': ('number of reviews', 'review count', 'reviews count', 'count of reviews'),
+    'price': ('price', 'nightly price', 'price per night', 'cost', 'rate'),
+    'location': ('location', 'address', 'city', 'area'),
+    'description': ('description', 'summary', 'about'),
+    'guests': ('guests', 'max guests', 'capacity', 'occupancy', 'number of guests'),
+    'amenities': ('amenities', 'amenity', 'facilities', 'features'),
+    'host': ('host', 'host name'),
+    'coordinates': ('coordinates', 'latitude and longitude', 'lat/long', 'geo'),
+}
+PHRASE_TO_FIELD = {phrase: field for field, phrases in FIELD_SYNONYMS.items() for phrase in phrases}
+
+
+def find_embedded_json(html_content):
+    """Return the parsed ld+json blobs and the other application/json (hydration state) blobs."""
+    ld, state = [], []
+    for match in EMBEDDED_JSON_PATTERN.finditer(html_content):
+        try:
+            blob = json.loads(match.group(2))
+        except ValueError:
+            continue
+        (ld if match.group(1) else state).append(blob)
+    return ld, state
+
+
+def _split_and(part):
+    # 'and' only separates phrases when that turns up a known field, so 'latitude and longitude'
+    # and 'bed and breakfast rules' stay whole
+    if part.lower() in PHRASE_TO_FIELD:
+        return [part]
+    pieces = [piece.strip(' .:') for piece in AND_PATTERN.split(part)]
+    return pieces if any(piece.lower() in PHRASE_TO_FIELD for piece in pieces) else [part]
+
+
+def parse_query_fields(user_query):
+    """Split a query like 'property name, price and rating' into field phrases."""
+    parts = [part.strip(' .:') for part in QUERY_SEPARATOR_PATTERN.split(user_query)]
+    return [piece for part in parts if part for piece in _split_and(part) if piece]
+
+
+def _walk(obj):
+    """Yield every dict nested anywhere inside ``obj``."""
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            yield item
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+
+
+def _first(blobs, keys, accept=lambda value: value not in (None, '', [], {})):
+    for blob in blobs:
+        for node in _walk(blob):
+            for key in keys:
+                if key in node and accept(node[key]):
+                    return node[key]
+    return None
+
+
+def _is_listing(node):
+    types = node.get('@type')
+    types = types if isinstance(types, list) else [types]
+    return any(t in ('VacationRental', 'LodgingBusiness', 'Accommodation', 'Product', 'Hotel') for t in types)
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _resolve_title(ld, state):
+    for node in (n for blob in ld for n in _walk(blob)):
+        if _is_listing(node) and node.get('name'):
+            return node['name']
+    return _first(state, ('listingTitle',))
+
+
+def _resolve_rating(ld, state):
+    rating = _first(ld, ('aggregateRating',))
+    if isinstance(rating, dict) and rating.get('ratingValue') is not None:
+        return _number(rating['ratingValue'])
+    value = _first(state, ('overallRating', 'guestSatisfactionOverall', 'starRating'))
+    return _number(value) if value is not None else None
+
+
+def _resolve_review_count(ld, state):
+    rating = _first(ld, ('aggregateRating',))
+    if isinstance(rating, dict):
+        count = rating.get('ratingCount', rating.get('reviewCount'))
+        if count is not None:
+            return int(_number(count))
+    count = _first(state, ('reviewCount', 'visibleReviewCount', 'overallCount'))
+    return int(_number(count)) if count is not None else None
+
+
+def _resolve_price(ld, state):
+    offers = _first(ld, ('offers',))
+    if isinstance(offers, dict) and offers.get('price') is not None:
+        currency = offers.get('priceCurrency', '')
+        return f"{offers['price']} {currency}".strip()
+    display = _first(state, ('structuredDisplayPrice',))
+    if isinstance(display, dict):
+        line = display.get('primaryLine') or {}
+        price = line.get('discountedPrice') or line.get('price')
+        if price:
+            qualifier = line.get('qualifier')
+            return f"{price} {qualifier}".strip() if qualifier else price
+    return None
+
+
+def _resolve_location(ld, state):
+    address = _first(ld, ('address',))
+    if isinstance(address, dict):
+        parts = [address.get(key) for key in ('streetAddress', 'addressLocality', 'addressRegion', 'addressCountry')]
+        return ', '.join(part for part in parts if part) or None
+    if isinstance(address, str):
+        return address
+    return _first(state, ('locationTitle', 'location'), accept=lambda value: isinstance(value, str) and value)
+
+
+def _resolve_description(ld, state):
+    for node in (n for blob in ld for n in _walk(blob)):
+        if _is_listing(node) and node.get('description'):
+            return node['description']
+    return _first(state, ('htmlDescription',), accept=lambda value: isinstance(value, dict) and value.get('htmlText'))
+
+
+def _resolve_guests(ld, state):
+    occupancy = _first(ld, ('occupancy',))
+    if isinstance(occupancy, dict):
+        occupancy = occupancy.get('value', occupancy.get('maxValue'))
+    if occupancy is None:
+        occupancy = _first(state, ('personCapacity', 'maxGuestCapacity'))
+    return int(_number(occupancy)) if occupancy is not None else None
+
+
+def _resolve_amenities(ld, state):
+    features = _first(ld, ('amenityFeature',))
+    if isinstance(features, list):
+        names = [f.get('name') for f in features if isinstance(f, dict) and f.get('value', True) is not False]
+        if names:
+            return ', '.join(name for name in names if name)
+    names = []
+    for blob in state:
+        for node in _walk(blob):
+            if node.get('__typename') == 'Amenity' and node.get('title') and node.get('available', True):
+                if node['title'] not in names:
+                    names.append(node['title'])
+    return ', '.join(names) or None
+
+
+def _resolve_host(ld, state):
+    host = _first(ld, ('host', 'author'))
+    if isinstance(host, dict) and host.get('name'):
+        return host['name']
+    return _first(state, ('hostName',), accept=lambda value: isinstance(value, str) and value)
+
+
+def _resolve_coordinates(ld, state):
+    latitude = _first(ld + state, ('latitude', 'lat'), accept=lambda value: _number(value) is not None)
+    longitude = _first(ld + state, ('longitude', 'lng'), accept=lambda value: _number(value) is not None)
+    if latitude is None or longitude is None:
+        return None
+    return f"{_number(latitude)}, {_number(longitude)}"
+
+
+RESOLVERS = {
+    'title': _resolve_title,
+    'rating': _resolve_rating,
+    'review_count': _resolve_review_count,
+    'price': _resolve_price,
+    'location': _resolve_location,
+    'description': _resolve_description,
+    'guests': _resolve_guests,
+    'amenities': _resolve_amenities,
+    'host': _resolve_host,
+    'coordinates': _resolve_coordinates,
+}
+
+
+def has_listing_data(html_content):
+    """True when the page embeds listing data (a title in ld+json or the hydration state)."""
+    ld, state = find_embedded_json(html_content)
+    return bool(ld or state) and _resolve_title(ld, state) is not None
+
+
+def extract_embedded_fields(html_content, user_query):
+    """Answer as much of ``user_query`` as possible from the page's embedded JSON.
+
+    Returns ``(fields, remaining_query)``: ``fields`` maps each answered
+    query phrase to its value and ``remaining_query`` holds the phrases
+    still needing the LLM, or None when everything was answered.
+    """
+    phrases = parse_query_fields(user_query)
+    if not phrases:
+        return {}, user_query
+    ld, state = find_embedded_json(html_content)
+
+    fields = {}
+    remaining = []
+    for phrase in phrases:
+        field = PHRASE_TO_FIELD.get(phrase.lower())
+        value = None
+        if field is not None and (ld or state):
+            try:
+                value = RESOLVERS[field](ld, state)
+            except (TypeError, ValueError, AttributeError):
+                value = None
+            if isinstance(value, dict):
+                value = value.get('htmlText')
+        if value in (None, ''):
+            remaining.append(phrase)
+        else:
+            fields[phrase] = value
+    return fields, (', '.join(remaining) if remaining else None)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from text_processing import split_sections
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+INVISIBLE_PATTERN = re.compile('[\u200b\u200c\u200d\u2060\ufeff]')  # Zero-width characters
+
+
+def fingerprint(text):
+    """Hash ``text`` ignoring case, invisible characters and whitespace differences."""
+    normalized = WHITESPACE_PATTERN.sub(' ', INVISIBLE_PATTERN.sub('', text)).strip().lower()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def section_fingerprints(text):
+    """Return ``[heading, hash]`` pairs for each section of cleaned listing text."""
+    return [[heading, fingerprint(section)] for heading, section in split_sections(text)]
+
+
+class FingerprintStore:
+    """SQLite record of what each listing looked like when it was last extracted.
+
+    For every listing URL and query it keeps the hash of the cleaned text,
+    per-section hashes, the model's answer for each chunk sent (keyed by
+    the chunk's hash, batched answers included) and the combined LLM
+    result. Unchanged listings reuse the combined result; changed ones
+    only send the chunks whose text changed, so a change anywhere in a
+    chunk's sections re-sends the whole chunk. ``stats`` counts listings by
+    outcome and the chunk extractions made and avoided (a batched listing
+    counts as one).
+    """
+
+    def __init__(self, path='fingerprints.sqlite3'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " url TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " sections TEXT NOT NULL,"
+            " chunk_results TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " llm_calls INTEGER NOT NULL,"
+            " extracted_at REAL NOT NULL,"
+            " PRIMARY KEY (url, query))"
+        )
+        self._conn.commit()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'new': 0, 'unchanged': 0, 'changed': 0, 'changed_sections': 0,
+                      'llm_calls': 0, 'llm_calls_avoided': 0}
+
+    def get(self, url, query):
+        """Return the last fingerprint of ``url`` for ``query`` as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text_hash, sections, chunk_results, result, llm_calls, extracted_at"
+                " FROM fingerprints WHERE url = ? AND query = ?", (url, query)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'text_hash': row[0],
+            'sections': json.loads(row[1]),
+            'chunk_results': json.loads(row[2]),
+            'result': json.loads(row[3]),
+            'llm_calls': row[4],
+            'extracted_at': row[5],
+        }
+
+    def put(self, url, query, text_hash, sections, chunk_results, result, llm_calls):
+        """Store the listing's fingerprint together with the extraction made from it."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints"
+                " (url, query, text_hash, sections, chunk_results, result, llm_calls, extracted_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, query, text_hash, json.dumps(sections), json.dumps(chunk_results, ensure_ascii=False),
+                 json.dumps(result, ensure_ascii=False), llm_calls, time.time()),
+            )
+            self._conn.commit()
+
+    def record(self, outcome, llm_calls=0, llm_calls_avoided=0, changed_sections=0):
+        """Count one listing as 'new', 'unchanged' or 'changed' and the LLM calls it needed."""
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats['llm_calls'] += llm_calls
+            self.stats['llm_calls_avoided'] += llm_calls_avoided
+            self.stats['changed_sections'] += changed_sections
+
+
+def count_changed_sections(old_sections, new_sections):
+    """Number of sections in ``new_sections`` whose heading and content did not exist before."""
+    old = {tuple(section) for section in old_sections}
+    return sum(1 for section in new_sections if tuple(section) not in old)
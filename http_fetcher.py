@@ -0,0 +1,50 @@
+import threading
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+
+class HttpFetcher:
+    """Pooled keep-alive HTTP client for pages that don't need a browser.
+
+    One httpx client is shared by all threads, so connections (HTTP/2 when
+    the ``h2`` package is installed) are reused across listings. Responses
+    are transparently decompressed by httpx.
+    """
+
+    def __init__(self, timeout=15.0, max_connections=20, headers=None):
+        self.client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=timeout,
+            headers=headers or DEFAULT_HEADERS,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        """Return the page HTML, or None on a non-200 or non-HTML response or network error."""
+        try:
+            response = self.client.get(url)
+        except httpx.HTTPError:
+            return None
+        with self._lock:
+            self.bytes_received += len(response.content)
+        if response.status_code != 200 or 'html' not in response.headers.get('content-type', ''):
+            return None
+        return response.text
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,375 @@
+import abc
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class Job:
+    """One leased job; ``token`` identifies this particular lease."""
+
+    def __init__(self, id, queue, key, payload, attempts, token):
+        self.id = id
+        self.queue = queue
+        self.key = key
+        self.payload = payload
+        self.attempts = attempts
+        self.token = token
+
+    def __repr__(self):
+        return f"Job({self.queue} #{self.id}, attempt {self.attempts})"
+
+
+class JobQueue(abc.ABC):
+    """Durable at-least-once work queue shared by several worker processes or machines.
+
+    Jobs are deduplicated by ``(queue, key)``. A leased job is invisible to
+    other workers until its lease expires; workers extend leases with
+    ``heartbeat()`` while they work, so a crashed worker's jobs become
+    available again after ``visibility_timeout`` seconds. A job is retried
+    with exponential backoff until it has been leased ``max_attempts``
+    times, after which it is marked failed. Completing or failing a job
+    with a stale lease (one that expired and was handed to someone else)
+    is refused. A finished (done or failed) job keeps its key taken, so
+    ``put()`` ignores it, until ``done_ttl`` seconds have passed; then
+    ``put()`` queues it afresh. With ``done_ttl=None`` keys never expire.
+    """
+
+    def __init__(self, visibility_timeout=300, max_attempts=3, retry_base_delay=5.0, retry_max_delay=300.0,
+                 done_ttl=None):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.done_ttl = done_ttl
+
+    def retry_delay(self, attempts):
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempts))
+
+    def requeue_cutoff(self, now):
+        """Jobs finished at or before this time may be queued again; None when ``done_ttl`` is off."""
+        return None if self.done_ttl is None else now - self.done_ttl
+
+    @abc.abstractmethod
+    def put(self, queue, key, payload, delay=0):
+        """Add a job unless ``key`` is queued or finished within ``done_ttl``; returns whether it was added."""
+
+    @abc.abstractmethod
+    def lease(self, queue, owner, limit=1):
+        """Lease up to ``limit`` ready jobs from ``queue`` for ``owner``."""
+
+    @abc.abstractmethod
+    def heartbeat(self, job):
+        """Extend the job's lease; False means the lease was lost and the work should stop."""
+
+    @abc.abstractmethod
+    def complete(self, job, result=None):
+        """Mark the job done with an optional JSON-serializable result; False if the lease was lost."""
+
+    @abc.abstractmethod
+    def fail(self, job, error):
+        """Release the job for a later retry, or mark it failed once attempts run out."""
+
+    @abc.abstractmethod
+    def counts(self, queue):
+        """Return the number of jobs per state (pending, leased, done, failed)."""
+
+    @abc.abstractmethod
+    def results(self, queue):
+        """Yield ``(key, payload, result)`` for every finished job in ``queue``."""
+
+    def close(self):
+        pass
+
+
+class SQLiteJobQueue(JobQueue):
+    """JobQueue stored in a SQLite database file, for workers on one machine."""
+
+    def __init__(self, path='job_queue.sqlite3', **options):
+        super().__init__(**options)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " queue TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " available_at REAL NOT NULL,"
+            " owner TEXT,"
+            " token TEXT,"
+            " lease_expires REAL,"
+            " result TEXT,"
+            " last_error TEXT,"
+            " created_at REAL NOT NULL,"
+            " finished_at REAL,"
+            " UNIQUE (queue, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, state, available_at)")
+
+    def put(self, queue, key, payload, delay=0):
+        now = time.time()
+        with self._lock:
+            # A finished job older than done_ttl starts over; finished_at <= NULL never matches
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (queue, key, payload, available_at, created_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (queue, key) DO UPDATE SET payload = excluded.payload, state = 'pending',"
+                " attempts = 0, available_at = excluded.available_at, owner = NULL, token = NULL,"
+                " lease_expires = NULL, result = NULL, last_error = NULL, created_at = excluded.created_at,"
+                " finished_at = NULL"
+                " WHERE jobs.state IN ('done', 'failed') AND jobs.finished_at <= ?",
+                (queue, key, json.dumps(payload, ensure_ascii=False), now + delay, now, self.requeue_cutoff(now)),
+            )
+        return cursor.rowcount == 1
+
+    def lease(self, queue, owner, limit=1):
+        now = time.time()
+        jobs = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")  # One leaser at a time across processes
+            try:
+                # Leases of crashed or stalled workers run out and their jobs come back
+                self._conn.execute(
+                    "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,"
+                    " finished_at = CASE WHEN attempts >= ? THEN ? END,"
+                    " last_error = 'lease expired', token = NULL, available_at = ?"
+                    " WHERE queue = ? AND state = 'leased' AND lease_expires <= ?",
+                    (self.max_attempts, self.max_attempts, now, now, queue, now),
+                )
+                rows = self._conn.execute(
+                    "SELECT id, key, payload, attempts FROM jobs"
+                    " WHERE queue = ? AND state = 'pending' AND available_at <= ?"
+                    " ORDER BY available_at, id LIMIT ?",
+                    (queue, now, limit),
+                ).fetchall()
+                for id, key, payload, attempts in rows:
+                    token = uuid.uuid4().hex
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'leased', owner = ?, token = ?, lease_expires = ?,"
+                        " attempts = attempts + 1 WHERE id = ?",
+                        (owner, token, now + self.visibility_timeout, id),
+                    )
+                    jobs.append(Job(id, queue, key, json.loads(payload), attempts + 1, token))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return jobs
+
+    def _update_leased(self, job, assignments, params):
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND state = 'leased' AND token = ?",
+                (*params, job.id, job.token),
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, job):
+        return self._update_leased(job, "lease_expires = ?", (time.time() + self.visibility_timeout,))
+
+    def complete(self, job, result=None):
+        return self._update_leased(
+            job, "state = 'done', token = NULL, result = ?, finished_at = ?",
+            (json.dumps(result, ensure_ascii=False, default=str), time.time()),
+        )
+
+    def fail(self, job, error):
+        if job.attempts >= self.max_attempts:
+            return self._update_leased(job, "state = 'failed', token = NULL, last_error = ?, finished_at = ?",
+                                       (str(error), time.time()))
+        return self._update_leased(job, "state = 'pending', token = NULL, last_error = ?, available_at = ?",
+                                   (str(error), time.time() + self.retry_delay(job.attempts)))
+
+    def counts(self, queue):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE queue = ? GROUP BY state", (queue,)
+            ).fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(rows)
+        return counts
+
+    def results(self, queue):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, payload, result FROM jobs WHERE queue = ? AND state = 'done' ORDER BY id", (queue,)
+            ).fetchall()
+        for key, payload, result in rows:
+            yield key, json.loads(payload), json.loads(result) if result is not None else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Server-side scripts keep every state change atomic without client-side locking.
+# Job hashes live at ARGV prefix + id; pending/leased are sorted sets scored by time.
+_REDIS_PUT = """
+local id = redis.call('HGET', KEYS[1], ARGV[1])
+if id then
+  -- Only a job finished at or before the cutoff (ARGV[5], '' when done_ttl is off) starts over
+  local state = redis.call('HGET', ARGV[4] .. id, 'state')
+  local finished = tonumber(redis.call('HGET', ARGV[4] .. id, 'finished_at'))
+  if ARGV[5] == '' or (state ~= 'done' and state ~= 'failed') or not finished
+      or finished > tonumber(ARGV[5]) then
+    return 0
+  end
+  redis.call('SREM', KEYS[4], id)
+  redis.call('SREM', KEYS[5], id)
+  redis.call('DEL', ARGV[4] .. id)
+else
+  id = redis.call('INCR', KEYS[2])
+  redis.call('HSET', KEYS[1], ARGV[1], id)
+end
+redis.call('HSET', ARGV[4] .. id, 'key', ARGV[1], 'payload', ARGV[2], 'state', 'pending', 'attempts', 0)
+redis.call('ZADD', KEYS[3], ARGV[3], id)
+return 1
+"""
+_REDIS_LEASE = """
+local pending, leased, failed = KEYS[1], KEYS[2], KEYS[3]
+local now = tonumber(ARGV[1])
+local expires = now + tonumber(ARGV[2])
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', leased, '-inf', now)) do
+  redis.call('ZREM', leased, id)
+  local job = ARGV[5] .. id
+  redis.call('HSET', job, 'last_error', 'lease expired', 'token', '')
+  if tonumber(redis.call('HGET', job, 'attempts')) >= tonumber(ARGV[4]) then
+    redis.call('HSET', job, 'state', 'failed', 'finished_at', ARGV[1])
+    redis.call('SADD', failed, id)
+  else
+    redis.call('HSET', job, 'state', 'pending')
+    redis.call('ZADD', pending, now, id)
+  end
+end
+local leases = {}
+for i, id in ipairs(redis.call('ZRANGEBYSCORE', pending, '-inf', now, 'LIMIT', 0, tonumber(ARGV[6]))) do
+  local job = ARGV[5] .. id
+  local token = ARGV[7] .. i
+  redis.call('ZREM', pending, id)
+  redis.call('ZADD', leased, expires, id)
+  local attempts = redis.call('HINCRBY', job, 'attempts', 1)
+  redis.call('HSET', job, 'state', 'leased', 'owner', ARGV[3], 'token', token)
+  table.insert(leases, {id, redis.call('HGET', job, 'key'), redis.call('HGET', job, 'payload'), attempts, token})
+end
+return leases
+"""
+_REDIS_HEARTBEAT = """
+if redis.call('HGET', ARGV[1], 'token') ~= ARGV[3] then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[2])
+return 1
+"""
+_REDIS_FINISH = """
+if redis.call('HGET', ARGV[1], 'token') ~= ARGV[3] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[2])
+redis.call('HSET', ARGV[1], 'state', ARGV[4], 'token', '', ARGV[5], ARGV[6])
+if ARGV[4] == 'pending' then
+  redis.call('ZADD', KEYS[2], ARGV[7], ARGV[2])
+else
+  redis.call('HSET', ARGV[1], 'finished_at', ARGV[8])
+  redis.call('SADD', KEYS[3], ARGV[2])
+end
+return 1
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """JobQueue on a Redis-compatible server (Redis, Valkey, KeyDB, ...), for workers on several machines.
+
+    Needs the ``redis`` package and a server with Lua scripting (EVAL);
+    ``client`` must be created with ``decode_responses=True``.
+    """
+
+    def __init__(self, client, prefix='airbnb_jobs', **options):
+        super().__init__(**options)
+        self.client = client
+        self.prefix = prefix
+        self._put = client.register_script(_REDIS_PUT)
+        self._lease = client.register_script(_REDIS_LEASE)
+        self._heartbeat = client.register_script(_REDIS_HEARTBEAT)
+        self._finish = client.register_script(_REDIS_FINISH)
+
+    @classmethod
+    def from_url(cls, url, **options):
+        import redis
+        return cls(redis.Redis.from_url(url, decode_responses=True), **options)
+
+    def _key(self, queue, name):
+        return f"{self.prefix}:{queue}:{name}"
+
+    def _job_key(self, queue, id):
+        return f"{self._key(queue, 'job')}:{id}"
+
+    def put(self, queue, key, payload, delay=0):
+        now = time.time()
+        cutoff = self.requeue_cutoff(now)
+        added = self._put(
+            keys=[self._key(queue, 'keys'), self._key(queue, 'seq'), self._key(queue, 'pending'),
+                  self._key(queue, 'done'), self._key(queue, 'failed')],
+            args=[key, json.dumps(payload, ensure_ascii=False), now + delay, self._job_key(queue, ''),
+                  '' if cutoff is None else cutoff],
+        )
+        return bool(added)
+
+    def lease(self, queue, owner, limit=1):
+        now = time.time()
+        rows = self._lease(
+            keys=[self._key(queue, 'pending'), self._key(queue, 'leased'), self._key(queue, 'failed')],
+            args=[now, self.visibility_timeout, owner, self.max_attempts, self._job_key(queue, ''), limit,
+                  f"{uuid.uuid4().hex}-"],
+        )
+        return [Job(int(id), queue, key, json.loads(payload), int(attempts), token)
+                for id, key, payload, attempts, token in rows]
+
+    def heartbeat(self, job):
+        return bool(self._heartbeat(
+            keys=[self._key(job.queue, 'leased')],
+            args=[self._job_key(job.queue, job.id), job.id, job.token, time.time() + self.visibility_timeout],
+        ))
+
+    def _finish_job(self, job, state, field, value, available_at=0):
+        return bool(self._finish(
+            keys=[self._key(job.queue, 'leased'), self._key(job.queue, 'pending'), self._key(job.queue, state)],
+            args=[self._job_key(job.queue, job.id), job.id, job.token, state, field, value, available_at,
+                  time.time()],
+        ))
+
+    def complete(self, job, result=None):
+        return self._finish_job(job, 'done', 'result', json.dumps(result, ensure_ascii=False, default=str))
+
+    def fail(self, job, error):
+        if job.attempts >= self.max_attempts:
+            return self._finish_job(job, 'failed', 'last_error', str(error))
+        return self._finish_job(job, 'pending', 'last_error', str(error),
+                                time.time() + self.retry_delay(job.attempts))
+
+    def counts(self, queue):
+        return {
+            'pending': self.client.zcard(self._key(queue, 'pending')),
+            'leased': self.client.zcard(self._key(queue, 'leased')),
+            'done': self.client.scard(self._key(queue, 'done')),
+            'failed': self.client.scard(self._key(queue, 'failed')),
+        }
+
+    def results(self, queue):
+        for id in sorted(self.client.smembers(self._key(queue, 'done')), key=int):
+            job = self.client.hgetall(self._job_key(queue, id))
+            result = job.get('result')
+            yield job['key'], json.loads(job['payload']), json.loads(result) if result else None
+
+    def close(self):
+        self.client.close()
+
+
+def open_job_queue(url='job_queue.sqlite3', **options):
+    """Open a queue from a ``redis://`` / ``rediss://`` URL or a SQLite file path (``sqlite:///`` optional)."""
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisJobQueue.from_url(url, **options)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteJobQueue(url, **options)
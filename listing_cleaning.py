@@ -0,0 +1,46 @@
+from bs4 import BeautifulSoup
+
+from embedded_data import extract_embedded_fields
+from text_processing import fast_clean_html, get_text_context, lxml_html
+from tracing import tracer
+
+
+def parse_html(html_content):
+    """Parse and clean HTML content."""
+    with tracer.span('parse_html'):
+        soup = BeautifulSoup(html_content, 'html.parser')
+        for element in soup(['script', 'style', 'footer']):
+            element.decompose()
+        return str(soup)
+
+def clean_content(parsed_html):
+    """Convert HTML to clean text."""
+    with tracer.span('clean_content'):
+        return get_text_context().html_to_markdown(parsed_html)
+
+
+def html_to_text(html_content):
+    """Turn page HTML into clean text with the single-pass cleaner, or parse_html() + clean_content() without lxml."""
+    if lxml_html is not None:
+        try:
+            return fast_clean_html(html_content)
+        except Exception:
+            pass
+    return clean_content(parse_html(html_content))
+
+
+def clean_listing(html_content, user_query):
+    """Read the embedded fields and clean the page text; returns ``(structured, remaining_query, text)``."""
+    with tracer.span('embedded json'):
+        structured, remaining_query = extract_embedded_fields(html_content, user_query)
+    if remaining_query is None:
+        return structured, None, None
+
+    # Process the content
+    with tracer.span('html_to_text'):
+        return structured, remaining_query, html_to_text(html_content)
+
+
+def clean_listing_in_process(html_content, user_query):
+    """Run clean_listing() in a worker process; returns its result and the spans recorded there."""
+    return clean_listing(html_content, user_query), tracer.drain_spans()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class LLMCache:
+    """Persistent SQLite cache for LLM extraction results.
+
+    Entries are keyed by a hash of everything that determines the model's
+    answer (model, system prompt, user query and chunk text), expire after
+    ``ttl_seconds`` and are evicted least-recently-used first once the
+    stored values exceed ``max_bytes``. Hits only read; their ``last_used``
+    times are written with the next put or eviction.
+    """
+
+    def __init__(self, path='llm_cache.sqlite3', ttl_seconds=7 * 24 * 3600,
+                 max_bytes=100 * 1024 * 1024, evict_every=50):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._touched = {}  # key -> last_used not written yet
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # Readers in other processes do not block writes
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+        self._conn.commit()
+        self.reset_stats()
+        self.evict()
+
+    @staticmethod
+    def make_key(model, system_prompt, user_query, chunk):
+        """Return the content address for one extraction request."""
+        payload = json.dumps([model, system_prompt, user_query, chunk], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def reset_stats(self):
+        self.stats = {'hits': 0, 'misses': 0, 'deduped': 0, 'writes': 0, 'evictions': 0}
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:  # Expired rows go with the next eviction
+                self.stats['misses'] += 1
+                return None
+            self._touched[key] = now
+            self.stats['hits'] += 1
+            return row[0]
+
+    def _write_touched(self):
+        self._conn.executemany("UPDATE llm_cache SET last_used = ? WHERE key = ?",
+                               [(used, key) for key, used in self._touched.items()])
+        self._touched = {}
+
+    def put(self, key, value):
+        """Store ``value`` under ``key``, evicting old entries when over budget."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now),
+            )
+            self._touched.pop(key, None)
+            self._write_touched()
+            self._conn.commit()
+            self.stats['writes'] += 1
+            self._writes_since_evict += 1
+            due = self._writes_since_evict >= self.evict_every
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under ``max_bytes``."""
+        with self._lock:
+            self._writes_since_evict = 0
+            self._write_touched()
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            evicted = cursor.rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used"):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+                evicted += len(doomed)
+            self._conn.commit()
+            self.stats['evictions'] += evicted
+
+    def clear(self):
+        with self._lock:
+            self._touched = {}
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
@@ -0,0 +1,63 @@
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class PageStore:
+    """Local SQLite store of fetched pages, keyed by canonical URL.
+
+    Raw HTML is kept zlib-compressed together with its fetch time so
+    fresh pages can skip the browser and whole runs can be replayed
+    offline from disk.
+    """
+
+    def __init__(self, path='page_cache.sqlite3'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " html BLOB NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+    def get(self, url, max_age=None):
+        """Return the stored HTML for ``url``, or None if missing or older than ``max_age`` seconds.
+
+        ``max_age=None`` accepts pages of any age (offline replay).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT html, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, url, html):
+        """Store ``html`` for ``url`` stamped with the current time."""
+        blob = zlib.compress(html.encode('utf-8'), 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, html, fetched_at) VALUES (?, ?, ?)",
+                (url, blob, time.time()),
+            )
+            self._conn.commit()
+        self.stats['writes'] += 1
+
+    def fetched_at(self, url):
+        """Return when ``url`` was stored (epoch seconds) or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def urls(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT url FROM pages ORDER BY url")]
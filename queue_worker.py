@@ -0,0 +1,260 @@
+"""Cooperating scraper workers that share one durable job queue.
+
+Usage:
+    python queue_worker.py enqueue searches.csv [--query Q] [--queue job_queue.sqlite3]
+    python queue_worker.py work [--queue redis://host:6379/0] [--threads 2] [--wait]
+    python queue_worker.py status
+    python queue_worker.py export --output results.csv
+
+``enqueue`` adds search jobs (same CSV format as batch_scrape.py). Any
+number of ``work`` processes, on one machine with the default SQLite queue
+or on several with a Redis-compatible server, lease search jobs (crawling
+them into deduplicated listing jobs) and listing jobs (fetch + extract).
+Jobs of a crashed worker are picked up by others once their lease expires.
+A search or listing that already finished is not queued again unless it
+finished more than ``--done-ttl`` seconds ago.
+``export`` writes the finished listings as one CSV.
+"""
+import argparse
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+from batch_scrape import init_worker, read_searches
+from job_queue import open_job_queue
+
+logger = logging.getLogger('airbnb_scraper.queue')
+
+SEARCH_QUEUE = 'search'
+LISTING_QUEUE = 'listing'
+
+
+class Heartbeat:
+    """Keep the leases of the jobs being worked on alive from a background thread."""
+
+    def __init__(self, jobs, interval):
+        self.jobs = jobs
+        self.interval = interval
+        self._active = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def add(self, job):
+        with self._lock:
+            self._active[(job.queue, job.id)] = job
+
+    def remove(self, job):
+        with self._lock:
+            self._active.pop((job.queue, job.id), None)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                active = list(self._active.values())
+            for job in active:
+                if not self.jobs.heartbeat(job):
+                    logger.warning(f"Lost the lease on {job}; another worker may redo it")
+
+
+class QueueWorker:
+    """Pull search and listing jobs from a JobQueue on several threads."""
+
+    def __init__(self, jobs, driver_pool, extractor, threads=2, min_interval=3.0, page_store=None,
+                 max_age=None, http_fetcher=None, batched=False, fingerprints=None, poll_interval=2.0):
+        import airbnb_aiscraper as scraper
+        self.scraper = scraper
+        self.jobs = jobs
+        self.driver_pool = driver_pool
+        self.extractor = extractor
+        self.threads = max(1, int(threads))
+        self.rate_limiter = scraper.HostRateLimiter(min_interval)
+        self.page_store = page_store
+        self.max_age = max_age
+        self.http_fetcher = http_fetcher
+        self.batched = batched
+        self.fingerprints = fingerprints
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.heartbeat = Heartbeat(jobs, max(1.0, jobs.visibility_timeout / 3))
+        self.stats = {'searches': 0, 'listings': 0, 'failed': 0}
+
+    def run(self, wait=False):
+        """Work until both queues are drained, or forever with ``wait``."""
+        threads = [threading.Thread(target=self._run_thread, args=(wait,), daemon=True) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.heartbeat.stop()
+        return self.stats
+
+    def _drained(self):
+        # Jobs leased elsewhere may still come back if their worker dies, so wait for them too
+        return all(counts['pending'] == 0 and counts['leased'] == 0
+                   for counts in (self.jobs.counts(LISTING_QUEUE), self.jobs.counts(SEARCH_QUEUE)))
+
+    def _run_thread(self, wait):
+        while True:
+            # Listings first, so results stream while other searches are still queued
+            job = next(iter(self.jobs.lease(LISTING_QUEUE, self.owner) or self.jobs.lease(SEARCH_QUEUE, self.owner)), None)
+            if job is None:
+                if not wait and self._drained():
+                    return
+                self.extractor.new_run()  # Idle: later jobs start a new run
+                time.sleep(self.poll_interval)
+                continue
+            self.heartbeat.add(job)
+            try:
+                if job.queue == SEARCH_QUEUE:
+                    self._run_search(job)
+                else:
+                    self._run_listing(job)
+            except Exception as e:
+                logger.error(f"{job} failed: {e}")
+                self.stats['failed'] += 1
+                self.jobs.fail(job, e)
+            finally:
+                self.heartbeat.remove(job)
+
+    def _run_search(self, job):
+        search = job.payload
+        # Each search starts a run, so chunks deduplicated in memory do not outlive the LLMCache TTL
+        self.extractor.new_run()
+        crawler = self.scraper.SearchCrawler(search['search_url'], self.driver_pool, max_pages=search['pages'],
+                                             workers=1, rate_limiter=self.rate_limiter,
+                                             page_store=self.page_store)
+        found = []
+
+        def on_listing(listing):
+            key = f"{search['query']}\n{self.scraper.listing_key(listing['url'])}"
+            if self.jobs.put(LISTING_QUEUE, key, dict(listing, query=search['query'],
+                                                      search_url=search['search_url'])):
+                found.append(listing)
+
+        crawler.crawl(on_listing)
+        if not len(crawler.index):
+            raise RuntimeError("no listings found")  # Crawl errors are only logged; retry the search
+        self.jobs.complete(job, {'listings': len(found)})
+        self.stats['searches'] += 1
+        logger.info(f"Crawled {search['search_url']}: {len(found)} new listings queued")
+
+    def _run_listing(self, job):
+        listing = job.payload
+        scraper = self.scraper
+        with scraper.tracer.listing(scraper.canonical_listing_url(listing['url'])):
+            html_content = scraper.get_listing_html(listing['url'], self.driver_pool, self.rate_limiter,
+                                                    self.page_store, self.max_age, http_fetcher=self.http_fetcher)
+            if not html_content:
+                raise RuntimeError(f"Unable to load content for {listing['url']}")
+            result = scraper.extract_listing(html_content, listing['query'], self.extractor,
+                                             link=listing['url'], batched=self.batched,
+                                             fingerprints=self.fingerprints)
+        if scraper.is_error_result(result):
+            raise RuntimeError(result)
+        if self.jobs.complete(job, result):
+            self.stats['listings'] += 1
+            logger.info(f"Extracted {listing['url']}")
+
+
+def export_results(jobs, output):
+    """Write every finished listing job as one CSV row; returns the row count."""
+    import airbnb_aiscraper as scraper
+    finished = list(jobs.results(LISTING_QUEUE))
+    df = scraper.records_to_dataframe([
+        {'link': listing['url'], 'price': listing.get('price'), 'data': result}
+        for key, listing, result in finished
+    ])
+    if len(df):
+        df.insert(0, 'query', [listing.get('query') for key, listing, result in finished])
+        df.insert(0, 'search_url', [listing.get('search_url') for key, listing, result in finished])
+    df.to_csv(output, index=False)
+    return len(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queue', default=os.environ.get('SCRAPER_QUEUE_URL', 'job_queue.sqlite3'),
+                        help='SQLite path or redis:// URL (default: $SCRAPER_QUEUE_URL or job_queue.sqlite3)')
+    parser.add_argument('--visibility-timeout', type=float, default=300, help='seconds before an abandoned lease expires')
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--done-ttl', type=float, default=None,
+                        help='seconds after which a finished job can be queued again (default: never)')
+    parser.add_argument('--verbose', action='store_true', help='log every scraper message')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='add search jobs from a CSV file')
+    enqueue.add_argument('searches', help='CSV file with search_url[,query][,pages] columns')
+    enqueue.add_argument('--query', help='query for rows without one')
+    enqueue.add_argument('--pages', type=int, default=1)
+
+    work = commands.add_parser('work', help='process jobs until the queues are empty')
+    work.add_argument('--threads', type=int, default=2, help='jobs worked on at once (one browser each)')
+    work.add_argument('--wait', action='store_true', help='keep polling for new jobs instead of exiting')
+    work.add_argument('--pages-per-browser', type=int, default=25)
+    work.add_argument('--min-interval', type=float, default=3.0, help='minimum seconds between requests to a host')
+    work.add_argument('--page-max-age', type=int, default=60, help='reuse cached listing pages younger than this (minutes)')
+    work.add_argument('--no-http', dest='http', action='store_false', help='always render listings in the browser')
+    work.add_argument('--batching', dest='batched', action='store_true',
+                      help='extract small listings together in one structured JSON request')
+    work.add_argument('--no-change-detection', dest='skip_unchanged', action='store_false',
+                      help='re-extract listings even when their text has not changed')
+
+    commands.add_parser('status', help='show job counts per queue and state')
+
+    export = commands.add_parser('export', help='write finished listings to CSV')
+    export.add_argument('--output', default='airbnb_queue_results.csv')
+    args = parser.parse_args(argv)
+
+    init_worker(args.verbose)
+    logger.setLevel(logging.INFO)
+    jobs = open_job_queue(args.queue, visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts,
+                          done_ttl=args.done_ttl)
+    try:
+        if args.command == 'enqueue':
+            try:
+                searches = read_searches(args.searches, args.query, args.pages)
+            except (OSError, ValueError) as e:
+                parser.error(str(e))
+            added = sum(jobs.put(SEARCH_QUEUE, f"{s['query']}\n{s['search_url']}", s) for s in searches)
+            logger.info(f"Queued {added} new searches ({len(searches) - added} already queued)")
+        elif args.command == 'status':
+            for queue in (SEARCH_QUEUE, LISTING_QUEUE):
+                print(queue, jobs.counts(queue))
+        elif args.command == 'export':
+            logger.info(f"Wrote {export_results(jobs, args.output)} listings to {args.output}")
+        else:
+            import airbnb_aiscraper as scraper
+            from http_fetcher import HttpFetcher
+            from fingerprint_store import FingerprintStore
+            from llm_cache import LLMCache
+            from page_store import PageStore
+
+            driver_pool = scraper.DriverPool(size=args.threads, max_pages_per_driver=args.pages_per_browser,
+                                             resource_policy=scraper.ResourcePolicy())
+            http_fetcher = HttpFetcher() if args.http else None
+            worker = QueueWorker(jobs, driver_pool, scraper.AsyncExtractor(cache=LLMCache()), threads=args.threads,
+                                 min_interval=args.min_interval, page_store=PageStore(),
+                                 max_age=args.page_max_age * 60, http_fetcher=http_fetcher, batched=args.batched,
+                                 fingerprints=FingerprintStore() if args.skip_unchanged else None)
+            try:
+                stats = worker.run(wait=args.wait)
+            finally:
+                driver_pool.close()
+                if http_fetcher is not None:
+                    http_fetcher.close()
+            logger.info(f"Done: {stats['searches']} searches, {stats['listings']} listings, "
+                        f"{stats['failed']} failed attempts")
+    finally:
+        jobs.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
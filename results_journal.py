@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ResultsJournal:
+    """Durable JSONL journal of finished listings for one search URL and query.
+
+    Every record is flushed and fsynced as soon as it is appended, so a
+    crash or rerun loses at most the listing in flight. ``load()`` returns
+    the completed records keyed by listing URL for resuming. Once a run
+    finishes, ``complete()`` moves the journal aside, so only an interrupted
+    run is ever resumed.
+    """
+
+    def __init__(self, search_url, user_query, directory='journals'):
+        self.search_url = search_url
+        self.user_query = user_query
+        self.run_key = hashlib.sha256(f"{search_url}\n{user_query}".encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(directory, f"{self.run_key}.jsonl")
+        self.completed_path = os.path.join(directory, f"{self.run_key}.done.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self):
+        """Return ``{listing_key: record}`` for every journaled listing; later entries win."""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn final line from a crash mid-write
+                if record.get('query') == self.user_query and record.get('key'):
+                    records[record['key']] = record
+        return records
+
+    def append(self, key, record):
+        """Durably append ``record`` for the listing identified by ``key``."""
+        line = json.dumps(dict(record, key=key, query=self.user_query, completed_at=time.time()),
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, 'a+b') as f:
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        f.write(b'\n')  # Terminate a torn line left by a crash
+                f.write(line.encode('utf-8') + b'\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def complete(self):
+        """Mark the run finished: the journal becomes the ``.done`` file, replacing the previous one."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.replace(self.path, self.completed_path)
+
+    def reset(self):
+        """Start the journal over, discarding earlier results for this search and query."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,233 @@
+import datetime
+import json
+import os
+import re
+import threading
+import uuid
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from embedded_data import PHRASE_TO_FIELD
+
+RESULTS_SCHEMA = pa.schema([
+    ('run_id', pa.string()),
+    ('scraped_at', pa.timestamp('us', tz='UTC')),
+    ('search_url', pa.string()),
+    ('query', pa.string()),
+    ('link', pa.string()),
+    ('listing_id', pa.string()),
+    ('title', pa.string()),
+    ('price', pa.float64()),
+    ('currency', pa.string()),
+    ('price_text', pa.string()),
+    ('rating', pa.float64()),
+    ('review_count', pa.int64()),
+    ('fields', pa.string()),  # JSON object of every extracted field, keyed by query phrase
+    ('extracted_info', pa.string()),
+    ('error', pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([('run_date', pa.string()), ('market', pa.string())]), flavor='hive')
+
+CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '£': 'GBP', '¥': 'JPY', '₹': 'INR', '₩': 'KRW', 'R$': 'BRL', 'CHF': 'CHF'}
+CURRENCY_PATTERN = re.compile(r'R\$|[$€£¥₹₩]|\b[A-Z]{3}\b')
+# Spaces and apostrophes (e.g. CHF 1’200) only count as thousands separators between digit groups
+NUMBER_PATTERN = re.compile(r"\d(?:[\d.,]|[ \xa0\u202f'’](?=\d{3}\b))*")
+GROUP_SEPARATOR_PATTERN = re.compile(r"[ \xa0\u202f'’]")
+RATING_TEXT_PATTERN = re.compile(r'rating\D{0,20}(\d(?:[.,]\d{1,2})?)', re.IGNORECASE)
+LISTING_ID_PATTERN = re.compile(r'/rooms/(?:plus/)?(\d+)')
+
+
+def parse_number(text):
+    """Parse the first number in ``text``, accepting either ',' or '.' as decimal separator."""
+    match = NUMBER_PATTERN.search(text or '')
+    if not match:
+        return None
+    number = GROUP_SEPARATOR_PATTERN.sub('', match.group(0)).rstrip('.,')
+    if ',' in number and '.' in number:
+        decimal = max(number.rfind(','), number.rfind('.'))
+        number = re.sub(r'[.,]', '', number[:decimal]) + '.' + number[decimal + 1:]
+    elif ',' in number:
+        whole, _, fraction = number.rpartition(',')
+        number = f"{whole.replace(',', '')}.{fraction}" if len(fraction) != 3 else number.replace(',', '')
+    elif number.count('.') > 1 or re.search(r'\.\d{3}$', number) and len(number) > 4:
+        number = number.replace('.', '')  # Dots as thousands separators
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def parse_price(text):
+    """Return ``(amount, currency)`` from a price string such as '$1,234 night' or '89 € total'."""
+    if text is None:
+        return None, None
+    text = str(text)
+    match = CURRENCY_PATTERN.search(text)
+    if not match:
+        return parse_number(text), None
+    currency = CURRENCY_SYMBOLS.get(match.group(0), match.group(0))
+    # The amount is the number next to the currency, not e.g. the guest count in '2 guests · $120'
+    amount = NUMBER_PATTERN.match(text[match.end():].lstrip(' \xa0\u202f'))
+    if amount is None:
+        before = text[:match.start()].rstrip(' \xa0\u202f')
+        amount = next((number for number in NUMBER_PATTERN.finditer(before) if number.end() == len(before)), None)
+    return parse_number(amount.group(0) if amount else text), currency
+
+
+def market_from_url(search_url):
+    """Return a partition-safe market name from an Airbnb search URL (the place in /s/<place>/homes)."""
+    parsed = urlparse(search_url or '')
+    match = re.match(r'/s/([^/]+)', parsed.path)
+    place = unquote(match.group(1)) if match else (parse_qs(parsed.query).get('query') or ['unknown'])[0]
+    return re.sub(r'[^a-z0-9]+', '-', place.lower()).strip('-') or 'unknown'
+
+
+def _typed_field(fields, name):
+    for phrase, value in fields.items():
+        if PHRASE_TO_FIELD.get(str(phrase).lower()) == name and value not in (None, ''):
+            return value
+    return None
+
+
+def result_row(record, search_url, query, run_id, scraped_at=None):
+    """Flatten one ``{'link', 'price', 'data'}`` record into a row of RESULTS_SCHEMA."""
+    data = record.get('data')
+    fields, extracted_info, error = {}, None, None
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except ValueError:
+            pass
+    if isinstance(data, dict):
+        fields = data
+        extracted_info = data.get('extracted_info')
+    elif isinstance(data, list):
+        for entry in data:
+            if isinstance(entry, dict):
+                fields.update(entry)
+            else:
+                extracted_info = '\n'.join(filter(None, [extracted_info, str(entry)]))
+    elif isinstance(data, str) and data.startswith("Error"):
+        error = data
+    elif data is not None:
+        extracted_info = str(data)
+
+    price_text = record.get('price') or _typed_field(fields, 'price')
+    price, currency = parse_price(price_text)
+    rating = _typed_field(fields, 'rating')
+    rating = parse_number(str(rating)) if rating is not None else None
+    if rating is None and extracted_info:
+        match = RATING_TEXT_PATTERN.search(extracted_info)
+        rating = parse_number(match.group(1)) if match else None
+    review_count = _typed_field(fields, 'review_count')
+    review_count = parse_number(str(review_count)) if review_count is not None else None
+    title = _typed_field(fields, 'title')
+    link = record.get('link')
+    listing_id = LISTING_ID_PATTERN.search(link or '')
+    return {
+        'run_id': run_id,
+        'scraped_at': scraped_at or datetime.datetime.now(datetime.timezone.utc),
+        'search_url': search_url,
+        'query': query,
+        'link': link,
+        'listing_id': listing_id.group(1) if listing_id else None,
+        'title': str(title) if title is not None else None,
+        'price': price,
+        'currency': currency,
+        'price_text': str(price_text) if price_text is not None else None,
+        'rating': rating,
+        'review_count': int(review_count) if review_count is not None else None,
+        'fields': json.dumps(fields, ensure_ascii=False, default=str) if fields else None,
+        'extracted_info': extracted_info if isinstance(extracted_info, str) or extracted_info is None
+        else json.dumps(extracted_info, ensure_ascii=False, default=str),
+        'error': error,
+    }
+
+
+class ResultsWriter:
+    """Append one run's listing results to a Hive-partitioned Parquet dataset.
+
+    Rows land in ``<root>/run_date=YYYY-MM-DD/market=<market>/<run_id>.parquet``.
+    Rows are buffered and written as row groups of ``row_group_size``; the
+    file is written under a '_'-prefixed temporary name, which dataset scans
+    skip, and only appears under its final name once ``close()`` writes the
+    footer, so readers never see a partial file.
+    """
+
+    def __init__(self, search_url, query, root='results', run_id=None, market=None, row_group_size=1000):
+        self.search_url = search_url
+        self.query = query
+        self.run_id = run_id or f"{datetime.datetime.now(datetime.timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.run_date = datetime.date.today().isoformat()
+        self.market = market or market_from_url(search_url)
+        self.row_group_size = row_group_size
+        directory = os.path.join(root, f"run_date={self.run_date}", f"market={self.market}")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{self.run_id}.parquet")
+        self._tmp_path = os.path.join(directory, f"_{self.run_id}.parquet.tmp")
+        self._writer = None
+        self._rows = []
+        self._lock = threading.Lock()
+        self.rows_written = 0
+
+    def append(self, record):
+        """Add one ``{'link', 'price', 'data'}`` record and return its typed row."""
+        row = result_row(record, self.search_url, self.query, self.run_id)
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) >= self.row_group_size:
+                self._flush()
+        return row
+
+    def filters(self):
+        """``load_results()`` filters selecting this run's rows."""
+        return [('run_date', '=', self.run_date), ('market', '=', self.market), ('run_id', '=', self.run_id)]
+
+    def _flush(self):
+        if not self._rows:
+            return
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._tmp_path, RESULTS_SCHEMA, compression='zstd')
+        self._writer.write_table(pa.Table.from_pylist(self._rows, schema=RESULTS_SCHEMA))
+        self.rows_written += len(self._rows)
+        self._rows = []
+
+    def close(self):
+        """Write the remaining rows and publish the file; returns its path, or None if no rows."""
+        with self._lock:
+            self._flush()
+            if self._writer is None:
+                return None
+            self._writer.close()
+            self._writer = None
+            os.replace(self._tmp_path, self.path)
+        return self.path
+
+
+def results_dataset(root='results'):
+    """Return the pyarrow dataset over every run under ``root`` (partition columns included)."""
+    return ds.dataset(root, format='parquet', partitioning=PARTITIONING,
+                      schema=RESULTS_SCHEMA.append(pa.field('run_date', pa.string()))
+                      .append(pa.field('market', pa.string())))
+
+
+def load_results(root='results', columns=None, filters=None, as_pandas=True):
+    """Read results across runs, pushing ``columns`` and ``filters`` down to the Parquet scan.
+
+    ``filters`` is a pyarrow expression or a list of ``(column, op, value)``
+    tuples that must all hold, e.g. ``[('market', '=', 'amsterdam'),
+    ('run_date', '>=', '2026-01-01'), ('price', '<', 150)]``. Partition
+    filters skip whole directories; the rest use row-group statistics.
+    """
+    if not os.path.isdir(root):
+        table = RESULTS_SCHEMA.empty_table()
+        if columns:
+            table = table.select([column for column in columns if column in RESULTS_SCHEMA.names])
+        return table.to_pandas() if as_pandas else table
+    if isinstance(filters, list):
+        filters = pq.filters_to_expression(filters)
+    table = results_dataset(root).to_table(columns=columns, filter=filters)
+    return table.to_pandas() if as_pandas else table
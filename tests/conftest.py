@@ -0,0 +1,64 @@
+from concurrent.futures import Future
+
+import pytest
+import tiktoken
+
+import text_processing
+
+# Byte-level BPE with a few merges that straddle UTF-8 character boundaries,
+# so tokenizer code can be tested without downloading an encoding.
+PATTERN = r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
+MERGES = [b'th', b'he', b'in', b' t', b' th', b'\xe4\xb8', b'\xad\xe6', b'\xf0\x9f', b'\x98\x80\xf0']
+
+
+def make_encoding():
+    ranks = {bytes([i]): i for i in range(256)}
+    for merge in MERGES:
+        ranks[merge] = len(ranks)
+    return tiktoken.Encoding(name='test_bytes', pat_str=PATTERN, mergeable_ranks=ranks, special_tokens={})
+
+
+@pytest.fixture
+def text_context(monkeypatch):
+    """A TextContext on the offline test encoding, installed as the process-wide one."""
+    monkeypatch.setattr(tiktoken, 'get_encoding', lambda name: make_encoding())
+    context = text_processing.TextContext()
+    monkeypatch.setattr(text_processing, '_text_context', context)
+    return context
+
+
+def resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+class FakeExtractor:
+    """Answers every chunk and batched listing at once and records what it was sent."""
+    bypass_cache = False
+
+    def __init__(self):
+        self.chunks = []
+        self.batched = []  # (url, text, flush) per batched listing
+        self.flushed_open = 0
+        self.runs = 0
+
+    def new_run(self):
+        self.runs += 1
+
+    def extract(self, chunks, user_query):
+        self.chunks += chunks
+        return resolved([f"answer {len(self.chunks)}" for _ in chunks])
+
+    def extract_batched(self, url, text, user_query, flush=False):
+        self.batched.append((url, text, flush))
+        return resolved({user_query: f"answer {len(self.batched)}"})
+
+    def flush_batches(self):
+        self.flushed_open += 1
+
+
+@pytest.fixture
+def make_extractor():
+    """Factory of FakeExtractors, for tests that need one per run."""
+    return FakeExtractor
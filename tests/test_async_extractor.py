@@ -0,0 +1,56 @@
+import httpx
+import openai
+import pytest
+
+import airbnb_aiscraper as scraper
+from tracing import tracer
+
+
+def completion(content):
+    return {
+        'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': scraper.EXTRACTION_MODEL,
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}],
+        'usage': {'prompt_tokens': 10, 'completion_tokens': 2, 'total_tokens': 12},
+    }
+
+
+@pytest.fixture
+def extractor(monkeypatch, text_context):
+    monkeypatch.setattr(openai, 'api_key', 'test-key')
+    extractor = scraper.AsyncExtractor(max_retries=5, base_delay=0.001, max_delay=0.01)
+    yield extractor
+    extractor._loop.call_soon_threadsafe(extractor._loop.stop)
+
+
+def test_client_is_shared_and_does_not_retry_itself(extractor):
+    client = extractor._get_client()
+    assert client.max_retries == 0
+    assert extractor._get_client() is client
+
+
+def test_retry_after_is_capped(extractor):
+    response = httpx.Response(429, headers={'retry-after': '3600'},
+                              request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+    error = openai.RateLimitError('slow down', response=response, body=None)
+    assert extractor._backoff(0, error) == extractor.max_delay
+
+
+def test_every_rate_limited_response_is_one_counted_retry(extractor):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) % 2:
+            return httpx.Response(429, headers={'retry-after': '0'}, json={'error': {'message': 'slow down'}})
+        return httpx.Response(200, json=completion('ok'))
+
+    extractor._client = extractor._get_client().with_options(
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    retries = tracer.counters['openai_retries']
+    results = extractor.extract(['first chunk', 'second chunk', 'third chunk'], 'price').result(timeout=10)
+
+    assert results == ['ok', 'ok', 'ok']
+    rate_limited = sum(1 for request in requests) - len(results)
+    assert rate_limited > 0
+    assert tracer.counters['openai_retries'] - retries == rate_limited
@@ -0,0 +1,36 @@
+import airbnb_aiscraper as scraper
+from page_store import PageStore
+
+QUERY = 'house rules'
+
+
+def test_last_listing_sends_its_batch_without_lingering(tmp_path, text_context, make_extractor):
+    store = PageStore(str(tmp_path / 'pages.sqlite3'))
+    listings = []
+    for room in range(3):
+        url = f"https://www.airbnb.com/rooms/{room + 1}"
+        store.put(url, f"<html><body><h1>Room {room}</h1><p>No parties.</p></body></html>")
+        listings.append({'url': url, 'price': None})
+    extractor = make_extractor()
+    pool = scraper.ListingWorkerPool(QUERY, None, workers=1, extractor=extractor, page_store=store,
+                                     offline=True, batched=True).start()
+    for listing in listings:
+        pool.submit(listing)
+    pool.close()
+    results = [result for _, _, result in pool.results()]
+    assert [result[QUERY] for result in results] == ['answer 1', 'answer 2', 'answer 3']
+    # With one worker no other listing can join, so every batch is sent as soon as it is joined
+    assert [flush for _, _, flush in extractor.batched] == [True, True, True]
+
+
+def test_open_batches_are_sent_when_no_listing_can_join(make_extractor):
+    extractor = make_extractor()
+    pool = scraper.ListingWorkerPool(QUERY, None, extractor=extractor, batched=True)
+    pool._listing_started()
+    pool._listing_started()
+    pool._listing_started()
+    assert pool._listing_decided(joins_batch=True) is False
+    assert pool._listing_decided(joins_batch=False) is False
+    assert extractor.flushed_open == 0
+    assert pool._listing_decided(joins_batch=False) is True
+    assert extractor.flushed_open == 1
@@ -0,0 +1,40 @@
+import pytest
+
+import airbnb_aiscraper as scraper
+from fingerprint_store import FingerprintStore
+
+QUERY = 'house rules'
+URL = 'https://www.airbnb.com/rooms/1'
+PAGE = """<html><body><h1>Garden cottage</h1><h2>House rules</h2><p>{rules}</p>
+<h2>Similar listings</h2><p>{similar}</p></body></html>"""
+
+
+@pytest.fixture
+def fingerprints(tmp_path):
+    return FingerprintStore(str(tmp_path / 'fingerprints.sqlite3'))
+
+
+def extract(page, extractor, fingerprints, batched):
+    return scraper.extract_listing(page, QUERY, extractor, link=URL, batched=batched, fingerprints=fingerprints)
+
+
+@pytest.mark.parametrize('batched', [True, False])
+def test_changed_listing_reuses_unchanged_chunks(fingerprints, text_context, make_extractor, batched):
+    extractor = make_extractor()
+    sent = extractor.batched if batched else extractor.chunks
+    first = extract(PAGE.format(rules='No parties.', similar='Cabin in Os'), extractor, fingerprints, batched)
+    # Similar listings are boilerplate, so the chunk sent to the model is the same
+    second = extract(PAGE.format(rules='No parties.', similar='Home in Bergen'), extractor, fingerprints, batched)
+    third = extract(PAGE.format(rules='Pets allowed.', similar='Home in Bergen'), extractor, fingerprints, batched)
+    assert len(sent) == 2
+    assert second == first
+    assert third != first
+    assert fingerprints.stats == {'new': 1, 'unchanged': 0, 'changed': 2, 'changed_sections': 2,
+                                  'llm_calls': 2, 'llm_calls_avoided': 1}
+
+
+def test_batched_answers_are_not_reused_for_chunked_extraction(fingerprints, text_context, make_extractor):
+    extractor = make_extractor()
+    extract(PAGE.format(rules='No parties.', similar='Cabin in Os'), extractor, fingerprints, True)
+    extract(PAGE.format(rules='No parties.', similar='Home in Bergen'), extractor, fingerprints, False)
+    assert (len(extractor.batched), len(extractor.chunks)) == (1, 1)
@@ -0,0 +1,49 @@
+import glob
+import os
+
+import pytest
+
+from benchmarks.bench_cleaning import (CLEANING_FIXTURES_DIR, FIXTURES_DIR, legacy_clean, line_similarity,
+                                       similarity)
+from text_processing import fast_clean_html
+
+pytestmark = pytest.mark.usefixtures('text_context')
+
+MIN_SIMILARITY = 0.95
+
+
+def page(body):
+    return f"<html><body>{body}</body></html>"
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))
+                                        + glob.glob(os.path.join(CLEANING_FIXTURES_DIR, '*.html'))),
+                         ids=os.path.basename)
+def test_fast_cleaner_matches_legacy_on_fixtures(path):
+    with open(path, encoding='utf-8') as f:
+        html_content = f.read()
+    legacy, fast = legacy_clean(html_content), fast_clean_html(html_content)
+    assert similarity(legacy, fast) >= MIN_SIMILARITY
+    assert line_similarity(legacy, fast) >= MIN_SIMILARITY
+
+
+@pytest.mark.parametrize('body', [
+    '<ul><li><p>Wifi</p></li><li><div><p>Kitchen</p></div><p>Shared</p></li></ul><p>After</p>',
+    '<ol><li>One</li><li>Two<ul><li>Nested</li></ul></li></ol>',
+    '<table><tr><th>Room</th><th>Beds</th></tr><tr><td>Bedroom 1</td><td>1 queen bed</td></tr></table>',
+    '<table><tr><td>Cleaning fee</td><td>$60</td></tr><tr><td>Total</td><td>$400</td></tr></table>',
+    '<pre>Check-in:  3pm\n  Checkout: 11am\nWifi: <code>guest-1234</code></pre><p>After</p>',
+    '<blockquote><p>Great stay.</p><p>Would return.</p></blockquote>',
+], ids=['list-item-blocks', 'nested-lists', 'header-table', 'plain-table', 'pre', 'blockquote'])
+def test_structures_keep_legacy_lines(body):
+    legacy, fast = legacy_clean(page(body)), fast_clean_html(page(body))
+    assert line_similarity(legacy, fast) == 1.0, (legacy, fast)
+
+
+def test_list_item_block_stays_on_marker_line():
+    assert fast_clean_html(page('<ul><li><p>Wifi</p></li><li><p>Kitchen</p></li></ul>')) == '  * Wifi\n\n  * Kitchen\n'
+
+
+def test_pre_keeps_line_breaks_and_indentation():
+    text = fast_clean_html(page('<pre>Parking:   free\n  2 cars</pre>'))
+    assert text.splitlines() == ['    Parking:   free', '      2 cars']
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from embedded_data import extract_embedded_fields, parse_query_fields
+
+LISTING = {
+    '@context': 'https://schema.org', '@type': 'VacationRental', 'name': 'Garden cottage',
+    'aggregateRating': {'@type': 'AggregateRating', 'ratingValue': '4.87', 'ratingCount': '112'},
+    'latitude': 60.39, 'longitude': 5.32,
+}
+PAGE = f"""<html><head><script type="application/ld+json">{json.dumps(LISTING)}</script></head>
+<body><h1>Garden cottage</h1></body></html>"""
+
+
+@pytest.mark.parametrize('query, phrases', [
+    ('property name, price and rating', ['property name', 'price', 'rating']),
+    ('latitude and longitude', ['latitude and longitude']),
+    ('bed and breakfast rules; check-in time', ['bed and breakfast rules', 'check-in time']),
+    ('host name and house rules.', ['host name', 'house rules']),
+    ('title & stars\nscore', ['title', 'stars', 'score']),
+    (' , ', []),
+])
+def test_parse_query_fields(query, phrases):
+    assert parse_query_fields(query) == phrases
+
+
+def test_embedded_fields_answer_what_the_page_embeds():
+    fields, remaining = extract_embedded_fields(PAGE, 'title, rating, number of reviews, house rules')
+    assert fields == {'title': 'Garden cottage', 'rating': 4.87, 'number of reviews': 112}
+    assert remaining == 'house rules'
+
+
+def test_embedded_fields_answer_the_whole_query():
+    fields, remaining = extract_embedded_fields(PAGE, 'latitude and longitude')
+    assert fields == {'latitude and longitude': '60.39, 5.32'}
+    assert remaining is None
+
+
+def test_page_without_embedded_json_leaves_the_query_to_the_model():
+    assert extract_embedded_fields('<html><body>Listing</body></html>', 'price and rating') == ({}, 'price, rating')
@@ -0,0 +1,112 @@
+import functools
+import os
+import time
+import uuid
+
+import pytest
+
+from job_queue import JobQueue, RedisJobQueue, SQLiteJobQueue
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_queue(request, tmp_path):
+    """Open queues on one store; redis uses $SCRAPER_TEST_REDIS_URL, else fakeredis."""
+    if request.param == 'sqlite':
+        opened = functools.partial(SQLiteJobQueue, str(tmp_path / 'jobs.sqlite3'))
+    elif os.environ.get('SCRAPER_TEST_REDIS_URL'):
+        opened = functools.partial(RedisJobQueue.from_url, os.environ['SCRAPER_TEST_REDIS_URL'],
+                                   prefix=f"test_jobs_{uuid.uuid4().hex}")
+    else:
+        fakeredis = pytest.importorskip('fakeredis')
+        pytest.importorskip('lupa')  # Lua scripting
+        server = fakeredis.FakeServer()
+
+        def opened(**options):
+            return RedisJobQueue(fakeredis.FakeRedis(server=server, decode_responses=True), **options)
+    queues = []
+
+    def make(**options):
+        queues.append(opened(**dict({'retry_base_delay': 0}, **options)))
+        return queues[-1]
+
+    yield make
+    for jobs in queues:
+        jobs.close()
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        JobQueue()
+
+
+def test_keys_are_deduplicated(make_queue):
+    jobs = make_queue()
+    assert jobs.put('listing', 'a', {'url': 'a'})
+    assert not jobs.put('listing', 'a', {'url': 'a'})
+    assert jobs.put('search', 'a', {'url': 'a'})
+    assert jobs.counts('listing') == {'pending': 1, 'leased': 0, 'done': 0, 'failed': 0}
+
+
+def test_lease_complete_and_results(make_queue):
+    jobs = make_queue()
+    for key in 'abc':
+        jobs.put('listing', key, {'url': key})
+    leased = jobs.lease('listing', 'worker-1', limit=2)
+    assert [job.key for job in leased] == ['a', 'b']
+    assert [job.attempts for job in leased] == [1, 1]
+    assert jobs.lease('listing', 'worker-2', limit=5)[0].key == 'c'
+    assert jobs.heartbeat(leased[0])
+    assert jobs.complete(leased[0], {'rating': 4.9})
+    assert not jobs.heartbeat(leased[0])
+    assert not jobs.complete(leased[0], {'rating': 1.0})
+    assert list(jobs.results('listing')) == [('a', {'url': 'a'}, {'rating': 4.9})]
+    assert jobs.counts('listing') == {'pending': 0, 'leased': 2, 'done': 1, 'failed': 0}
+
+
+def test_expired_lease_is_handed_out_again(make_queue):
+    jobs = make_queue(visibility_timeout=0.05, max_attempts=2)
+    jobs.put('listing', 'a', {})
+    stale = jobs.lease('listing', 'worker-1')[0]
+    time.sleep(0.1)
+    retry = jobs.lease('listing', 'worker-2')[0]
+    assert retry.attempts == 2
+    assert not jobs.complete(stale)
+    time.sleep(0.1)
+    assert jobs.lease('listing', 'worker-3') == []  # Out of attempts
+    assert jobs.counts('listing')['failed'] == 1
+
+
+def test_failed_job_is_retried_until_attempts_run_out(make_queue):
+    jobs = make_queue(max_attempts=2)
+    jobs.put('listing', 'a', {})
+    assert jobs.fail(jobs.lease('listing', 'worker')[0], 'timeout')
+    assert jobs.counts('listing')['pending'] == 1
+    assert jobs.fail(jobs.lease('listing', 'worker')[0], 'timeout')
+    assert jobs.counts('listing') == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+
+
+def test_finished_keys_stay_taken_without_done_ttl(make_queue):
+    jobs = make_queue()
+    jobs.put('listing', 'a', {})
+    jobs.complete(jobs.lease('listing', 'worker')[0])
+    assert not jobs.put('listing', 'a', {})
+
+
+def test_finished_keys_are_queued_again_after_done_ttl(make_queue):
+    jobs = make_queue(done_ttl=0.05, max_attempts=1)
+    for key in 'ab':
+        jobs.put('listing', key, {'round': 1})
+    done, failed = jobs.lease('listing', 'worker', limit=2)
+    jobs.complete(done, 'ok')
+    jobs.fail(failed, 'boom')
+    assert not jobs.put('listing', 'a', {'round': 2})
+    jobs.put('listing', 'c', {'round': 1})
+    assert not jobs.put('listing', 'c', {'round': 2})  # Still pending
+    time.sleep(0.1)
+    assert jobs.put('listing', 'a', {'round': 2})
+    assert jobs.put('listing', 'b', {'round': 2})
+    assert not jobs.put('listing', 'c', {'round': 2})
+    assert jobs.counts('listing') == {'pending': 3, 'leased': 0, 'done': 0, 'failed': 0}
+    again = jobs.lease('listing', 'worker', limit=3)
+    assert sorted((job.key, job.payload['round'], job.attempts) for job in again) == [
+        ('a', 2, 1), ('b', 2, 1), ('c', 1, 1)]
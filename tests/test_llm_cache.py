@@ -0,0 +1,28 @@
+import time
+
+from llm_cache import LLMCache
+
+
+def test_hits_keep_entries_from_being_evicted_first(tmp_path):
+    cache = LLMCache(str(tmp_path / 'llm.sqlite3'), max_bytes=10)
+    cache.put('old', 'aaaaa')
+    time.sleep(0.01)
+    cache.put('new', 'bbbbb')
+    time.sleep(0.01)
+    assert cache.get('old') == 'aaaaa'  # Recorded in memory, written by the eviction below
+    cache.max_bytes = 5
+    cache.evict()
+    assert (cache.get('old'), cache.get('new')) == ('aaaaa', None)
+
+
+def test_expired_entries_are_misses(tmp_path):
+    cache = LLMCache(str(tmp_path / 'llm.sqlite3'), ttl_seconds=0)
+    cache.put('key', 'value')
+    time.sleep(0.01)
+    assert cache.get('key') is None
+    assert cache.stats['misses'] == 1
+
+
+def test_cache_uses_write_ahead_logging(tmp_path):
+    cache = LLMCache(str(tmp_path / 'llm.sqlite3'))
+    assert cache._conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
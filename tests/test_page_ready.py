@@ -0,0 +1,18 @@
+import airbnb_aiscraper as scraper
+
+
+class StateDriver:
+    """Reports a loaded, quiet page with ``pending`` fetch/XHR requests in flight."""
+
+    def __init__(self, pending):
+        self.pending = pending
+
+    def execute_script(self, script, selectors):
+        return {'readyState': 'complete', 'now': 10_000.0, 'lastMutation': 0.0, 'lastResponseEnd': 0.0,
+                'pending': self.pending, 'missing': []}
+
+
+def test_page_is_not_ready_while_requests_are_in_flight():
+    assert scraper.wait_for_page_ready(StateDriver(pending=1), timeout=0.2, poll_interval=0.05)['timed_out']
+    assert not scraper.wait_for_page_ready(StateDriver(pending=0), timeout=0.2, poll_interval=0.05)['timed_out']
+
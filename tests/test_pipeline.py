@@ -0,0 +1,28 @@
+import airbnb_aiscraper as scraper
+from page_store import PageStore
+from tracing import Tracer
+
+
+def test_record_spans_attributes_them_to_the_current_listing():
+    tracer = Tracer()
+    with tracer.listing('room-1'):
+        tracer.record_spans([{'stage': 'html_to_text', 'listing': None, 'seconds': 0.2, 'ok': True, 'start': 1.0},
+                             {'stage': 'html_to_text', 'listing': 'room-2', 'seconds': 0.1, 'ok': True, 'start': 1.0}])
+    assert tracer.spans_frame()['listing'].tolist() == ['room-1', 'room-2']
+
+
+def test_pipeline_keeps_spans_recorded_in_clean_processes(tmp_path, text_context, make_extractor):
+    store = PageStore(str(tmp_path / 'pages.sqlite3'))
+    urls = [f"https://www.airbnb.com/rooms/{room + 1}" for room in range(2)]
+    for url in urls:
+        store.put(url, f"<html><body><h1>{url}</h1><h2>House rules</h2><p>No parties.</p></body></html>")
+    scraper.tracer.clear()
+    pool = scraper.ListingPipeline('house rules', None, workers=1, extractor=make_extractor(), page_store=store,
+                                   offline=True, clean_processes=1).start()
+    for url in urls:
+        pool.submit({'url': url, 'price': None})
+    pool.close()
+    assert sorted(result for _, _, result in pool.results()) == ["answer 1", "answer 2"]
+    spans = scraper.tracer.spans_frame()
+    cleaned = spans[spans['stage'] == 'html_to_text']
+    assert sorted(cleaned['listing']) == sorted(scraper.canonical_listing_url(url) for url in urls)
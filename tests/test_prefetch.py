@@ -0,0 +1,171 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+import airbnb_aiscraper as scraper
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, kind):
+        self.driver.check()
+        self.driver.current_window_handle = f"tab-{next(self.driver.handles)}"
+
+    def window(self, handle):
+        self.driver.check()
+        self.driver.current_window_handle = handle
+
+
+class FakeDriver:
+    """Opens tabs without loading anything; every call fails once ``crash_after`` pages were opened."""
+
+    def __init__(self, crash_after=None):
+        self.crash_after = crash_after
+        self.handles = itertools.count()
+        self.current_window_handle = 'home'
+        self.switch_to = FakeSwitchTo(self)
+        self.opened = 0
+
+    def check(self):
+        if self.crash_after is not None and self.opened >= self.crash_after:
+            raise WebDriverException("chrome not reachable")
+
+    def execute_script(self, script, *args):
+        self.check()
+        self.opened += 1
+
+    def close(self):
+        self.check()
+
+
+class FakeDriverPool:
+    max_pages_per_driver = 25
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.leased = 0
+        self.leases = 0
+
+    @contextmanager
+    def lease(self):
+        self.leased += 1
+        self.leases += 1
+        try:
+            yield self.driver
+        finally:
+            self.leased -= 1
+
+
+class CountingRateLimiter:
+    def __init__(self):
+        self.waits = []
+
+    def wait(self, url):
+        self.waits.append(url)
+
+
+class FakeHttpFetcher:
+    """Returns pages without listing data, so every listing escalates to the browser."""
+
+    def fetch(self, url):
+        return '<html><body>Please enable JavaScript</body></html>'
+
+
+def listings(count):
+    return [{'url': f"https://www.airbnb.com/rooms/{room + 1}", 'price': None} for room in range(count)]
+
+
+def test_close_returns_a_crashed_browser_to_the_pool():
+    driver = FakeDriver()
+    pool = FakeDriverPool(driver)
+    prefetcher = scraper.TabPrefetcher(pool, max_tabs=2)
+    for listing in listings(2):
+        prefetcher.open(listing['url'])
+    driver.crash_after = 0
+    prefetcher.close()
+    assert pool.leased == 0
+    assert prefetcher.driver is None
+
+
+def test_lookahead_worker_survives_a_browser_crash():
+    driver_pool = FakeDriverPool(FakeDriver(crash_after=2))
+    pool = scraper.ListingWorkerPool('house rules', driver_pool, workers=1, lookahead=1,
+                                     rate_limiter=CountingRateLimiter()).start()
+    for listing in listings(3):
+        pool.submit(listing)
+    pool.close()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = executor.submit(lambda: list(pool.results())).result(timeout=10)
+    assert len(results) == 3
+    assert all(scraper.is_error_result(result) for _, _, result in results)
+    assert driver_pool.leased == 0
+
+
+def test_lookahead_worker_returns_the_browser_after_each_batch():
+    driver_pool = FakeDriverPool(FakeDriver(crash_after=0))  # Every page fails at once
+    pool = scraper.ListingWorkerPool('house rules', driver_pool, workers=1, lookahead=1,
+                                     rate_limiter=CountingRateLimiter())
+    for listing in listings(4):
+        pool.submit(listing)
+    pool.close()
+    pool.start()
+    assert len(list(pool.results())) == 4
+    assert driver_pool.leases == 2  # Two batches of the current listing plus one upcoming
+
+
+def test_prefetch_waits_for_the_host_once_per_listing():
+    rate_limiter = CountingRateLimiter()
+    pool = scraper.ListingWorkerPool('house rules', None, lookahead=1, rate_limiter=rate_limiter,
+                                     http_fetcher=FakeHttpFetcher())
+    prefetcher = scraper.TabPrefetcher(FakeDriverPool(FakeDriver()), max_tabs=2)
+    for idx, listing in enumerate(listings(2)):
+        pool._prefetch((idx, listing), prefetcher)
+    assert len(rate_limiter.waits) == 2
+    assert len(prefetcher._tabs) == 2
+    prefetcher.close()
+
+
+def test_pool_without_browsers_fails_listings_the_http_tier_cannot_serve():
+    pool = scraper.ListingWorkerPool('house rules', None, workers=1, rate_limiter=CountingRateLimiter(),
+                                     http_fetcher=FakeHttpFetcher()).start()
+    pool.submit(listings(1)[0])
+    pool.close()
+    [(_, _, result)] = list(pool.results())
+    assert result == "Error: Unable to load content for https://www.airbnb.com/rooms/1"
+
+
+def test_lookahead_worker_loads_queued_listings_while_the_last_one_is_extracted():
+    pool = scraper.ListingWorkerPool('house rules', FakeDriverPool(FakeDriver()), workers=1, lookahead=1,
+                                     rate_limiter=CountingRateLimiter())
+    prefetched = threading.Event()
+
+    def prefetch(task, prefetcher):
+        if task[0] == 2:
+            prefetched.set()
+        return (*task, '<html></html>', time.monotonic())
+
+    def extract(idx, listing, html_content, started):
+        return idx, listing, prefetched.wait(timeout=2) if idx == 1 else True
+
+    pool._prefetch, pool._extract = prefetch, extract
+    for listing in listings(3):  # A batch of two, then one more queued while the second is extracted
+        pool.submit(listing)
+    pool.close()
+    pool.start()
+    assert [result for _, _, result in pool.results()] == [True, True, True]
+
+
+def test_take_returns_a_tab_that_did_not_finish_rendering(monkeypatch):
+    monkeypatch.setattr(scraper, 'wait_for_page_ready', lambda *args, **kwargs: {'missing': ['h1']})
+    monkeypatch.setattr(scraper, 'get_html_content', lambda driver: '<html><body>Half rendered</body></html>')
+    prefetcher = scraper.TabPrefetcher(FakeDriverPool(FakeDriver()), max_tabs=1)
+    url = listings(1)[0]['url']
+    prefetcher.open(url)
+    assert prefetcher.take(url) == '<html><body>Half rendered</body></html>'
+    prefetcher.close()
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+
+from job_queue import SQLiteJobQueue
+from queue_worker import SEARCH_QUEUE, QueueWorker
+
+
+class NoBrowsers:
+    @contextmanager
+    def lease(self):
+        raise RuntimeError("no browsers in tests")
+        yield
+
+
+def test_each_search_job_starts_a_new_extractor_run(tmp_path, make_extractor):
+    jobs = SQLiteJobQueue(str(tmp_path / 'jobs.sqlite3'), max_attempts=1)
+    for city in ['Bergen', 'Oslo']:
+        search_url = f"https://www.airbnb.com/s/{city}/homes"
+        jobs.put(SEARCH_QUEUE, search_url, {'search_url': search_url, 'query': 'house rules', 'pages': 1})
+    extractor = make_extractor()
+    worker = QueueWorker(jobs, NoBrowsers(), extractor, threads=1, min_interval=0, poll_interval=0.01)
+    stats = worker.run()
+    jobs.close()
+    assert stats['failed'] == 2  # No listings found without a browser
+    assert extractor.runs == 2
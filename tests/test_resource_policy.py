@@ -0,0 +1,20 @@
+import airbnb_aiscraper as scraper
+
+
+def test_blocked_types_and_trackers():
+    patterns = scraper.ResourcePolicy(blocked_types=('font',)).blocked_url_patterns()
+    assert '*.woff2*' in patterns and '*.jpg*' not in patterns
+    assert '*://*google-analytics.com/*' in patterns
+
+
+def test_allow_domains_override_trackers_and_denied_domains():
+    policy = scraper.ResourcePolicy(blocked_types=(), deny_domains=('ads.example.com',),
+                                    allow_domains=('example.com', 'hotjar.com'))
+    patterns = policy.blocked_url_patterns()
+    assert '*://*ads.example.com/*' not in patterns
+    assert '*://*hotjar.com/*' not in patterns
+    assert '*://*sentry.io/*' in patterns
+
+
+def test_nothing_blocked_without_types_or_trackers():
+    assert scraper.ResourcePolicy(blocked_types=(), block_trackers=False).blocked_url_patterns() == []
@@ -0,0 +1,28 @@
+import pytest
+
+from results_store import ResultsWriter, load_results, parse_price
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('$1,234 night', (1234.0, 'USD')),
+    ('89 € total', (89.0, 'EUR')),
+    ('€ 1.234,50 total', (1234.5, 'EUR')),
+    ('CHF 1’200', (1200.0, 'CHF')),
+    ('1 200 € for 3 nights', (1200.0, 'EUR')),
+    ('2 guests · $120', (120.0, 'USD')),
+    ('R$ 450', (450.0, 'BRL')),
+    ('Price: 120', (120.0, None)),
+    (None, (None, None)),
+])
+def test_parse_price(text, expected):
+    assert parse_price(text) == expected
+
+
+def test_unfinished_run_files_are_not_read(tmp_path):
+    root = str(tmp_path / 'results')
+    writer = ResultsWriter('https://www.airbnb.com/s/Bergen/homes', 'price', root=root, row_group_size=1)
+    writer.append({'link': 'https://www.airbnb.com/rooms/1', 'price': '$120', 'data': {'price': '$120'}})
+    assert writer.rows_written == 1  # Written to the temporary file, whose footer is still missing
+    assert len(load_results(root)) == 0
+    writer.close()
+    assert load_results(root, columns=['price'])['price'].tolist() == [120.0]
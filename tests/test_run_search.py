@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+import airbnb_aiscraper as scraper
+from page_store import PageStore
+from results_journal import ResultsJournal
+
+SEARCH_URL = 'https://www.airbnb.com/s/Bergen/homes'
+QUERY = 'house rules and sauna'
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'benchmarks', 'fixtures', 'cleaning', 'listing_structures.html')
+
+
+@pytest.fixture
+def search(tmp_path, monkeypatch, text_context):
+    """An offline search of three listings stored in a PageStore; journals go to tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    store = PageStore(str(tmp_path / 'pages.sqlite3'))
+    with open(FIXTURE, encoding='utf-8') as f:
+        html_content = f.read()
+    cards = []
+    for room in range(3):
+        url = f"https://www.airbnb.com/rooms/{room + 1}"
+        store.put(url, html_content.replace('<h1>', f'<h1>Room {room}: ', 1))
+        cards.append(scraper.card_record(url, '$100'))
+    store.put(scraper.search_cards_key(SEARCH_URL), json.dumps(cards))
+    return store
+
+
+def run(store, extractor, **options):
+    return scraper.run_search(SEARCH_URL, QUERY, None, extractor, page_store=store, offline=True, workers=1,
+                              min_interval=0, **options)
+
+
+def test_completed_run_is_not_replayed(search, make_extractor):
+    first, second = make_extractor(), make_extractor()
+    run(search, first, resume=True)
+    results = run(search, second, resume=True)
+    assert len(first.chunks) > 0
+    assert len(second.chunks) == len(first.chunks)
+    assert len(results) == 3
+    assert not os.path.exists(ResultsJournal(SEARCH_URL, QUERY).path)
+
+
+def interrupt_after_first_listing():
+    journal = ResultsJournal(SEARCH_URL, QUERY)
+    journal.append(scraper.canonical_listing_url('https://www.airbnb.com/rooms/1'),
+                   {'link': 'https://www.airbnb.com/rooms/1', 'price': '$100', 'data': 'journaled answer'})
+
+
+def test_interrupted_run_resumes(search, make_extractor):
+    full = make_extractor()
+    run(search, full)
+    interrupt_after_first_listing()
+    progress = []
+    extractor = make_extractor()
+    results = run(search, extractor, resume=True, on_progress=lambda record, state: progress.append(state))
+    assert results[0]['data'] == 'journaled answer'
+    assert progress[-1]['resumed'] == 1
+    assert len(extractor.chunks) == len(full.chunks) * 2 // 3
+
+
+def test_resume_is_off_by_default(search, make_extractor):
+    interrupt_after_first_listing()
+    extractor = make_extractor()
+    results = run(search, extractor)
+    assert results[0]['data'] != 'journaled answer'
+    assert len(extractor.chunks) > 0
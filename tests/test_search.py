@@ -0,0 +1,55 @@
+import base64
+import json
+from urllib.parse import parse_qsl, urlparse
+
+from bs4 import BeautifulSoup
+
+import airbnb_aiscraper as scraper
+
+
+def test_search_page_is_ready_when_any_card_selector_matches():
+    [selector] = scraper.search_ready_selectors()
+    for card in ['<div itemprop="itemListElement"></div>', '<div data-testid="card-container"></div>']:
+        assert BeautifulSoup(f"<html><body>{card}</body></html>", 'html.parser').select(selector)
+    custom = scraper.search_ready_selectors(dict(scraper.CARD_SELECTORS, card=['li.result']))
+    assert custom == ['li.result']
+
+
+CARD = """<div data-testid="card-container"><a href="/rooms/{room}?check_in=2026-07-01">Room</a>
+<div data-testid="listing-card-title">Cabin {room}</div>
+<div data-testid="price-availability-row"><span aria-hidden="true">$ {price}</span></div></div>"""
+
+
+def test_parse_listing_cards_reads_each_listing_once():
+    page = '<html><body>' + ''.join(CARD.format(room=room, price=price)
+                                    for room, price in [(1, 120), (2, 95), (1, 120)]) + '</body></html>'
+    assert scraper.parse_listing_cards(page) == [
+        {'url': '/rooms/1', 'price': '$ 120', 'title': 'Cabin 1'},
+        {'url': '/rooms/2', 'price': '$ 95', 'title': 'Cabin 2'},
+    ]
+
+
+def test_parse_listing_cards_uses_the_first_card_selector_that_matches():
+    page = """<div itemprop="itemListElement"><meta itemprop="url" content="www.airbnb.com/rooms/7">
+    <meta itemprop="name" content="Loft"></div>""" + CARD.format(room=8, price=80)
+    assert scraper.parse_listing_cards(page) == [
+        {'url': 'www.airbnb.com/rooms/7', 'price': 'No price available', 'title': 'Loft'},
+    ]
+
+
+def test_search_page_urls_set_offset_and_cursor_per_page():
+    urls = scraper.search_page_urls('https://www.airbnb.com/s/Bergen/homes?adults=2&items_offset=36', 3)
+    assert urls[0] == 'https://www.airbnb.com/s/Bergen/homes?adults=2&items_offset=36'
+    for page, url in enumerate(urls[1:], start=1):
+        params = dict(parse_qsl(urlparse(url).query))
+        assert params['adults'] == '2'
+        assert params['items_offset'] == str(page * scraper.SEARCH_PAGE_SIZE)
+        assert json.loads(base64.b64decode(params['cursor']))['items_offset'] == page * scraper.SEARCH_PAGE_SIZE
+
+
+def test_listing_key_identifies_a_room_across_url_forms():
+    keys = {scraper.listing_key(link) for link in [
+        'https://www.airbnb.com/rooms/42?check_in=2026-07-01', '/rooms/42', 'www.airbnb.no/rooms/plus/42',
+    ]}
+    assert keys == {'room:42'}
+    assert scraper.listing_key('/experiences/7?adults=1') == 'https://www.airbnb.com/experiences/7'
@@ -0,0 +1,68 @@
+import pytest
+
+from text_processing import BATCH_ENCODE_MIN_CHARS, select_relevant_chunks
+
+MULTIBYTE_TEXT = 'Cabin 中文中文 the 😀😀 fjord view 中文 with sauna 😀 and the garden. ' * 3
+
+
+@pytest.mark.parametrize('max_tokens', range(4, 13))
+def test_chunk_offsets_stay_within_max_tokens(text_context, max_tokens):
+    offsets = text_context.chunk_offsets(MULTIBYTE_TEXT, max_tokens)
+    chunks = [MULTIBYTE_TEXT[start:end] for start, end in offsets]
+    assert ''.join(chunks) == MULTIBYTE_TEXT
+    assert all(end > start for start, end in offsets)
+    assert max(text_context.count_tokens(chunk) for chunk in chunks) <= max_tokens
+
+
+def test_chunk_offsets_split_inside_a_character_only_when_unavoidable(text_context):
+    # The encoding spends three tokens on each emoji, so one-token chunks must overrun
+    chunks = text_context.split('😀😀', 1)
+    assert chunks == ['😀', '😀']
+
+
+def test_count_tokens_batch_skips_the_thread_pool_for_small_inputs(text_context, monkeypatch):
+    monkeypatch.setattr(text_context, 'encode_batch', lambda texts: pytest.fail('used the thread pool'))
+    assert text_context.count_tokens_batch(['the cabin', '中文']) == [
+        text_context.count_tokens('the cabin'), text_context.count_tokens('中文')]
+
+
+def test_count_tokens_batch_uses_the_thread_pool_for_large_inputs(text_context):
+    texts = ['the fjord ' * (BATCH_ENCODE_MIN_CHARS // 10), 'sauna']
+    assert text_context.count_tokens_batch(texts) == [text_context.count_tokens(text) for text in texts]
+
+
+LISTING_TEXT = """# Garden cottage
+
+Cosy cottage by the fjord.
+
+## House rules
+
+No parties. Pets allowed. Quiet hours after ten.
+
+## Amenities
+
+Sauna, wifi, kitchen, washer, dryer, parking and a garden with a view.
+
+## Similar listings
+
+Cabin in Os. Home in Bergen.
+"""
+
+
+def test_relevant_chunks_drop_boilerplate_sections(text_context):
+    [chunk] = select_relevant_chunks(LISTING_TEXT, 'house rules', context=text_context)
+    assert chunk.startswith('# Garden cottage') and '## Amenities' in chunk
+    assert 'Similar listings' not in chunk
+
+
+def test_relevant_chunks_keep_the_title_and_best_sections_within_budget(text_context):
+    title, rules = LISTING_TEXT.split('## Amenities')[0].split('## House rules')
+    budget = text_context.count_tokens(title) + text_context.count_tokens('## House rules' + rules)
+    chunks = select_relevant_chunks(LISTING_TEXT, 'house rules', context=text_context, token_budget=budget)
+    assert ''.join(chunks) == LISTING_TEXT.split('## Amenities')[0]
+
+
+def test_relevant_chunks_stay_within_max_chunk_tokens(text_context):
+    chunks = select_relevant_chunks(LISTING_TEXT, 'sauna', context=text_context, max_chunk_tokens=40)
+    assert len(chunks) > 1
+    assert all(text_context.count_tokens(chunk) <= 40 for chunk in chunks)
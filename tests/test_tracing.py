@@ -0,0 +1,16 @@
+from tracing import Tracer
+
+
+def test_slowest_listings_of_an_empty_trace():
+    slowest = Tracer().slowest_listings()
+    assert slowest.empty
+    assert list(slowest.columns) == ['listing', 'seconds', 'ok']
+
+
+def test_slowest_listings_orders_by_seconds():
+    tracer = Tracer()
+    for listing, seconds in [('a', 0.5), ('b', 2.0), ('c', 1.0)]:
+        tracer.record_span('listing', seconds, listing=listing)
+    tracer.record_span('listing', 9.0)  # Not tied to a listing
+    tracer.record_span('llm wait', 5.0, listing='a')
+    assert tracer.slowest_listings(limit=2)['listing'].tolist() == ['b', 'c']
@@ -0,0 +1,393 @@
+import itertools
+import math
+import re
+import threading
+from collections import Counter
+
+import html2text
+import tiktoken
+
+try:
+    from lxml import html as lxml_html
+except ImportError:  # The scraper falls back to BeautifulSoup + html2text
+    lxml_html = None
+
+HEADING_PATTERN = re.compile(r'^#{1,6} +(.*)$', re.MULTILINE)
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+BATCH_ENCODE_MIN_CHARS = 100_000  # Below this, encode_ordinary_batch's thread pool costs more than it saves
+
+# Section headings (lower case substrings) that never hold listing details
+BOILERPLATE_HEADINGS = (
+    'similar listings', 'more places to stay', 'other great places', 'explore other options',
+    'things to do nearby', 'inspiration for future getaways', 'report this listing',
+    'support', 'hosting', 'legal', 'privacy', 'terms', 'sitemap', 'cookie',
+)
+# Elements dropped entirely by the single-pass cleaner (the scraper's parse_html() drops the first three)
+NOISE_TAGS = {'script', 'style', 'footer', 'head', 'noscript', 'template'}
+BLOCK_TAGS = {
+    'p', 'div', 'section', 'article', 'main', 'header', 'nav', 'aside', 'form',
+    'dl', 'dt', 'dd', 'figure', 'figcaption', 'address', 'body',
+}
+HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+INLINE_MARKERS = {
+    'strong': '**', 'b': '**', 'em': '_', 'i': '_', 'del': '~~', 's': '~~', 'strike': '~~', 'code': '`',
+}
+LIST_ITEM_PATTERN = re.compile(r'^(\* |\d+\. )')
+TABLE_ROW_END_PATTERN = re.compile(r'\s*\|$')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PRE_LINE = '\x00'  # Marks a preformatted line whose whitespace markdown() keeps
+STOPWORDS = frozenset(
+    'a an and any are as at be by do for from how i if in is it its me my of on or per '
+    'please the this to what which with you your all only extract give list show get'.split()
+)
+
+
+class TextContext:
+    """Preloaded tokenizer and HTML-to-text converters shared by every thread.
+
+    The tiktoken encoding is thread-safe and shared; html2text converters
+    keep parser state, so each thread lazily gets its own. Chunking returns
+    character offsets into the original string instead of decoded copies.
+    """
+
+    def __init__(self, encoding_name="cl100k_base"):
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self._local = threading.local()
+
+    def _converter(self):
+        converter = getattr(self._local, 'converter', None)
+        if converter is None:
+            converter = html2text.HTML2Text()
+            converter.ignore_links = converter.ignore_images = True
+            converter.body_width = 0
+            self._local.converter = converter
+        return converter
+
+    def html_to_markdown(self, html_content):
+        return self._converter().handle(html_content)
+
+    def encode(self, text):
+        return self.encoding.encode_ordinary(text)
+
+    def encode_batch(self, texts):
+        """Tokenize many documents at once on tiktoken's thread pool."""
+        return self.encoding.encode_ordinary_batch(list(texts))
+
+    def count_tokens(self, text):
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_tokens_batch(self, texts):
+        """Token count of each text; only large inputs are worth tiktoken's per-call thread pool."""
+        texts = list(texts)
+        if sum(len(text) for text in texts) < BATCH_ENCODE_MIN_CHARS:
+            return [self.count_tokens(text) for text in texts]
+        return [len(tokens) for tokens in self.encode_batch(texts)]
+
+    def chunk_offsets(self, text, max_tokens, tokens=None):
+        """Return ``(start, end)`` character offsets of consecutive chunks of at most ``max_tokens`` tokens.
+
+        Chunks end on a token boundary that is also a character boundary,
+        backing up when a token ends inside a multi-byte character; only a
+        ``max_tokens`` smaller than one character's tokens is exceeded. Pass
+        ``tokens`` if the text is already encoded.
+        """
+        if tokens is None:
+            tokens = self.encode(text)
+        if not tokens:
+            return []
+        data = text.encode('utf-8')
+        token_ends = list(itertools.accumulate(len(token) for token in self.encoding.decode_tokens_bytes(tokens)))
+
+        def on_character(end_byte):
+            return end_byte >= len(data) or (data[end_byte] & 0xC0) != 0x80  # Not a continuation byte
+
+        offsets = []
+        start_token = start_byte = start_char = 0
+        while start_token < len(tokens):
+            end_token = min(start_token + max(1, max_tokens), len(tokens))
+            while end_token > start_token and not on_character(token_ends[end_token - 1]):
+                end_token -= 1
+            if end_token == start_token:  # One character spans more than max_tokens tokens
+                end_token = start_token + 1
+                while not on_character(token_ends[end_token - 1]):
+                    end_token += 1
+            end_byte = min(token_ends[end_token - 1], len(data))
+            end_char = start_char + len(data[start_byte:end_byte].decode('utf-8'))
+            offsets.append((start_char, end_char))
+            start_token, start_byte, start_char = end_token, end_byte, end_char
+        return offsets
+
+    def split(self, text, max_tokens):
+        """Split ``text`` into chunks of at most ``max_tokens`` tokens."""
+        return [text[start:end] for start, end in self.chunk_offsets(text, max_tokens)]
+
+
+_text_context = None
+_text_context_lock = threading.Lock()
+
+
+def get_text_context():
+    """Return the process-wide TextContext, creating it on first use."""
+    global _text_context
+    if _text_context is None:
+        with _text_context_lock:
+            if _text_context is None:
+                _text_context = TextContext()
+    return _text_context
+
+
+class _MarkdownEmitter:
+    """Walk an lxml tree once and emit html2text-style markdown."""
+
+    def __init__(self):
+        self.parts = []
+        self.lists = []  # Stack of [tag, item count] for nested ul/ol
+        self.tables = []  # Row count of each open table
+        self.item_start = False  # Just emitted a list marker: the item's first block stays on its line
+        self.pre = 0
+
+    def walk(self, element):
+        tag = element.tag.lower() if isinstance(element.tag, str) else None
+        if tag is None or tag in NOISE_TAGS or tag == 'img':
+            pass  # Comments, processing instructions and dropped elements
+        elif tag == 'br':
+            self.parts.append('\n')
+        elif tag == 'pre':
+            self._pre(element)
+        elif tag == 'blockquote':
+            self._blockquote(element)
+        elif tag in HEADING_LEVELS:
+            self._break('\n\n' + '#' * HEADING_LEVELS[tag] + ' ')
+            self._children(element)
+            self.parts.append('\n\n')
+        elif tag in ('ul', 'ol'):
+            self.lists.append([tag, 0])
+            self._break('\n\n')
+            self._children(element)
+            self.parts.append('\n\n')
+            self.lists.pop()
+        elif tag == 'li':
+            marker = '* '
+            if self.lists:
+                self.lists[-1][1] += 1
+                if self.lists[-1][0] == 'ol':
+                    marker = f"{self.lists[-1][1]}. "
+            self.parts.append('\n' + marker)
+            self.item_start = True
+            self._children(element)
+            self.item_start = False
+        elif tag == 'table':
+            self.tables.append(0)
+            self._break('\n\n')
+            self._children(element)
+            self.parts.append('\n\n')
+            self.tables.pop()
+        elif tag == 'tr':
+            self.parts.append('\n')
+            self._children(element)
+            if self.tables:
+                self.tables[-1] += 1
+                if self.tables[-1] == 1:  # Header separator after the first row, like html2text
+                    cells = sum(1 for child in element if isinstance(child.tag, str)
+                                and child.tag.lower() in ('td', 'th'))
+                    self.parts.append('\n' + '|'.join(['---'] * max(cells, 1)))
+        elif tag in ('td', 'th'):
+            self._children(element)
+            self.parts.append(' | ')
+        elif tag in INLINE_MARKERS:
+            marker = INLINE_MARKERS[tag] if not self.pre else ''
+            self.parts.append(marker)
+            self._children(element)
+            self.parts.append(marker)
+        elif tag in BLOCK_TAGS:
+            self._break('\n\n')
+            self._children(element)
+            self.parts.append('\n\n')
+        else:
+            self._children(element)
+        if element.tail:
+            self._text(element.tail)
+
+    def _break(self, text):
+        """Start a block, unless it is the first thing in a list item."""
+        if self.item_start:
+            self.parts.append(text.lstrip('\n'))
+        else:
+            self.parts.append(text)
+
+    def _text(self, text):
+        if self.pre:
+            self.parts.append(text)
+        else:
+            text = WHITESPACE_PATTERN.sub(' ', text)
+            if self.item_start and text.strip():
+                self.item_start = False
+            self.parts.append(text)
+
+    def _children(self, element):
+        if element.text:
+            self._text(element.text)
+        for child in element:
+            self.walk(child)
+
+    def _pre(self, element):
+        start = len(self.parts)
+        self.pre += 1
+        self._children(element)
+        self.pre -= 1
+        text = ''.join(self.parts[start:]).strip('\n')
+        del self.parts[start:]
+        if self.pre:
+            self.parts.append(text)
+            return
+        lines = (PRE_LINE + '    ' + line.rstrip() for line in text.split('\n'))
+        self._break('\n\n')
+        self.parts.append('\n'.join(lines) + '\n\n')
+
+    def _blockquote(self, element):
+        start = len(self.parts)
+        self._children(element)
+        text = normalize_markdown(''.join(self.parts[start:])).strip('\n')
+        del self.parts[start:]
+        lines = (f"> {line}" if line else '>' for line in text.split('\n'))
+        self._break('\n\n')
+        self.parts.append('\n'.join(lines) + '\n\n')
+
+    def markdown(self):
+        return normalize_markdown(''.join(self.parts)).strip('\n') + '\n'
+
+
+def normalize_markdown(text):
+    """Collapse the emitter's raw output: one space between words, list items indented, one blank line."""
+    lines = []
+    for line in text.split('\n'):
+        if PRE_LINE in line:
+            line = line.replace(PRE_LINE, '')
+        else:
+            line = TABLE_ROW_END_PATTERN.sub('', ' '.join(line.split()))
+            if LIST_ITEM_PATTERN.match(line):
+                line = '  ' + line
+        lines.append(line)
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines))
+
+
+def fast_clean_html(html_content):
+    """Parse once with lxml, drop noise elements and emit markdown text directly."""
+    emitter = _MarkdownEmitter()
+    emitter.walk(lxml_html.document_fromstring(html_content))
+    return emitter.markdown()
+
+
+def split_sections(text):
+    """Split html2text-style markdown into sections starting at each heading.
+
+    Returns ``(heading, section_text)`` pairs in document order; text before
+    the first heading forms a section with an empty heading.
+    """
+    sections = []
+    starts = [match.start() for match in HEADING_PATTERN.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        section = text[start:end]
+        if not section.strip():
+            continue
+        match = HEADING_PATTERN.match(section)
+        sections.append((match.group(1).strip() if match else '', section))
+    return sections
+
+
+def is_boilerplate(heading):
+    heading = heading.lower()
+    return any(phrase in heading for phrase in BOILERPLATE_HEADINGS)
+
+
+def terms(text):
+    """Lower-cased word terms without stopwords, for lexical scoring."""
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+
+class BM25:
+    """Okapi BM25 scorer over a small in-memory list of documents."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(terms(document)) for document in documents]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(documents)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query):
+        query_terms = set(terms(query))
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            score = 0.0
+            for term in query_terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            results.append(score)
+        return results
+
+
+def pack_chunks(pieces, token_counts, max_chunk_tokens, context):
+    """Join consecutive pieces into chunks of at most ``max_chunk_tokens`` tokens.
+
+    Pieces that are larger on their own are cut at token boundaries.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, count in zip(pieces, token_counts):
+        if count > max_chunk_tokens:
+            if current:
+                chunks.append(''.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(context.split(piece, max_chunk_tokens))
+            continue
+        if current_tokens + count > max_chunk_tokens:
+            chunks.append(''.join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += count
+    if current:
+        chunks.append(''.join(current))
+    return chunks
+
+
+def select_relevant_chunks(text, user_query, context=None, token_budget=3000, max_chunk_tokens=2000):
+    """Return the chunks of ``text`` worth sending to the model for ``user_query``.
+
+    Boilerplate sections are dropped. When the rest exceeds ``token_budget``
+    sections are ranked with BM25 against the query and the best ones that
+    fit are kept, always including the title (first h1) section. Kept
+    sections stay in document order and are packed into chunks of at most
+    ``max_chunk_tokens`` tokens.
+    """
+    context = context or get_text_context()
+    sections = [section for heading, section in split_sections(text) if not is_boilerplate(heading)]
+    if not sections:
+        return []
+    token_counts = context.count_tokens_batch(sections)
+
+    if sum(token_counts) > token_budget:
+        scores = BM25(sections).scores(user_query)
+        title = next((i for i, section in enumerate(sections) if section.startswith('# ')), 0)
+        ranked = sorted((i for i in range(len(sections)) if i != title), key=lambda i: scores[i], reverse=True)
+        keep, used = set(), 0
+        for i in [title] + ranked:
+            if used + token_counts[i] <= token_budget:
+                keep.add(i)
+                used += token_counts[i]
+        if not keep:  # Even the best section alone is over budget
+            keep = {max(range(len(sections)), key=lambda i: scores[i])}
+        sections = [sections[i] for i in sorted(keep)]
+        token_counts = [token_counts[i] for i in sorted(keep)]
+
+    return pack_chunks(sections, token_counts, max_chunk_tokens, context)
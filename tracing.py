@@ -0,0 +1,224 @@
+import contextvars
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# USD per million (prompt, completion) tokens
+MODEL_PRICES = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+}
+
+_current_listing = contextvars.ContextVar('current_listing', default=None)
+
+
+def _frame(rows, columns):
+    import pandas as pd  # Only reports need pandas, not the clean worker processes that record spans
+
+    return pd.DataFrame(rows, columns=columns)
+
+
+class Tracer:
+    """Thread-safe record of stage timings, OpenAI token usage, counters and queue depths.
+
+    Spans are attributed to the listing set with ``listing()`` in the current
+    thread (or asyncio task); ``bind()`` carries that listing into coroutines
+    scheduled on another thread's event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+            self.usage = []
+            self.counters = Counter()
+            self.queue_depths = []
+
+    @contextmanager
+    def listing(self, key):
+        """Attribute spans recorded inside the block to listing ``key``."""
+        token = _current_listing.set(key)
+        try:
+            yield
+        finally:
+            _current_listing.reset(token)
+
+    @staticmethod
+    def current_listing():
+        return _current_listing.get()
+
+    async def bind(self, listing, awaitable):
+        """Await ``awaitable`` with ``listing`` as the current listing."""
+        _current_listing.set(listing)
+        return await awaitable
+
+    @contextmanager
+    def span(self, stage, listing=None):
+        """Time the block as one occurrence of ``stage``."""
+        start = time.time()
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record_span(stage, time.perf_counter() - started, listing, ok, start)
+
+    def record_span(self, stage, seconds, listing=None, ok=True, start=None):
+        entry = {
+            'stage': stage,
+            'listing': listing if listing is not None else _current_listing.get(),
+            'seconds': seconds,
+            'ok': ok,
+            'start': start if start is not None else time.time() - seconds,
+        }
+        with self._lock:
+            self.spans.append(entry)
+
+    def drain_spans(self):
+        """Remove and return the spans recorded so far, e.g. to send them back from a worker process."""
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def record_spans(self, spans):
+        """Add spans recorded elsewhere; those without a listing go to the current one."""
+        listing = _current_listing.get()
+        entries = [dict(span, listing=span['listing'] if span['listing'] is not None else listing) for span in spans]
+        with self._lock:
+            self.spans.extend(entries)
+
+    def record_usage(self, model, prompt_tokens, completion_tokens, listing=None):
+        """Record the token usage reported on one OpenAI response."""
+        prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        entry = {
+            'model': model,
+            'listing': listing if listing is not None else _current_listing.get(),
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cost_usd': (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6,
+        }
+        with self._lock:
+            self.usage.append(entry)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def record_queue_depth(self, queue, depth):
+        """Record one sample of how many items are waiting in ``queue``."""
+        with self._lock:
+            self.queue_depths.append({'queue': queue, 'depth': depth, 'time': time.time()})
+
+    def spans_frame(self):
+        with self._lock:
+            return _frame(self.spans, columns=['stage', 'listing', 'seconds', 'ok', 'start'])
+
+    def usage_frame(self):
+        with self._lock:
+            return _frame(self.usage, columns=['model', 'listing', 'prompt_tokens',
+                                               'completion_tokens', 'cost_usd'])
+
+    def queue_depths_frame(self):
+        with self._lock:
+            return _frame(self.queue_depths, columns=['queue', 'depth', 'time'])
+
+    def queue_summary(self):
+        """Return mean, max and last sampled depth per queue as a DataFrame."""
+        df = self.queue_depths_frame()
+        if df.empty:
+            return df
+        return df.groupby('queue', sort=False)['depth'].agg(
+            samples='size', mean='mean', max='max', last='last',
+        ).round(2)
+
+    def stage_summary(self):
+        """Return count, p50, p95, max and total seconds per stage as a DataFrame."""
+        df = self.spans_frame()
+        if df.empty:
+            return df
+        return df.groupby('stage')['seconds'].agg(
+            count='size',
+            p50=lambda s: s.quantile(0.5),
+            p95=lambda s: s.quantile(0.95),
+            max='max',
+            total='sum',
+        ).sort_values('total', ascending=False).round(3)
+
+    def slowest_listings(self, stage='listing', limit=10):
+        """Return the ``limit`` slowest listings by their ``stage`` span."""
+        df = self.spans_frame()
+        df = df[(df['stage'] == stage) & df['listing'].notna()].astype({'seconds': float})  # object when empty
+        return df.nlargest(limit, 'seconds')[['listing', 'seconds', 'ok']].round(3)
+
+    def usage_totals(self):
+        """Return total prompt/completion tokens, cost and OpenAI call count."""
+        df = self.usage_frame()
+        return {
+            'calls': len(df),
+            'prompt_tokens': int(df['prompt_tokens'].sum()),
+            'completion_tokens': int(df['completion_tokens'].sum()),
+            'cost_usd': float(df['cost_usd'].sum()),
+        }
+
+    def to_jsonl(self):
+        """Return every span, usage record and counter as JSON lines."""
+        with self._lock:
+            records = [dict(span, type='span') for span in self.spans]
+            records += [dict(usage, type='usage') for usage in self.usage]
+            records += [{'type': 'counter', 'name': name, 'value': value} for name, value in self.counters.items()]
+            records += [dict(sample, type='queue_depth') for sample in self.queue_depths]
+        return ''.join(json.dumps(record, default=str) + '\n' for record in records)
+
+    def prometheus_text(self, prefix='airbnb_scraper'):
+        """Return the current metrics in the Prometheus text exposition format."""
+        lines = [
+            f'# HELP {prefix}_stage_seconds Time spent per pipeline stage.',
+            f'# TYPE {prefix}_stage_seconds summary',
+        ]
+        summary = self.stage_summary()
+        for stage, row in summary.iterrows():
+            label = _label(stage)
+            lines.append(f'{prefix}_stage_seconds{{stage="{label}",quantile="0.5"}} {row["p50"]}')
+            lines.append(f'{prefix}_stage_seconds{{stage="{label}",quantile="0.95"}} {row["p95"]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{label}"}} {row["total"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{label}"}} {int(row["count"])}')
+
+        usage = self.usage_frame().groupby('model').sum(numeric_only=True)
+        lines.append(f'# TYPE {prefix}_openai_tokens_total counter')
+        for model, row in usage.iterrows():
+            for kind in ('prompt', 'completion'):
+                lines.append(f'{prefix}_openai_tokens_total{{model="{_label(model)}",kind="{kind}"}} '
+                             f'{int(row[kind + "_tokens"])}')
+        lines.append(f'# TYPE {prefix}_openai_cost_usd_total counter')
+        for model, row in usage.iterrows():
+            lines.append(f'{prefix}_openai_cost_usd_total{{model="{_label(model)}"}} {row["cost_usd"]}')
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+        for name, value in counters:
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+
+        queues = self.queue_summary()
+        if not queues.empty:
+            lines.append(f'# TYPE {prefix}_queue_depth gauge')
+            for queue, row in queues.iterrows():
+                lines.append(f'{prefix}_queue_depth{{queue="{_label(queue)}"}} {int(row["last"])}')
+            lines.append(f'# TYPE {prefix}_queue_depth_max gauge')
+            for queue, row in queues.iterrows():
+                lines.append(f'{prefix}_queue_depth_max{{queue="{_label(queue)}"}} {int(row["max"])}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+tracer = Tracer()